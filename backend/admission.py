@@ -0,0 +1,333 @@
+"""Admission control: per-route concurrency limits, deadline-bounded queues and rate limits.
+
+``AdmissionMiddleware`` matches a request to its route template before any
+work is done and applies that route's ``RoutePolicy``:
+
+* ``client_concurrency``, ``client_rate``/``client_burst``: in-flight
+  requests and a token bucket per client address; exceeding either is the
+  client's doing and gets a 429.
+* ``rate``/``burst``: a token bucket for the route as a whole.
+* ``concurrency``: requests of the route served at once. Beyond it a
+  request waits in a FIFO queue of at most ``queue`` entries for at most
+  ``queue_timeout`` seconds. A request whose expected wait (its place in the
+  queue times the route's recent service time, over ``concurrency``) already
+  exceeds ``queue_timeout`` is shed on arrival rather than after it.
+
+Route-wide rejections are 503s. Both carry ``Retry-After``. Routes without a
+policy pass straight through, so cheap in-memory routes (events, stats,
+counts) stay fast while an expensive one is saturated; the database only
+sees what the limits admit.
+
+Limits are per process. The client address is ``scope["client"]``; behind a
+reverse proxy run uvicorn with ``--proxy-headers --forwarded-allow-ips`` so
+it is the caller's address and not the proxy's.
+"""
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from dataclasses import dataclass, fields, replace
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from fastapi.responses import ORJSONResponse
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+# Weight of the latest request in a route's moving average service time
+SERVICE_TIME_WEIGHT = 0.2
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    concurrency: Optional[int] = None
+    queue: int = 0
+    queue_timeout: float = 1.0
+    rate: Optional[float] = None
+    burst: Optional[int] = None
+    client_concurrency: Optional[int] = None
+    client_rate: Optional[float] = None
+    client_burst: Optional[int] = None
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: float):
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: Optional[int] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1, math.ceil(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Take a token; returns 0, or the seconds until one is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Client:
+    __slots__ = ("active", "bucket")
+
+    def __init__(self, bucket: Optional[TokenBucket]):
+        self.active = 0
+        self.bucket = bucket
+
+
+class RouteGate:
+    def __init__(self, name: str, policy: RoutePolicy, max_clients: int = 10000):
+        self.name = name
+        self.policy = policy
+        self.max_clients = max_clients
+        self.bucket = TokenBucket(policy.rate, policy.burst) if policy.rate else None
+        self.clients: "OrderedDict[str, _Client]" = OrderedDict()
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.active = 0
+        self.service_seconds = 0.0
+        self.admitted = 0
+        self.queued = 0
+        self.shed: Dict[str, int] = {}
+
+    def _client(self, key: str) -> _Client:
+        client = self.clients.get(key)
+        if client is None:
+            policy = self.policy
+            client = self.clients[key] = _Client(
+                TokenBucket(policy.client_rate, policy.client_burst) if policy.client_rate else None
+            )
+            if len(self.clients) > self.max_clients:
+                # Forget the least recently seen idle client
+                for stale_key, stale in self.clients.items():
+                    if stale.active == 0 and stale_key != key:
+                        del self.clients[stale_key]
+                        break
+        else:
+            self.clients.move_to_end(key)
+        return client
+
+    def expected_wait(self, position: int) -> float:
+        if not self.policy.concurrency:
+            return 0.0
+        return position * self.service_seconds / self.policy.concurrency
+
+    def _reject(self, status: int, reason: str, retry_after: float) -> Rejected:
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        return Rejected(status, reason, retry_after)
+
+    def _check_rates(self, client: _Client):
+        policy = self.policy
+        if policy.client_concurrency and client.active >= policy.client_concurrency:
+            raise self._reject(429, "client_concurrency", max(self.service_seconds, 1.0))
+        now = time.monotonic()
+        if client.bucket is not None:
+            wait = client.bucket.take(now)
+            if wait:
+                raise self._reject(429, "client_rate", wait)
+        if self.bucket is not None:
+            wait = self.bucket.take(now)
+            if wait:
+                raise self._reject(503, "rate", wait)
+
+    async def acquire(self, client_key: str) -> float:
+        """Wait for a slot; returns the seconds spent queued or raises ``Rejected``."""
+        client = self._client(client_key)
+        self._check_rates(client)
+        policy = self.policy
+        if not policy.concurrency or (self.active < policy.concurrency and not self.waiters):
+            self.active += 1
+            client.active += 1
+            self.admitted += 1
+            return 0.0
+
+        position = len(self.waiters) + 1
+        if position > policy.queue:
+            raise self._reject(503, "queue_full", self.expected_wait(position))
+        if self.expected_wait(position) > policy.queue_timeout:
+            raise self._reject(503, "queue_budget", self.expected_wait(position))
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.queued += 1
+        client.active += 1
+        try:
+            # release() hands its slot straight to the waiter, so ``active`` is already counted
+            await asyncio.wait_for(waiter, policy.queue_timeout)
+        except asyncio.TimeoutError:
+            client.active -= 1
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the wait timed out (wait_for can still time out then from 3.12)
+                self._release_slot()
+            raise self._reject(503, "queue_timeout", self.expected_wait(len(self.waiters)))
+        except asyncio.CancelledError:
+            client.active -= 1
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the client went away
+                self._release_slot()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self.waiters.remove(waiter)
+                except ValueError:
+                    pass
+        self.admitted += 1
+        return time.perf_counter() - started
+
+    def _release_slot(self):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def release(self, client_key: str, service_seconds: float):
+        client = self.clients.get(client_key)
+        if client is not None:
+            client.active -= 1
+        if self.service_seconds:
+            self.service_seconds += SERVICE_TIME_WEIGHT * (service_seconds - self.service_seconds)
+        else:
+            self.service_seconds = service_seconds
+        if self.policy.concurrency:
+            self._release_slot()
+        else:
+            self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": len(self.waiters),
+            "admitted": self.admitted,
+            "queued_total": self.queued,
+            "shed": sum(self.shed.values()),
+            "service_ms": round(self.service_seconds * 1000, 2),
+        }
+
+
+class AdmissionController:
+    def __init__(self, policies: Dict[str, RoutePolicy], max_clients: int = 10000, metrics=None):
+        self.policies = dict(policies)
+        self.max_clients = max_clients
+        self.metrics = metrics
+        self.routes: Tuple = ()
+        self.gates: Dict[str, RouteGate] = {}
+        self.gated: Tuple = ()
+
+    def bind(self, routes: Iterable):
+        """Attach the policies to the app's routes; keys are ``"METHOD /path"`` as in the route table."""
+        self.routes = tuple(routes)
+        self.gates = {}
+        gated = []
+        known = set()
+        for route in self.routes:
+            for method in sorted(getattr(route, "methods", None) or ()):
+                name = f"{method} {route.path}"
+                known.add(name)
+                policy = self.policies.get(name)
+                if policy is not None:
+                    gate = self.gates[name] = RouteGate(name, policy, self.max_clients)
+                    gated.append((route, method, gate))
+        for name in sorted(set(self.policies) - known):
+            logger.warning("Admission policy for unknown route %s", name)
+        self.gated = tuple(gated)
+
+    def configure(self, policies: Dict[str, RoutePolicy]):
+        self.policies = dict(policies)
+        self.bind(self.routes)
+
+    def gate_for(self, scope) -> Optional[Tuple[object, RouteGate]]:
+        method = scope["method"]
+        for route, route_method, gate in self.gated:
+            if route_method == method and route.matches(scope)[0] is Match.FULL:
+                return route, gate
+        return None
+
+    def stats(self) -> dict:
+        totals = {"active": 0, "queued": 0, "admitted": 0, "queued_total": 0, "shed": 0}
+        reasons: Dict[str, int] = {}
+        for gate in self.gates.values():
+            for key, value in gate.stats().items():
+                if key in totals:
+                    totals[key] += value
+            for reason, count in gate.shed.items():
+                reasons[reason] = reasons.get(reason, 0) + count
+        totals.update({f"shed_{reason}": count for reason, count in reasons.items()})
+        return totals
+
+
+def client_key(scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.gated:
+            return await self.app(scope, receive, send)
+        matched = self.controller.gate_for(scope)
+        if matched is None:
+            return await self.app(scope, receive, send)
+        route, gate = matched
+        key = client_key(scope)
+        metrics = self.controller.metrics
+        try:
+            queued = await gate.acquire(key)
+        except Rejected as rejection:
+            # Labels the rejection with its route in the request metrics
+            scope["route"] = route
+            if metrics is not None:
+                metrics.observe_shed(scope["method"], route.path, rejection.reason)
+            response = ORJSONResponse(
+                {"detail": "Too many requests, please retry shortly" if rejection.status == 429
+                 else "Server is busy, please retry shortly"},
+                status_code=rejection.status,
+                headers={"Retry-After": str(max(1, math.ceil(rejection.retry_after)))},
+            )
+            return await response(scope, receive, send)
+        if metrics is not None:
+            metrics.observe_admission(scope["method"], route.path, queued)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release(key, time.perf_counter() - started)
+
+
+def admission_from_env(policies: Dict[str, RoutePolicy], metrics=None) -> AdmissionController:
+    """``ADMISSION_POLICIES`` is JSON merged over ``policies``, e.g.
+    ``{"GET /api/alumni": {"concurrency": 64}, "POST /api/feedback": null}``; null removes a policy."""
+    policies = dict(policies)
+    if os.environ.get('ADMISSION_ENABLED', 'true').lower() in ('0', 'false', 'no'):
+        policies = {}
+    overrides = json.loads(os.environ.get('ADMISSION_POLICIES', '') or '{}')
+    allowed = {field.name for field in fields(RoutePolicy)}
+    for name, values in overrides.items():
+        if values is None:
+            policies.pop(name, None)
+            continue
+        unknown = set(values) - allowed
+        if unknown:
+            raise ValueError(f"Unknown admission policy fields for {name}: {', '.join(sorted(unknown))}")
+        policies[name] = replace(policies.get(name, RoutePolicy()), **values)
+    return AdmissionController(
+        policies, max_clients=int(os.environ.get('ADMISSION_MAX_CLIENTS', '10000')), metrics=metrics
+    )
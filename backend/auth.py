@@ -0,0 +1,106 @@
+"""Signed JWT sessions.
+
+``login`` issues an HS256 token carrying the identity claims routes need
+(user id, name, email), so authenticated requests identify the caller from
+the token alone instead of looking the user up. Verified tokens are kept in
+a bounded LRU keyed by the raw token string; a repeat request costs a dict
+lookup and an expiry check instead of a signature verification.
+"""
+import os
+import time
+import logging
+import secrets
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import jwt
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "HS256"
+ISSUER = "alumni-network"
+
+
+class TokenError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: str
+    email: str
+    full_name: str
+
+
+class SessionTokens:
+    def __init__(self, secret: str, ttl: int = 12 * 3600, cache_size: int = 10000):
+        self.secret = secret
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def issue(self, user: dict) -> str:
+        now = int(time.time())
+        claims = {
+            "sub": user["id"],
+            "email": user["email"],
+            "name": user["full_name"],
+            "iss": ISSUER,
+            "iat": now,
+            "exp": now + self.ttl,
+        }
+        return jwt.encode(claims, self.secret, algorithm=ALGORITHM)
+
+    def verify(self, token: str) -> Principal:
+        cached = self.cache.get(token)
+        if cached is not None:
+            principal, expires_at = cached
+            if time.time() < expires_at:
+                self.hits += 1
+                self.cache.move_to_end(token)
+                return principal
+            del self.cache[token]
+
+        self.misses += 1
+        try:
+            claims = jwt.decode(
+                token, self.secret, algorithms=[ALGORITHM], issuer=ISSUER,
+                options={"require": ["sub", "exp", "iat"]},
+            )
+        except jwt.PyJWTError as exc:
+            raise TokenError(str(exc))
+        principal = Principal(id=claims["sub"], email=claims.get("email", ""), full_name=claims.get("name", ""))
+
+        # Only valid tokens are cached, so garbage tokens cannot evict real sessions
+        self.cache[token] = (principal, float(claims["exp"]))
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return principal
+
+    def stats(self) -> dict:
+        return {"cached": len(self.cache), "cache_size": self.cache_size, "hits": self.hits, "misses": self.misses}
+
+
+def tokens_from_env() -> SessionTokens:
+    secret = os.environ.get('JWT_SECRET')
+    if not secret:
+        # Sessions will not survive a restart or be shared between workers
+        logger.warning("JWT_SECRET is not set; using a random per-process signing key")
+        secret = secrets.token_urlsafe(32)
+    return SessionTokens(
+        secret,
+        ttl=int(os.environ.get('JWT_TTL_SECONDS', str(12 * 3600))),
+        cache_size=int(os.environ.get('JWT_CACHE_SIZE', '10000')),
+    )
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
@@ -0,0 +1,152 @@
+"""Profile picture uploads: square thumbnails in a process pool, content-addressed on disk.
+
+Decoding and resampling an upload takes tens of milliseconds of CPU and
+holds the GIL, so ``ImageStore`` runs ``process_image`` on a
+``ProcessPoolExecutor`` and, like the password hasher, admits at most
+``max_pending`` uploads at once before raising ``ImageStoreBusy``.
+
+Each upload becomes one WebP per entry in ``THUMBNAIL_SIZES``, centre-cropped
+to a square. Files are named after the SHA-256 of their bytes, so a name
+never changes meaning: they can be cached forever, identical uploads share
+files, and a replaced picture gets new URLs rather than stale cached copies.
+"""
+import os
+import re
+import hashlib
+import asyncio
+import multiprocessing
+from io import BytesIO
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+THUMBNAIL_SIZES = {"sm": 128, "md": 256, "lg": 512}
+DIRECTORY_SIZE = "sm"
+PROFILE_SIZE = "lg"
+ACCEPTED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+MAX_PIXELS = 40_000_000
+WEBP_QUALITY = 80
+URL_PREFIX = "/api/media/avatars"
+FILENAME_PATTERN = re.compile(r"^[0-9a-f]{64}\.webp$")
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class InvalidImage(Exception):
+    pass
+
+
+class ImageStoreBusy(Exception):
+    pass
+
+
+def _write_once(root: Path, data: bytes) -> str:
+    name = hashlib.sha256(data).hexdigest() + ".webp"
+    path = root / name
+    if not path.exists():
+        # Written under a temporary name so a reader never sees a partial file
+        temporary = root / f".{name}.{os.getpid()}"
+        temporary.write_bytes(data)
+        os.replace(temporary, path)
+    return name
+
+
+def process_image(data: bytes, root: str) -> Dict[str, str]:
+    """Decode an upload and write its thumbnails; returns ``{size name: file name}``."""
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    try:
+        image = Image.open(BytesIO(data))
+        if image.format not in ACCEPTED_FORMATS:
+            raise InvalidImage(f"Unsupported image format: {image.format}")
+        largest = max(THUMBNAIL_SIZES.values())
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale, which is most of the work for camera photos
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    except UnidentifiedImageError:
+        raise InvalidImage("Not a recognised image file")
+    except (Image.DecompressionBombError, OSError, SyntaxError) as exc:
+        raise InvalidImage(str(exc) or "Not an image")
+
+    root_path = Path(root)
+    root_path.mkdir(parents=True, exist_ok=True)
+    names = {}
+    # Each size is resampled from the next larger one rather than from the original
+    for size_name, size in sorted(THUMBNAIL_SIZES.items(), key=lambda item: -item[1]):
+        image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        encoded = BytesIO()
+        image.save(encoded, "WEBP", quality=WEBP_QUALITY, method=4)
+        names[size_name] = _write_once(root_path, encoded.getvalue())
+    return names
+
+
+def avatar_url(name: str) -> str:
+    return f"{URL_PREFIX}/{name}"
+
+
+class ImageStore:
+    def __init__(self, root: str, workers: int = 2, max_pending: int = 16, max_bytes: int = 5 * 2 ** 20):
+        self.root = Path(root)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        # Workers are spawned, not forked, as the parent already runs driver threads.
+        # workers=0 processes inline on the event loop; only useful as a benchmark baseline
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) if workers else None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.invalid = 0
+
+    async def save(self, data: bytes) -> Dict[str, str]:
+        """Store the thumbnails of an upload; returns ``{size name: URL}``."""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ImageStoreBusy()
+        self.pending += 1
+        try:
+            if self.executor is None:
+                names = process_image(data, str(self.root))
+            else:
+                names = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, process_image, data, str(self.root)
+                )
+        except InvalidImage:
+            self.invalid += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        return {size_name: avatar_url(name) for size_name, name in names.items()}
+
+    def path(self, name: str) -> Optional[Path]:
+        if not FILENAME_PATTERN.match(name):
+            return None
+        path = self.root / name
+        return path if path.is_file() else None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "invalid": self.invalid,
+        }
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def image_store_from_env() -> ImageStore:
+    return ImageStore(
+        root=os.environ.get('AVATAR_DIR', str(Path(__file__).parent / 'media' / 'avatars')),
+        workers=int(os.environ.get('AVATAR_WORKERS', str(min(2, os.cpu_count() or 1)))),
+        max_pending=int(os.environ.get('AVATAR_MAX_PENDING', '16')),
+        max_bytes=int(os.environ.get('AVATAR_MAX_BYTES', str(5 * 2 ** 20))),
+    )
@@ -0,0 +1,125 @@
+"""Profile picture uploads: event-loop latency while thumbnails are made, and directory page weight.
+
+Registers ``--users`` alumni and uploads a synthetic camera-sized JPEG for
+each while a probe requests ``GET /api/events``, as in the login storm. Then
+it loads one directory page and adds up the bytes of the images its cards
+reference, against the originals those cards would otherwise show.
+
+    python benchmarks/avatar_uploads.py --users 30
+    python benchmarks/avatar_uploads.py --inline      # thumbnail on the event loop, for comparison
+"""
+import io
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+from PIL import Image
+
+from harness import add_mongo_arguments, percentiles, running_app
+from login_storm import probe
+
+PASSWORD = "AvatarPass123!"
+
+
+def synthetic_photo(index: int, width: int, height: int) -> bytes:
+    # Noise over gradients: compresses like a photo, unlike a flat colour
+    noise = Image.effect_noise((width, height), 48 + index % 16)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    photo = Image.merge("RGB", (noise, gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    encoded = io.BytesIO()
+    photo.save(encoded, "JPEG", quality=90)
+    return encoded.getvalue()
+
+
+async def upload_worker(http, queue: asyncio.Queue, latencies: list, statuses: dict):
+    while True:
+        try:
+            user_id, token, photo = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        started = time.perf_counter()
+        response = await http.post(
+            f"/api/user/{user_id}/avatar",
+            files={"file": ("photo.jpg", photo, "image/jpeg")},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def main(args) -> dict:
+    os.environ['AVATAR_DIR'] = tempfile.mkdtemp(prefix="avatars-")
+    os.environ['AVATAR_WORKERS'] = "0" if args.inline else str(args.workers)
+    os.environ['AVATAR_MAX_PENDING'] = str(args.users)
+    os.environ['AVATAR_MAX_BYTES'] = str(32 * 2 ** 20)
+
+    async with running_app(args.mongo_url, args.db_name) as (server, http):
+        queue, originals = asyncio.Queue(), {}
+        for index in range(args.users):
+            response = await http.post("/api/register", json={
+                "full_name": f"Avatar User {index:03d}", "email": f"avatar{index}@example.com", "password": PASSWORD,
+                "passout_year": 2020, "location": "Remote", "company": "Bench", "domain": "Technology",
+                "phone": "(555) 000-0000",
+            })
+            response.raise_for_status()
+            session = response.json()
+            photo = synthetic_photo(index, args.width, args.height)
+            originals[session["user"]["id"]] = len(photo)
+            queue.put_nowait((session["user"]["id"], session["access_token"], photo))
+
+        stop = asyncio.Event()
+        idle = []
+        idle_probe = asyncio.create_task(probe(http, stop, args.probe_interval, idle))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        await idle_probe
+
+        stop = asyncio.Event()
+        loaded, latencies, statuses = [], [], {}
+        upload_probe = asyncio.create_task(probe(http, stop, args.probe_interval, loaded))
+        started = time.perf_counter()
+        await asyncio.gather(*(upload_worker(http, queue, latencies, statuses) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await upload_probe
+
+        page = (await http.get("/api/alumni", params={"limit": 30})).json()["items"]
+        card_bytes = 0
+        for card in page:
+            response = await http.get(card["profile_picture"])
+            assert response.headers["cache-control"].endswith("immutable")
+            card_bytes += len(response.content)
+        original_bytes = sum(originals[card["id"]] for card in page)
+
+        return {
+            "mode": "inline" if args.inline else f"pool({args.workers})",
+            "uploads": args.users,
+            "photo": f"{args.width}x{args.height}",
+            "statuses": statuses,
+            "uploads_per_s": round(statuses.get(200, 0) / elapsed, 2),
+            "upload_latency_ms": percentiles(latencies),
+            "probe_idle_ms": percentiles(idle),
+            "probe_during_uploads_ms": percentiles(loaded),
+            "directory_page_cards": len(page),
+            "directory_page_image_kb": round(card_bytes / 1024, 1),
+            "original_images_kb": round(original_bytes / 1024, 1),
+            "reduction": f"{original_bytes / max(card_bytes, 1):.0f}x",
+            "image_store": server.image_store.stats(),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--width", type=int, default=3000)
+    parser.add_argument("--height", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="thumbnail pool size")
+    parser.add_argument("--inline", action="store_true", help="make thumbnails on the event loop instead of the pool")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--idle-seconds", type=float, default=1.0)
+    add_mongo_arguments(parser)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
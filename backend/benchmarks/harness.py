@@ -0,0 +1,73 @@
+"""Shared setup for the in-process benchmarks.
+
+The FastAPI app is driven through ``httpx.ASGITransport`` on the benchmark's
+own event loop, so anything that blocks the loop shows up directly in the
+measured latencies. With ``--mongo-url`` the app talks to a real MongoDB;
+otherwise it runs against ``mongomock_motor``, an in-memory stand-in that is
+good for relative comparisons but not for absolute database timings.
+"""
+import os
+import sys
+import math
+import contextlib
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/max of ``samples`` (seconds), reported in milliseconds."""
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 3)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1] * 1000, 3)}
+
+
+def add_mongo_arguments(parser):
+    parser.add_argument("--mongo-url", help="benchmark against this MongoDB instead of the in-memory stand-in")
+    parser.add_argument("--db-name", default="alumni_benchmark", help="database to use with --mongo-url")
+
+
+@contextlib.asynccontextmanager
+async def running_app(
+    mongo_url: Optional[str] = None,
+    db_name: str = "alumni_benchmark",
+    seed: Optional[Callable[..., Awaitable[None]]] = None,
+):
+    """Import the app, point it at the benchmark database, run its lifespan and yield an HTTP client.
+
+    ``seed(server, db)`` runs before startup, so backfills, counters and the
+    search index are built from the seeded data as they would be in production.
+    """
+    import httpx
+
+    os.environ['MONGO_URL'] = mongo_url or "mongodb://localhost:27017"
+    os.environ['DB_NAME'] = db_name
+    # Every benchmark request comes from one client address, which per-client limits would throttle;
+    # benchmarks that exercise admission control turn it on themselves
+    os.environ.setdefault('ADMISSION_ENABLED', 'false')
+    import server
+
+    server.mongo.url = os.environ['MONGO_URL']
+    server.mongo.db_name = db_name
+    if not mongo_url:
+        from mongomock_motor import AsyncMongoMockClient
+        server.mongo.client_factory = lambda: AsyncMongoMockClient(tz_aware=True)
+    server.db = await server.mongo.connect()
+    if mongo_url:
+        await server.mongo.client.drop_database(db_name)
+    if seed is not None:
+        await seed(server, server.db)
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.lifespan(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as http:
+            yield server, http
@@ -0,0 +1,486 @@
+"""Load test for every route on ``api_router``, run in-process.
+
+Seeds a synthetic dataset (alumni, conversations, donations, feedback), then
+drives each route in turn with ``--concurrency`` workers for ``--requests``
+calls and reports throughput and p50/p95/p99 latency per endpoint. Every
+route needs an entry in ``SCENARIOS``; the run refuses to start if one is
+missing, so new routes cannot silently skip the suite.
+
+    python benchmarks/loadtest.py --save-baseline benchmarks/baseline.json
+    python benchmarks/loadtest.py --baseline benchmarks/baseline.json    # exits 1 on regression
+    python benchmarks/loadtest.py --only alumni --requests 1000 --concurrency 64
+
+Baselines are only comparable between runs on the same machine and backend
+(``--mongo-url`` or the in-memory stand-in) with the same dataset options.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from datetime import timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urlencode
+
+from harness import add_mongo_arguments, percentiles, running_app
+
+PASSWORD = "LoadTest123!"
+ADMIN_KEY = "loadtest-admin-key"
+
+FIRST_NAMES = ["Aarav", "Maya", "Lucas", "Sofia", "Kenji", "Amara", "Diego", "Priya", "Noah", "Chen", "Fatima", "Oliver"]
+LAST_NAMES = ["Sharma", "Garcia", "Kim", "Okafor", "Müller", "Rossi", "Tanaka", "Silva", "Patel", "Nguyen", "Smith", "Cohen"]
+COMPANIES = ["Google", "Microsoft", "Amazon", "Stripe", "Airbnb", "Goldman Sachs", "McKinsey", "Tesla", "Netflix", "OpenLab"]
+DOMAINS = ["Technology", "Finance", "Consulting", "Healthcare", "Education", "Design", "Research"]
+LOCATIONS = ["San Francisco, CA", "New York, NY", "London, UK", "Bangalore, IN", "Berlin, DE", "Tokyo, JP", "Toronto, CA"]
+PURPOSES = ["Scholarship Fund", "Infrastructure Development", "Research Grants", "Alumni Events"]
+REGISTRABLE_EVENTS = ["evt1", "evt2", "evt4", "evt5"]
+EXPORT_DATASETS = ["alumni", "donations", "event_registrations", "feedback"]
+
+
+class Call(NamedTuple):
+    method: str
+    url: str
+    params: Optional[dict] = None
+    json: Optional[dict] = None
+    files: Optional[dict] = None
+    headers: Optional[dict] = None
+    expect: int = 200
+    stream: bool = False
+
+
+class Dataset:
+    def __init__(self, alumni: int, messages: int, donations: int, feedback: int, seed: int):
+        self.size = {"alumni": alumni, "messages": messages, "donations": donations, "feedback": feedback}
+        self.random = random.Random(seed)
+        self.users: List[dict] = []
+        self.pairs: List[tuple] = []
+        self.active_pairs: List[tuple] = []
+        self.donors: List[str] = []
+        self.photo = b""
+        self.avatar_urls: List[str] = []
+        self.tokens: Dict[str, str] = {}
+        self.server = None
+
+    def user(self) -> dict:
+        return self.random.choice(self.users)
+
+    def auth(self, user_id: str) -> dict:
+        token = self.tokens.get(user_id)
+        if token is None:
+            profile = next(user for user in self.users if user["id"] == user_id)
+            token = self.tokens[user_id] = self.server.session_tokens.issue(profile)
+        return {"Authorization": f"Bearer {token}"}
+
+
+def synthetic_profile(rng: random.Random, index: int, email: str) -> dict:
+    return {
+        "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {index}",
+        "email": email,
+        "password": PASSWORD,
+        "passout_year": rng.randint(1990, 2025),
+        "location": rng.choice(LOCATIONS),
+        "company": rng.choice(COMPANIES),
+        "domain": rng.choice(DOMAINS),
+        "phone": f"(555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+    }
+
+
+async def insert_batches(collection, docs: List[dict], batch_size: int = 5000):
+    for start in range(0, len(docs), batch_size):
+        await collection.insert_many(docs[start:start + batch_size], ordered=False)
+
+
+def seeder(data: Dataset):
+    async def seed(server, db):
+        from passwords import hash_password_sync
+        from avatars import avatar_url, process_image
+        from avatar_uploads import synthetic_photo
+
+        rng = data.random
+        data.server = server
+        # One small upload for the upload route and one stored picture for the media route
+        data.photo = synthetic_photo(0, 800, 600)
+        data.avatar_urls = [avatar_url(name) for name in process_image(data.photo, str(server.image_store.root)).values()]
+        hashed = hash_password_sync(PASSWORD, server.password_hasher.rounds)
+        started = server.utc_now() - timedelta(days=365)
+
+        users = []
+        for index in range(data.size["alumni"]):
+            profile = server.UserCreate(**synthetic_profile(rng, index, f"alumni{index}@example.com"))
+            doc = server.new_user_doc(profile)
+            doc["password"] = hashed
+            users.append(doc)
+        data.users = [{key: doc[key] for key in ("id", "email", "full_name", "company")} for doc in users]
+
+        donations = []
+        for index in range(data.size["donations"]):
+            donor = rng.choice(users)
+            amount = float(rng.choice([25, 50, 100, 250, 1000]))
+            donor["donation_total"] += amount
+            donor["donation_count"] += 1
+            donations.append({
+                "id": f"donation-{index}", "user_id": donor["id"], "name": donor["full_name"],
+                "email": donor["email"], "phone": donor["phone"], "amount": amount,
+                "purpose": rng.choice(PURPOSES), "message": None,
+                "timestamp": started + timedelta(minutes=index),
+            })
+        data.donors = sorted({donation["user_id"] for donation in donations})
+
+        # A few busy conversations and a long tail, like a real inbox
+        conversations = max(1, data.size["messages"] // 25)
+        data.pairs = [tuple(pair["id"] for pair in rng.sample(users, 2)) for _ in range(conversations)]
+        messages, active = [], set()
+        for index in range(data.size["messages"]):
+            sender, receiver = data.pairs[min(int(rng.paretovariate(1.2)) - 1, conversations - 1)]
+            active.add((sender, receiver))
+            if rng.random() < 0.5:
+                sender, receiver = receiver, sender
+            messages.append({
+                "id": f"message-{index}", "conversation_id": server.conversation_key(sender, receiver),
+                "sender_id": sender, "receiver_id": receiver, "message": f"Synthetic message {index}",
+                "timestamp": started + timedelta(seconds=index * 30),
+            })
+
+        data.active_pairs = sorted(active)
+
+        feedback = [{
+            "id": f"feedback-{index}", "name": "Load Test", "email": "load@example.com",
+            "message": f"Feedback {index}", "timestamp": started + timedelta(hours=index),
+        } for index in range(data.size["feedback"])]
+
+        await insert_batches(db.users, users)
+        await insert_batches(db.donations, donations)
+        await insert_batches(db.messages, messages)
+        if feedback:
+            await insert_batches(db.feedback, feedback)
+
+    return seed
+
+
+def new_profile(data: Dataset, i: int, prefix: str) -> dict:
+    return synthetic_profile(data.random, i, f"{prefix}{i}-{os.getpid()}@example.com")
+
+
+def import_file(data: Dataset, i: int, rows: int = 50) -> dict:
+    header = "full_name,email,password,passout_year,location,company,domain,phone\n"
+    lines = [header]
+    for row in range(rows):
+        profile = new_profile(data, i * rows + row, "import")
+        lines.append(",".join(f'"{profile[field]}"' for field in header.strip().split(",")) + "\n")
+    return {"file": ("alumni.csv", "".join(lines).encode(), "text/csv")}
+
+
+def search_term(data: Dataset) -> str:
+    term = data.random.choice([data.user()["full_name"].split()[0], data.user()["company"], data.random.choice(DOMAINS)])
+    if data.random.random() < 0.2 and len(term) > 4:
+        position = data.random.randrange(1, len(term) - 1)
+        term = term[:position] + term[position + 1:]  # a typo
+    return term
+
+
+def message_call(data: Dataset) -> Call:
+    sender, receiver = data.random.choice(data.pairs)
+    return Call("POST", "/api/messages", json={"sender_id": sender, "receiver_id": receiver, "message": "Load test"},
+                headers=data.auth(sender))
+
+
+def conversation_call(data: Dataset) -> Call:
+    user_id, other = data.random.choice(data.pairs)
+    return Call("GET", f"/api/messages/{user_id}", params={"other_user_id": other}, headers=data.auth(user_id))
+
+
+def inbox_call(data: Dataset) -> Call:
+    user_id = data.random.choice(data.random.choice(data.pairs))
+    return Call("GET", f"/api/inbox/{user_id}", headers=data.auth(user_id))
+
+
+def mark_read_call(data: Dataset) -> Call:
+    # Only pairs that have exchanged messages have a conversation to mark
+    user_id, other = data.random.choice(data.active_pairs or data.pairs)
+    return Call("POST", f"/api/inbox/{user_id}/{other}/read", headers=data.auth(user_id))
+
+
+def avatar_upload_call(data: Dataset) -> Call:
+    user = data.user()
+    return Call("POST", f"/api/user/{user['id']}/avatar", files={"file": ("photo.jpg", data.photo, "image/jpeg")},
+                headers=data.auth(user["id"]))
+
+
+def donation_call(data: Dataset) -> Call:
+    donor = data.user()
+    return Call("POST", "/api/donate", headers=data.auth(donor["id"]), json={
+        "user_id": donor["id"], "name": donor["full_name"], "email": donor["email"], "phone": "(555) 000-0000",
+        "amount": 50.0, "purpose": data.random.choice(PURPOSES),
+    })
+
+
+def event_registration_call(data: Dataset) -> Call:
+    user = data.user()
+    return Call("POST", "/api/events/register", headers=data.auth(user["id"]), json={
+        "user_id": user["id"], "event_id": data.random.choice(REGISTRABLE_EVENTS), "name": user["full_name"],
+        "email": user["email"], "phone": "(555) 000-0000", "attend_dinner": data.random.random() < 0.5,
+    })
+
+
+def directory_call(data: Dataset) -> Call:
+    params = {"limit": 30}
+    roll = data.random.random()
+    if roll < 0.3:
+        params["company"] = data.random.choice(COMPANIES)
+    elif roll < 0.5:
+        params["name"] = data.random.choice(FIRST_NAMES)[:3]
+    return Call("GET", "/api/alumni", params=params)
+
+
+def profile_update_call(data: Dataset) -> Call:
+    user = data.user()
+    return Call("PUT", f"/api/user/{user['id']}", json={"company": data.random.choice(COMPANIES)},
+                headers=data.auth(user["id"]))
+
+
+def donation_history_call(data: Dataset) -> Call:
+    donor = data.random.choice(data.donors or [data.user()["id"]])
+    return Call("GET", f"/api/user/{donor}/donations", headers=data.auth(donor))
+
+
+def event_upsert_call(data: Dataset, i: int) -> Call:
+    return Call("PUT", f"/api/events/load-{i % 5}", headers={"X-Admin-Key": ADMIN_KEY}, json={
+        "title": f"Load test event {i % 5}", "date": "2030-01-01", "location": "Main Campus",
+        "description": "Synthetic event", "has_registration": False,
+    })
+
+
+def recommendations_call(data: Dataset) -> Call:
+    user = data.user()
+    return Call("GET", f"/api/user/{user['id']}/recommendations", headers=data.auth(user["id"]))
+
+
+def stream_call(data: Dataset) -> Call:
+    user = data.user()
+    return Call("GET", f"/api/messages/{user['id']}/stream", headers=data.auth(user["id"]), stream=True)
+
+
+# One request builder per route; keys are "<METHOD> <route path>" exactly as registered
+SCENARIOS: Dict[str, Callable[[Dataset, int], Call]] = {
+    "POST /api/register": lambda data, i: Call("POST", "/api/register", json=new_profile(data, i, "register")),
+    "POST /api/login": lambda data, i: Call("POST", "/api/login", json={"email": data.user()["email"], "password": PASSWORD}),
+    "GET /api/user/{user_id}": lambda data, i: Call("GET", f"/api/user/{data.user()['id']}"),
+    "PUT /api/user/{user_id}": lambda data, i: profile_update_call(data),
+    "POST /api/user/{user_id}/avatar": lambda data, i: avatar_upload_call(data),
+    "GET /api/media/avatars/{name}": lambda data, i: Call("GET", data.avatar_urls[i % len(data.avatar_urls)]),
+    "GET /api/events": lambda data, i: Call("GET", "/api/events", params={"has_registration": "true"} if i % 2 else None),
+    "PUT /api/events/{event_id}": event_upsert_call,
+    "POST /api/events/register": lambda data, i: event_registration_call(data),
+    "GET /api/events/{event_id}/registrations/count": lambda data, i: Call(
+        "GET", f"/api/events/{REGISTRABLE_EVENTS[i % len(REGISTRABLE_EVENTS)]}/registrations/count"),
+    "GET /api/alumni": lambda data, i: directory_call(data),
+    "POST /api/admin/import/alumni": lambda data, i: Call(
+        "POST", "/api/admin/import/alumni", files=import_file(data, i), headers={"X-Admin-Key": ADMIN_KEY}),
+    "GET /api/admin/export/{dataset}": lambda data, i: Call(
+        "GET", f"/api/admin/export/{EXPORT_DATASETS[i % len(EXPORT_DATASETS)]}", headers={"X-Admin-Key": ADMIN_KEY}),
+    "GET /api/user/{user_id}/recommendations": lambda data, i: recommendations_call(data),
+    "GET /api/alumni/search": lambda data, i: Call("GET", "/api/alumni/search", params={"q": search_term(data)}),
+    "POST /api/messages": lambda data, i: message_call(data),
+    "GET /api/messages/{user_id}/stream": lambda data, i: stream_call(data),
+    "GET /api/messages/{user_id}": lambda data, i: conversation_call(data),
+    "GET /api/inbox/{user_id}": lambda data, i: inbox_call(data),
+    "POST /api/inbox/{user_id}/{other_user_id}/read": lambda data, i: mark_read_call(data),
+    "POST /api/donate": lambda data, i: donation_call(data),
+    "GET /api/user/{user_id}/donations": lambda data, i: donation_history_call(data),
+    "GET /api/donations/analytics": lambda data, i: Call(
+        "GET", "/api/donations/analytics", headers={"X-Admin-Key": ADMIN_KEY}),
+    "POST /api/feedback": lambda data, i: Call("POST", "/api/feedback", json={
+        "name": "Load Test", "email": "load@example.com", "message": f"Feedback {i}"}),
+    "GET /api/stats": lambda data, i: Call("GET", "/api/stats"),
+}
+
+
+def route_keys(server) -> List[str]:
+    keys = []
+    for route in server.api_router.routes:
+        for method in sorted(route.methods - {"HEAD", "OPTIONS"}):
+            keys.append(f"{method} {route.path}")
+    return keys
+
+
+async def open_stream(app, call: Call) -> int:
+    """Time-to-first-event for a streaming route: read the first body chunk, then disconnect.
+
+    httpx's ASGI transport buffers whole responses, which never completes for an
+    event stream, so this drives the ASGI app directly.
+    """
+    path, _, query = call.url.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": call.method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": (query or urlencode(call.params or {})).encode(),
+        "headers": [(key.lower().encode(), value.encode()) for key, value in (call.headers or {}).items()],
+        "server": ("benchmark", 80), "client": ("127.0.0.1", 0),
+    }
+    first_chunk = asyncio.Event()
+    requested = False
+    status = 500
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await first_chunk.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and (message.get("body") or not message.get("more_body")):
+            first_chunk.set()
+
+    await app(scope, receive, send)
+    return status
+
+
+async def perform(server, http, call: Call) -> int:
+    if call.stream:
+        return await open_stream(server.app, call)
+    response = await http.request(
+        call.method, call.url, params=call.params, json=call.json, files=call.files, headers=call.headers
+    )
+    return response.status_code
+
+
+async def drive(server, http, data: Dataset, key: str, requests: int, concurrency: int, warmup: int) -> dict:
+    build = SCENARIOS[key]
+    for i in range(warmup):
+        await perform(server, http, build(data, -1 - i))
+
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            call = build(data, i)
+            started = time.perf_counter()
+            status = await perform(server, http, call)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            if status != call.expect:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "rps": round(requests / elapsed, 1),
+        **percentiles(latencies),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, slack_ms: float) -> List[str]:
+    """Regressions of this run against ``baseline``; latency gets ``slack_ms`` of absolute noise allowance."""
+    regressions = []
+    for key, base in baseline.get("endpoints", {}).items():
+        current = results["endpoints"].get(key)
+        if current is None:
+            continue
+        for metric in ("p50", "p95", "p99"):
+            if base.get(metric) is None or current.get(metric) is None:
+                continue
+            limit = base[metric] * (1 + tolerance) + slack_ms
+            if current[metric] > limit:
+                regressions.append(f"{key}: {metric} {current[metric]:.2f} ms > {limit:.2f} ms (baseline {base[metric]:.2f})")
+        if base.get("rps") and current["rps"] < base["rps"] / (1 + tolerance):
+            regressions.append(f"{key}: {current['rps']:.1f} req/s < baseline {base['rps']:.1f} req/s")
+    return regressions
+
+
+def print_table(results: dict):
+    print(f"{'endpoint':<42} {'req/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'errors':>7}")
+    for key, row in results["endpoints"].items():
+        print(f"{key:<42} {row['rps']:>9.1f} {row['p50']:>8.2f} {row['p95']:>8.2f} {row['p99']:>8.2f} "
+              f"{row['max']:>8.2f} {row['errors']:>7}")
+
+
+async def main(args) -> int:
+    # Cheap hashes keep register/login about the app rather than bcrypt; see login_storm.py for that
+    os.environ['BCRYPT_ROUNDS'] = str(args.bcrypt_rounds)
+    os.environ['IMPORT_BCRYPT_ROUNDS'] = str(args.bcrypt_rounds)
+    os.environ['ADMIN_API_KEY'] = ADMIN_KEY
+    os.environ['AVATAR_DIR'] = tempfile.mkdtemp(prefix="loadtest-avatars-")
+    os.environ.setdefault('JWT_SECRET', "loadtest-signing-key-not-for-production-use")
+
+    data = Dataset(args.alumni, args.messages, args.donations, args.feedback, args.seed)
+    async with running_app(args.mongo_url, args.db_name, seed=seeder(data)) as (server, http):
+        missing = [key for key in route_keys(server) if key not in SCENARIOS]
+        if missing:
+            print("Routes without a load-test scenario: " + ", ".join(missing), file=sys.stderr)
+            return 2
+        while not (server.search_index.ready and server.recommender.ready):
+            await asyncio.sleep(0.05)
+
+        selected = [key for key in route_keys(server) if not args.only or any(part in key for part in args.only)]
+        results = {
+            "config": {
+                "backend": "mongodb" if args.mongo_url else "mongomock",
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "dataset": data.size,
+                "bcrypt_rounds": args.bcrypt_rounds,
+            },
+            "endpoints": {},
+        }
+        for key in selected:
+            results["endpoints"][key] = await drive(
+                server, http, data, key, args.requests, args.concurrency, args.warmup
+            )
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as handle:
+            json.dump(results, handle, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    failed = [f"{key}: {row['errors']} unexpected responses {row['statuses']}"
+              for key, row in results["endpoints"].items() if row["errors"]]
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        if baseline.get("config", {}).get("dataset") != results["config"]["dataset"]:
+            print("Warning: baseline was recorded with a different dataset", file=sys.stderr)
+        failed += compare(results, baseline, args.tolerance, args.slack_ms)
+    for failure in failed:
+        print("FAIL " + failure, file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per endpoint")
+    parser.add_argument("--only", nargs="*", help="only endpoints whose key contains one of these strings")
+    parser.add_argument("--alumni", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--donations", type=int, default=5000)
+    parser.add_argument("--feedback", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the synthetic dataset")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--save-baseline", help="write the results JSON as a new baseline")
+    parser.add_argument("--baseline", help="compare against this baseline and exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown vs the baseline")
+    parser.add_argument("--slack-ms", type=float, default=2.0, help="absolute latency noise allowance")
+    add_mongo_arguments(parser)
+    sys.exit(asyncio.run(main(parser.parse_args())))
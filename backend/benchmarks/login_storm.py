@@ -0,0 +1,109 @@
+"""Login storm: login throughput and the latency an unrelated route sees meanwhile.
+
+A probe repeatedly requests ``GET /api/events`` (served from memory) before and
+during a burst of concurrent logins. If password hashing stalls the event
+loop, the probe's p99 climbs towards the bcrypt time; with the bounded hash
+pool it should stay near its idle baseline.
+
+    python benchmarks/login_storm.py --logins 200 --concurrency 32
+    python benchmarks/login_storm.py --inline      # hash on the event loop, for comparison
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+
+from harness import add_mongo_arguments, percentiles, running_app
+
+PASSWORD = "StormPass123!"
+
+
+async def probe(http, stop: asyncio.Event, interval: float, samples: list):
+    # Probes are due every ``interval``; each slot's latency runs from when it was due,
+    # so a stalled event loop is charged to every probe it delayed instead of hidden
+    scheduled = time.perf_counter()
+    while True:
+        await http.get("/api/events")
+        finished = time.perf_counter()
+        while scheduled <= finished:
+            samples.append(finished - scheduled)
+            scheduled += interval
+        if stop.is_set():
+            return
+        await asyncio.sleep(scheduled - finished)
+
+
+async def login_worker(http, queue: asyncio.Queue, latencies: list, statuses: dict):
+    while True:
+        try:
+            email = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        started = time.perf_counter()
+        response = await http.post("/api/login", json={"email": email, "password": PASSWORD})
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def main(args) -> dict:
+    os.environ['BCRYPT_ROUNDS'] = str(args.rounds)
+    os.environ['PASSWORD_HASH_WORKERS'] = "0" if args.inline else str(args.workers)
+    os.environ['PASSWORD_HASH_MAX_PENDING'] = str(args.max_pending)
+
+    async with running_app(args.mongo_url, args.db_name) as (server, http):
+        emails = [f"storm{i}@example.com" for i in range(args.users)]
+        for index, email in enumerate(emails):
+            response = await http.post("/api/register", json={
+                "full_name": f"Storm User {index}", "email": email, "password": PASSWORD,
+                "passout_year": 2020, "location": "Remote", "company": "Bench", "domain": "Technology",
+                "phone": "(555) 000-0000",
+            })
+            response.raise_for_status()
+
+        stop = asyncio.Event()
+        idle = []
+        idle_probe = asyncio.create_task(probe(http, stop, args.probe_interval, idle))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        await idle_probe
+
+        queue = asyncio.Queue()
+        for i in range(args.logins):
+            queue.put_nowait(emails[i % len(emails)])
+        stop = asyncio.Event()
+        loaded, latencies, statuses = [], [], {}
+        storm_probe = asyncio.create_task(probe(http, stop, args.probe_interval, loaded))
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker(http, queue, latencies, statuses) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await storm_probe
+
+        return {
+            "mode": "inline" if args.inline else f"pool({args.workers})",
+            "bcrypt_rounds": args.rounds,
+            "logins": args.logins,
+            "concurrency": args.concurrency,
+            "statuses": statuses,
+            "login_throughput_per_s": round(statuses.get(200, 0) / elapsed, 2),
+            "login_latency_ms": percentiles(latencies),
+            "probe_idle_ms": percentiles(idle),
+            "probe_during_storm_ms": percentiles(loaded),
+            "hasher": server.password_hasher.stats(),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost for the run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="hash pool size")
+    parser.add_argument("--max-pending", type=int, default=256)
+    parser.add_argument("--inline", action="store_true", help="hash on the event loop instead of the pool")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--idle-seconds", type=float, default=1.0)
+    add_mongo_arguments(parser)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,119 @@
+"""Overload: what a cheap route sees while expensive ones are saturated, with and without admission control.
+
+Runs the same spike twice, first with every route unlimited and then with
+``server.ADMISSION_POLICIES``. ``--clients`` simulated clients, each with
+its own address, hammer ``GET /api/alumni`` and ``POST /api/login`` for
+``--seconds`` while a probe requests ``GET /api/events`` (no policy, served
+from memory). A rejected client waits ``--backoff`` seconds and tries again.
+Reports per-route statuses and latency, the probe's latency and the
+admission counters for each phase.
+
+    python benchmarks/overload.py --clients 256 --seconds 10
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+from collections import Counter
+
+import httpx
+
+from harness import add_mongo_arguments, percentiles, running_app
+from login_storm import probe
+
+PASSWORD = "OverloadPass123!"
+
+
+async def client_loop(http, index: int, args, deadline: float, results: dict):
+    request = 0
+    while time.perf_counter() < deadline:
+        request += 1
+        if (index + request) % args.login_every == 0:
+            route = "POST /api/login"
+            call = http.post("/api/login", json={"email": f"overload{index % args.users}@example.com", "password": PASSWORD})
+        else:
+            route = "GET /api/alumni"
+            call = http.get("/api/alumni", params={"limit": 50, "company": f"Company {(index + request) % 40}"})
+        started = time.perf_counter()
+        response = await call
+        elapsed = time.perf_counter() - started
+        row = results.setdefault(route, {"statuses": Counter(), "ok": [], "rejected": []})
+        row["statuses"][response.status_code] += 1
+        if response.status_code in (429, 503):
+            row["rejected"].append(elapsed)
+            await asyncio.sleep(args.backoff)
+        else:
+            row["ok"].append(elapsed)
+
+
+async def phase(server, http, args, policies: dict) -> dict:
+    server.admission.configure(policies)
+    clients = [
+        httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=server.app, client=(f"10.0.{index // 250}.{index % 250 + 1}", 50000)),
+            base_url="http://benchmark",
+        )
+        for index in range(args.clients)
+    ]
+    results, probes = {}, []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(http, stop, args.probe_interval, probes))
+    started = time.perf_counter()
+    deadline = started + args.seconds
+    await asyncio.gather(*(client_loop(client, index, args, deadline, results) for index, client in enumerate(clients)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    for client in clients:
+        await client.aclose()
+    return {
+        "routes": {
+            route: {
+                "statuses": dict(row["statuses"]),
+                "ok_per_s": round(len(row["ok"]) / elapsed, 1),
+                "ok_latency_ms": percentiles(row["ok"]),
+                "rejected_latency_ms": percentiles(row["rejected"]),
+            }
+            for route, row in sorted(results.items())
+        },
+        "probe_events_ms": percentiles(probes),
+        "admission": server.admission.stats(),
+    }
+
+
+async def main(args) -> dict:
+    os.environ['BCRYPT_ROUNDS'] = str(args.rounds)
+
+    async with running_app(args.mongo_url, args.db_name) as (server, http):
+        users = [server.new_user_doc(server.UserCreate(
+            full_name=f"Overload User {index:05d}", email=f"overload{index}@example.com", password=PASSWORD,
+            passout_year=1990 + index % 35, location="Boston, MA", company=f"Company {index % 40}",
+            domain="Technology", phone="(555) 000-0000",
+        )) for index in range(args.alumni)]
+        hashed = await server.password_hasher.hash(PASSWORD)
+        for user in users:
+            user["password"] = hashed
+        await server.db.users.insert_many(users)
+        await server.bump_version("users")
+
+        return {
+            "clients": args.clients,
+            "seconds": args.seconds,
+            "unlimited": await phase(server, http, args, {}),
+            "admission": await phase(server, http, args, server.ADMISSION_POLICIES),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=256)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--alumni", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50, help="accounts the logins are spread over")
+    parser.add_argument("--login-every", type=int, default=10, help="every Nth request of a client is a login")
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost for the run")
+    parser.add_argument("--backoff", type=float, default=0.1, help="seconds a client waits after a 429/503")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    add_mongo_arguments(parser)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
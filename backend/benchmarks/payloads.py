@@ -0,0 +1,95 @@
+"""Response size per encoding and the cost of revalidating unchanged listings.
+
+Seeds alumni and one long conversation, then for the directory, event,
+conversation and export routes reports the bytes on the wire for identity,
+gzip and brotli, and the latency of a full response against a conditional
+request that comes back 304.
+
+    python benchmarks/payloads.py --alumni 2000
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+from harness import add_mongo_arguments, running_app
+
+PASSWORD = "PayloadPass123!"
+ADMIN_KEY = "payloads-admin-key"
+
+
+async def wire_bytes(http, url: str, encoding: str, **kwargs) -> int:
+    total = 0
+    async with http.stream("GET", url, headers={**kwargs.pop("headers", {}), "Accept-Encoding": encoding}, **kwargs) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_raw():
+            total += len(chunk)
+    return total
+
+
+async def median_ms(http, repeats: int, url: str, **kwargs) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await http.get(url, **kwargs)
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+async def main(args) -> dict:
+    os.environ['ADMIN_API_KEY'] = ADMIN_KEY
+
+    async with running_app(args.mongo_url, args.db_name) as (server, http):
+        users = []
+        for index in range(args.alumni):
+            user = server.new_user_doc(server.UserCreate(
+                full_name=f"Payload User {index:05d}", email=f"payload{index}@example.com", password=PASSWORD,
+                passout_year=1990 + index % 35, location=["Boston, MA", "London, UK", "Pune, IN"][index % 3],
+                company=f"Company {index % 40}", domain=["Technology", "Finance", "Design"][index % 3],
+                phone="(555) 000-0000",
+            ))
+            users.append(user)
+        await server.db.users.insert_many([dict(user) for user in users])
+        await server.bump_version("users")
+        sender, receiver = users[0]["id"], users[1]["id"]
+        auth = {"Authorization": f"Bearer {server.session_tokens.issue(users[0])}"}
+        for index in range(args.messages):
+            response = await http.post("/api/messages", headers=auth, json={
+                "sender_id": sender, "receiver_id": receiver,
+                "message": f"Message {index}: are you going to the reunion dinner next month?",
+            })
+            response.raise_for_status()
+
+        routes = {
+            "GET /api/alumni?limit=100": ("/api/alumni", {"params": {"limit": 100}}),
+            "GET /api/events": ("/api/events", {}),
+            "GET /api/messages (page of 50)": (f"/api/messages/{sender}", {"params": {"other_user_id": receiver}, "headers": auth}),
+            "GET /api/admin/export/alumni": ("/api/admin/export/alumni", {"headers": {"X-Admin-Key": ADMIN_KEY}}),
+        }
+        report = {}
+        for name, (url, kwargs) in routes.items():
+            row = {}
+            for encoding in ("identity", "gzip", "br"):
+                row[f"{encoding}_bytes"] = await wire_bytes(http, url, encoding, **dict(kwargs))
+            row["brotli_ratio"] = round(row["identity_bytes"] / row["br_bytes"], 1)
+            full = await http.get(url, **kwargs)
+            etag = full.headers.get("etag")
+            if etag:
+                headers = {**kwargs.get("headers", {}), "If-None-Match": etag}
+                revalidate = {**kwargs, "headers": headers}
+                assert (await http.get(url, **revalidate)).status_code == 304, name
+                row["full_ms"] = await median_ms(http, args.repeats, url, **kwargs)
+                row["not_modified_ms"] = await median_ms(http, args.repeats, url, **revalidate)
+            report[name] = row
+        return {"alumni": args.alumni, "messages": args.messages, "routes": report}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alumni", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=20)
+    add_mongo_arguments(parser)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,85 @@
+"""Recommendation index: rebuild time at scale, lookup cost and agreement with brute force.
+
+Encodes ``--alumni`` synthetic profiles (company sizes follow a long tail, as
+in a real alumni base), runs the full rebuild, then compares the top-k
+scores of ``--sample`` alumni with an exact scan over every profile. No
+database or HTTP is involved.
+
+    python benchmarks/recommendations.py --alumni 500000
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Ahead of this directory, where this script shadows the backend module of the same name
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from recommendations import AlumniRecommender, rebuild  # noqa: E402
+
+
+def synthetic_profiles(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    companies = [f"Company {index}" for index in range(max(10, count // 100))]
+    weights = [1 / (rank + 1) for rank in range(len(companies))]
+    domains = [f"Domain {index}" for index in range(30)]
+    locations = [f"City {index}" for index in range(400)]
+    chosen = rng.choices(companies, weights, k=count)
+    return [{
+        "id": f"alumnus-{index}",
+        "company": chosen[index] if rng.random() > 0.05 else None,
+        "domain": rng.choice(domains),
+        "location": rng.choice(locations),
+        "passout_year": rng.randint(1975, 2025),
+    } for index in range(count)]
+
+
+async def measure(args) -> dict:
+    profiles = synthetic_profiles(args.alumni, args.seed)
+    recommender = AlumniRecommender(top_k=args.top_k)
+
+    started = time.perf_counter()
+    recommender.load(profiles)
+    encode_seconds = time.perf_counter() - started
+    rebuild_seconds = await rebuild(recommender)
+
+    rng = random.Random(args.seed + 1)
+    sample = rng.sample(profiles, min(args.sample, len(profiles)))
+    started = time.perf_counter()
+    for profile in sample:
+        recommender.recommend(profile["id"], args.top_k)
+    lookup_us = (time.perf_counter() - started) / len(sample) * 1e6
+
+    exact_matches, exact_seconds = 0, 0.0
+    for profile in sample:
+        indexed = [score for _, score in recommender.recommend(profile["id"], args.top_k)]
+        row = recommender.row_of[profile["id"]]
+        started = time.perf_counter()
+        recommender._rank_row(row)
+        exact_seconds += time.perf_counter() - started
+        exact = [score for _, score in recommender.recommend(profile["id"], args.top_k)]
+        exact_matches += len(indexed) == len(exact) and bool(np.allclose(indexed, exact))
+
+    return {
+        "alumni": args.alumni,
+        "top_k": args.top_k,
+        "encode_seconds": round(encode_seconds, 2),
+        "rebuild_seconds": round(rebuild_seconds, 2),
+        "index_mb": round((recommender.neighbors.nbytes + recommender.scores.nbytes) / 2 ** 20, 1),
+        "lookup_us": round(lookup_us, 2),
+        "exact_rank_ms": round(exact_seconds / len(sample) * 1000, 2),
+        "top_k_equal_to_exact": f"{exact_matches}/{len(sample)}",
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alumni", type=int, default=500000)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--sample", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=3)
+    print(json.dumps(asyncio.run(measure(parser.parse_args())), indent=2))
@@ -0,0 +1,141 @@
+"""Registration surge: many alumni register for one event at once.
+
+Creates an event with ``--capacity`` seats, then sends one registration per
+alumnus plus ``--retries`` duplicate submissions (double-clicks and client
+retries), shuffled, from ``--concurrency`` concurrent clients. Afterwards it
+checks the outcome exactly: no seat is oversold, every alumnus has exactly
+one registration, the counters behind the count endpoint match the stored
+registrations, and the users' ``registered_events`` agree with the seats
+given out. Exits 1 if any check fails.
+
+    python benchmarks/registration_surge.py --alumni 3000 --capacity 1000 --concurrency 256
+    python benchmarks/registration_surge.py --no-waitlist     # overflow gets 409 instead
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import List
+
+from harness import add_mongo_arguments, percentiles, running_app
+
+ADMIN_KEY = "surge-admin-key"
+EVENT_ID = "surge-summit"
+
+
+def seeder(count: int, profiles: List[dict]):
+    async def seed(server, db):
+        users = []
+        for index in range(count):
+            doc = server.new_user_doc(server.UserCreate(
+                full_name=f"Surge Alumnus {index}", email=f"surge{index}@example.com", password="unused",
+                passout_year=2000 + index % 25, location="Remote", company="Bench", domain="Technology",
+                phone="(555) 000-0000",
+            ))
+            users.append(doc)
+            profiles.append({key: doc[key] for key in ("id", "email", "full_name")})
+        await db.users.insert_many(users, ordered=False)
+    return seed
+
+
+async def worker(http, queue: asyncio.Queue, latencies: list, statuses: dict):
+    while True:
+        try:
+            profile, token = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        started = time.perf_counter()
+        response = await http.post("/api/events/register", headers={"Authorization": f"Bearer {token}"}, json={
+            "user_id": profile["id"], "event_id": EVENT_ID, "name": profile["full_name"],
+            "email": profile["email"], "phone": "(555) 000-0000", "attend_dinner": False,
+        })
+        latencies.append(time.perf_counter() - started)
+        key = str(response.status_code)
+        if response.status_code == 200:
+            body = response.json()
+            key = body["status"] + (" (repeat)" if body["already_registered"] else "")
+        statuses[key] = statuses.get(key, 0) + 1
+
+
+async def main(args) -> int:
+    os.environ['ADMIN_API_KEY'] = ADMIN_KEY
+    os.environ.setdefault('JWT_SECRET', "surge-benchmark-signing-key-not-for-production")
+    profiles: List[dict] = []
+
+    async with running_app(args.mongo_url, args.db_name, seeder(args.alumni, profiles)) as (server, http):
+        response = await http.put(f"/api/events/{EVENT_ID}", headers={"X-Admin-Key": ADMIN_KEY}, json={
+            "title": "Surge Summit", "date": "2030-06-01", "location": "Main Campus",
+            "description": "Registration surge benchmark", "has_registration": True,
+            "capacity": args.capacity, "waitlist": not args.no_waitlist,
+        })
+        response.raise_for_status()
+
+        rng = random.Random(args.seed)
+        submissions = [(profile, server.session_tokens.issue(profile)) for profile in profiles]
+        submissions += rng.choices(submissions, k=args.retries)
+        rng.shuffle(submissions)
+        queue = asyncio.Queue()
+        for submission in submissions:
+            queue.put_nowait(submission)
+
+        latencies, statuses = [], {}
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(http, queue, latencies, statuses) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        counts = (await http.get(f"/api/events/{EVENT_ID}/registrations/count")).json()
+        db = server.db
+        stored = {
+            status: await db.event_registrations.count_documents({"event_id": EVENT_ID, "status": status})
+            for status in ("registered", "waitlisted", "pending")
+        }
+        distinct_users = len(await db.event_registrations.distinct("user_id", {"event_id": EVENT_ID}))
+        total = await db.event_registrations.count_documents({"event_id": EVENT_ID})
+        with_event = await db.users.count_documents({"registered_events": EVENT_ID})
+
+        seats = min(args.capacity, args.alumni)
+        overflow = args.alumni - seats
+        expected_waitlisted = 0 if args.no_waitlist else overflow
+        checks = {
+            "registered == min(capacity, alumni)": counts["registered"] == seats,
+            "waitlisted == overflow": counts["waitlisted"] == expected_waitlisted,
+            "counters match stored registrations": (
+                stored["registered"] == counts["registered"] and stored["waitlisted"] == counts["waitlisted"]
+            ),
+            "one registration per alumnus": total == distinct_users == seats + expected_waitlisted,
+            "no pending registrations left": stored["pending"] == 0,
+            "registered_events match seats": with_event == seats,
+            # Rejected alumni who retry are rejected again, so only a lower bound holds
+            "overflow rejected only without a waitlist": (
+                statuses.get("409", 0) >= overflow if args.no_waitlist else "409" not in statuses
+            ),
+        }
+
+        print(json.dumps({
+            "alumni": args.alumni,
+            "capacity": args.capacity,
+            "submissions": len(submissions),
+            "concurrency": args.concurrency,
+            "waitlist": not args.no_waitlist,
+            "throughput_per_s": round(len(submissions) / elapsed, 1),
+            "latency_ms": percentiles(latencies),
+            "responses": statuses,
+            "counts": counts,
+            "checks": checks,
+        }, indent=2))
+        return 0 if all(checks.values()) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alumni", type=int, default=3000)
+    parser.add_argument("--capacity", type=int, default=1000)
+    parser.add_argument("--retries", type=int, default=600, help="duplicate submissions mixed into the surge")
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--no-waitlist", action="store_true", help="reject registrations once the event is full")
+    parser.add_argument("--seed", type=int, default=7)
+    add_mongo_arguments(parser)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,190 @@
+"""Multi-worker scaling: read throughput of ``serve.py`` at each worker count, and invalidation lag.
+
+Seeds ``--alumni`` profiles into a real MongoDB, then for each entry of
+``--workers`` starts ``serve.py`` on a local port and drives each read route
+for ``--seconds`` from ``--load-processes`` load-generator processes. Reports
+req/s and latency per route, the speedup over one worker, and how long an
+event update made through one worker takes to show up on all of them
+(the cache invalidation bus at work).
+
+The load generators share the machine with the server, so keep
+``--workers`` plus ``--load-processes`` within the core count, or run the
+load from another host. Admission control is off for the run, since every
+request comes from one address.
+
+    python benchmarks/scaling.py --mongo-url mongodb://localhost:27017 --workers 1 2 4
+"""
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import httpx
+
+from harness import BACKEND_DIR, percentiles
+
+PASSWORD = "ScalingPass123!"
+ADMIN_KEY = "scaling-admin-key"
+JWT_SECRET = "scaling-benchmark-jwt-secret-0000"
+
+
+async def _drive(base_url: str, path: str, concurrency: int, seconds: float) -> List[float]:
+    latencies: List[float] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+        deadline = time.perf_counter() + seconds
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await http.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def drive(base_url: str, path: str, concurrency: int, seconds: float) -> List[float]:
+    return asyncio.run(_drive(base_url, path, concurrency, seconds))
+
+
+async def seed(args) -> Dict[str, str]:
+    os.environ['MONGO_URL'] = args.mongo_url
+    os.environ['DB_NAME'] = args.db_name
+    import server
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(args.mongo_url)
+    await client.drop_database(args.db_name)
+    hashed = await server.password_hasher.hash(PASSWORD, 4)
+    users = []
+    for index in range(args.alumni):
+        user = server.new_user_doc(server.UserCreate(
+            full_name=f"Scaling User {index:05d}", email=f"scaling{index}@example.com", password=PASSWORD,
+            passout_year=1990 + index % 35, location=["Boston, MA", "London, UK", "Pune, IN"][index % 3],
+            company=f"Company {index % 40}", domain=["Technology", "Finance", "Design"][index % 3],
+            phone="(555) 000-0000",
+        ))
+        user["password"] = hashed
+        users.append(user)
+    await client[args.db_name].users.insert_many(users)
+    client.close()
+    server.password_hasher.shutdown()
+    return {
+        "GET /api/events": "/api/events",
+        "GET /api/stats": "/api/stats",
+        "GET /api/alumni": "/api/alumni?limit=30",
+        "GET /api/alumni (company)": "/api/alumni?limit=30&company=Company%207",
+        "GET /api/alumni/search": "/api/alumni/search?q=scaling%20user%2001",
+        "GET /api/user/{user_id}": f"/api/user/{users[0]['id']}",
+    }
+
+
+def start_server(args, workers: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "MONGO_URL": args.mongo_url,
+        "DB_NAME": args.db_name,
+        "ADMIN_API_KEY": ADMIN_KEY,
+        "JWT_SECRET": JWT_SECRET,
+        "ADMISSION_ENABLED": "false",
+    }
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(args.port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+def wait_until_ready(base_url: str, workers: int, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    ready_in_a_row = 0
+    while time.monotonic() < deadline:
+        try:
+            # Each worker builds its search index in the background after startup;
+            # a new connection each time lands on an arbitrary worker
+            response = httpx.get(base_url + "/api/alumni/search?q=scaling", headers={"Connection": "close"}, timeout=2)
+            ready_in_a_row = ready_in_a_row + 1 if response.status_code == 200 else 0
+            if ready_in_a_row >= 10 * workers:
+                return
+        except httpx.HTTPError:
+            ready_in_a_row = 0
+        time.sleep(0.05 if ready_in_a_row else 0.5)
+    raise RuntimeError("serve.py did not become ready")
+
+
+def invalidation_lag(base_url: str, workers: int, timeout: float = 30) -> float:
+    """Seconds until an event update made through one worker is served by fresh connections to all."""
+    title = f"Scaling check {time.time()}"
+    event = httpx.get(base_url + "/api/events").json()[0]
+    fields = ("date", "location", "image", "description", "has_registration", "capacity", "waitlist")
+    update = {key: event[key] for key in fields if event.get(key) is not None}
+    started = time.perf_counter()
+    httpx.put(
+        base_url + f"/api/events/{event['id']}", headers={"X-Admin-Key": ADMIN_KEY}, json={**update, "title": title},
+    ).raise_for_status()
+    fresh_in_a_row = 0
+    while time.perf_counter() - started < timeout:
+        # A new connection each time lands on an arbitrary worker
+        events = httpx.get(base_url + "/api/events", headers={"Connection": "close"}).json()
+        fresh = any(item["title"] == title for item in events)
+        fresh_in_a_row = fresh_in_a_row + 1 if fresh else 0
+        if fresh_in_a_row >= 10 * workers:
+            return round(time.perf_counter() - started, 3)
+        if not fresh:
+            time.sleep(0.01)
+    return float("nan")
+
+
+def main(args) -> dict:
+    routes = asyncio.run(seed(args))
+    base_url = f"http://127.0.0.1:{args.port}"
+    report = {"alumni": args.alumni, "load_processes": args.load_processes, "runs": {}}
+    pool = ProcessPoolExecutor(args.load_processes, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        for workers in args.workers:
+            process = start_server(args, workers)
+            try:
+                wait_until_ready(base_url, workers)
+                run = {}
+                for name, path in routes.items():
+                    drive(base_url, path, args.concurrency, 1.0)  # warm caches and connections
+                    futures = [pool.submit(drive, base_url, path, args.concurrency, args.seconds)
+                               for _ in range(args.load_processes)]
+                    latencies = [latency for future in futures for latency in future.result()]
+                    run[name] = {"req_per_s": round(len(latencies) / args.seconds, 1), "latency_ms": percentiles(latencies)}
+                run["invalidation_lag_seconds"] = invalidation_lag(base_url, workers)
+                report["runs"][workers] = run
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait(timeout=60)
+    finally:
+        pool.shutdown()
+
+    baseline = report["runs"].get(min(args.workers), {})
+    report["speedup"] = {
+        name: {workers: round(run[name]["req_per_s"] / baseline[name]["req_per_s"], 2) for workers, run in report["runs"].items()}
+        for name in routes if baseline.get(name, {}).get("req_per_s")
+    }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", required=True, help="serve.py workers are separate processes, so a real MongoDB is needed")
+    parser.add_argument("--db-name", default="alumni_scaling")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--alumni", type=int, default=5000)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per load process")
+    parser.add_argument("--load-processes", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--port", type=int, default=8765)
+    print(json.dumps(main(parser.parse_args()), indent=2))
@@ -0,0 +1,148 @@
+"""Per-request CPU cost of turning route results into response bytes.
+
+Compares the serialization path routes used before orjson ("before") with the
+current one ("after"), on synthetic payloads shaped like the real responses:
+
+- read: a raw dict returned from a route went through ``jsonable_encoder``
+  and ``JSONResponse`` (stdlib json); routes now hand native documents, with
+  BSON datetimes, straight to ``ORJSONResponse``.
+- write: ``POST /api/messages`` built a pydantic model, dumped it, converted
+  the timestamp by hand, then FastAPI re-validated it against
+  ``response_model``; it now builds the document once and serializes it once.
+
+No database or HTTP is involved; numbers are CPU time per simulated request.
+
+    python benchmarks/serialization.py [--alumni 100] [--messages 200] [--iterations 2000]
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from datetime import timedelta
+from pathlib import Path
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', "mongodb://localhost:27017")
+os.environ.setdefault('DB_NAME', "alumni_benchmark")
+import server  # noqa: E402
+
+
+def alumni_page(count: int) -> dict:
+    rng = random.Random(1)
+    items = [{
+        "id": str(uuid.uuid4()),
+        "full_name": f"Alumnus {index}",
+        "university": "Global Horizon University",
+        "passout_year": rng.randint(1990, 2025),
+        "location": "San Francisco, CA",
+        "company": "Acme Corp",
+        "domain": "Technology",
+        "profile_picture": None,
+    } for index in range(count)]
+    return {"items": items, "next_cursor": "WyJhbHVtbnVzIDk5IiwiaWQiXQ"}
+
+
+def message_page(count: int, native: bool) -> dict:
+    started = server.utc_now()
+    sender, receiver = str(uuid.uuid4()), str(uuid.uuid4())
+    items = []
+    for index in range(count):
+        timestamp = started + timedelta(seconds=index)
+        items.append({
+            "id": str(uuid.uuid4()),
+            "conversation_id": server.conversation_key(sender, receiver),
+            "sender_id": sender if index % 2 else receiver,
+            "receiver_id": receiver if index % 2 else sender,
+            "message": f"Message number {index} in a fairly ordinary conversation",
+            "timestamp": timestamp if native else timestamp.isoformat(),
+        })
+    return {"items": items, "before": "cursor", "since": "cursor", "has_more": True}
+
+
+def read_before(payload: dict) -> bytes:
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def read_after(payload: dict) -> bytes:
+    return ORJSONResponse(payload).body
+
+
+MESSAGE_FIELD = create_response_field(name="Response_send_message", type_=server.Message)
+MESSAGE_INPUT = server.MessageCreate(sender_id=str(uuid.uuid4()), receiver_id=str(uuid.uuid4()), message="Hello there!")
+
+
+async def write_before() -> bytes:
+    message = server.Message(
+        **MESSAGE_INPUT.model_dump(),
+        conversation_id=server.conversation_key(MESSAGE_INPUT.sender_id, MESSAGE_INPUT.receiver_id),
+    )
+    doc = message.model_dump()  # inserted into MongoDB
+    doc['timestamp'] = doc['timestamp'].isoformat()
+    message.model_dump_json()  # published to the message stream
+    content = await serialize_response(field=MESSAGE_FIELD, response_content=message)
+    return JSONResponse(content).body
+
+
+async def write_after() -> bytes:
+    doc = {
+        "id": str(uuid.uuid4()),
+        "conversation_id": server.conversation_key(MESSAGE_INPUT.sender_id, MESSAGE_INPUT.receiver_id),
+        **MESSAGE_INPUT.model_dump(),
+        "timestamp": server.utc_now(),
+    }
+    return orjson.dumps(doc)  # shared by the stream and the response
+
+
+def cpu_per_call(func, iterations: int) -> float:
+    func()
+    started = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - started) / iterations
+
+
+def measure(args) -> dict:
+    loop = asyncio.new_event_loop()
+    cases = {
+        f"alumni page ({args.alumni} profiles)": (
+            lambda payload=alumni_page(args.alumni): read_before(payload),
+            lambda payload=alumni_page(args.alumni): read_after(payload),
+        ),
+        f"message page ({args.messages} messages)": (
+            lambda payload=message_page(args.messages, native=False): read_before(payload),
+            lambda payload=message_page(args.messages, native=True): read_after(payload),
+        ),
+        "send message (write path)": (
+            lambda: loop.run_until_complete(write_before()),
+            lambda: loop.run_until_complete(write_after()),
+        ),
+    }
+    results = {}
+    for name, (before, after) in cases.items():
+        before_us = cpu_per_call(before, args.iterations) * 1e6
+        after_us = cpu_per_call(after, args.iterations) * 1e6
+        results[name] = {
+            "before_us": round(before_us, 1),
+            "after_us": round(after_us, 1),
+            "speedup": round(before_us / after_us, 1),
+        }
+    loop.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alumni", type=int, default=100, help="profiles in the directory page")
+    parser.add_argument("--messages", type=int, default=200, help="messages in the conversation page")
+    parser.add_argument("--iterations", type=int, default=2000)
+    print(json.dumps(measure(parser.parse_args()), indent=2))
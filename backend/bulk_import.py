@@ -0,0 +1,212 @@
+"""Streaming bulk import of alumni profiles from CSV or JSONL.
+
+Rows are read lazily from a text stream, validated in fixed-size chunks and
+written with unordered ``insert_many`` batches, so memory use depends on the
+chunk size rather than the file size. Duplicate emails, both against existing
+profiles and within the file, are rejected by the unique ``users.email`` index
+and reported per row alongside validation errors.
+
+    python bulk_import.py alumni.csv [--format csv|jsonl] [--chunk-size 1000]
+"""
+import io
+import csv
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+DUPLICATE_KEY = 11000
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+def detect_format(filename: Optional[str]) -> str:
+    suffix = Path(filename or "").suffix.lower()
+    if suffix not in FORMATS:
+        raise ValueError(f"Cannot infer import format from {filename!r}; expected .csv, .jsonl or .ndjson")
+    return FORMATS[suffix]
+
+
+def iter_records(stream, fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield ``(row_number, record)`` pairs; unparseable rows yield the error instead of a record."""
+    if fmt == "csv":
+        for row_number, row in enumerate(csv.DictReader(stream), start=1):
+            yield row_number, row
+    elif fmt == "jsonl":
+        for row_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield row_number, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield row_number, exc
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def clean_record(record: dict) -> dict:
+    # CSV has no nulls; treat blank cells as absent so optional fields keep their defaults
+    cleaned = {}
+    for key, value in record.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                continue
+        if value is not None:
+            cleaned[key.strip()] = value
+    return cleaned
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors: List[dict] = []
+        self.started = time.perf_counter()
+
+    def error(self, row: int, reason: str):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": reason})
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "errors": self.errors,
+            "errors_truncated": self.duplicates + self.invalid > len(self.errors),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed else None,
+        }
+
+
+def prepare_chunk(
+    records: Iterator[Tuple[int, object]],
+    size: int,
+    build_doc: Callable[[dict], dict],
+    report: ImportReport,
+    finish_docs: Optional[Callable[[List[dict]], None]] = None,
+) -> Tuple[List[dict], List[int]]:
+    docs, rows = [], []
+    for row_number, record in records:
+        report.rows += 1
+        if isinstance(record, Exception):
+            report.invalid += 1
+            report.error(row_number, f"unparseable row: {record}")
+        elif not isinstance(record, dict):
+            report.invalid += 1
+            report.error(row_number, "row is not an object")
+        else:
+            try:
+                docs.append(build_doc(clean_record(record)))
+                rows.append(row_number)
+            except ValidationError as exc:
+                report.invalid += 1
+                report.error(row_number, "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+                ))
+        if len(docs) >= size:
+            break
+    if finish_docs and docs:
+        finish_docs(docs)
+    return docs, rows
+
+
+async def import_users(
+    db,
+    stream,
+    fmt: str,
+    build_doc: Callable[[dict], dict],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_batch: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+    finish_docs: Optional[Callable[[List[dict]], None]] = None,
+) -> dict:
+    """Import ``stream`` into users; ``finish_docs`` runs on each validated chunk in the worker thread."""
+    report = ImportReport()
+    records = iter_records(stream, fmt)
+    while True:
+        # Parsing, validation and password hashing are CPU-bound; keep them off the event loop
+        docs, rows = await asyncio.to_thread(prepare_chunk, records, chunk_size, build_doc, report, finish_docs)
+        if not docs:
+            break
+
+        failed = set()
+        try:
+            await db.users.insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get("writeErrors", []):
+                index = error["index"]
+                failed.add(index)
+                if error.get("code") == DUPLICATE_KEY:
+                    report.duplicates += 1
+                    report.error(rows[index], f"duplicate email {docs[index].get('email')}")
+                else:
+                    report.invalid += 1
+                    report.error(rows[index], error.get("errmsg", "write failed"))
+
+        inserted = [doc for index, doc in enumerate(docs) if index not in failed]
+        report.inserted += len(inserted)
+        if on_batch and inserted:
+            await on_batch(inserted)
+        logger.info("Imported %d of %d rows", report.inserted, report.rows)
+
+    return report.as_dict()
+
+
+async def _main(path: str, fmt: Optional[str], chunk_size: int) -> int:
+    from database import MongoConnection
+    from invalidation import InvalidationBus
+    from server import STATS_DOC_ID, VERSIONS_DOC_ID, hash_imported_passwords, user_doc_from_record, version_bump
+
+    load_dotenv(Path(__file__).parent / '.env')
+    mongo = MongoConnection.from_env()
+    db = await mongo.connect()
+    # Running workers add the imported profiles to their search and recommendation indexes
+    bus = InvalidationBus()
+    bus.bind(db)
+
+    async def count_inserted(docs: List[dict]):
+        await db.counters.update_one({"_id": STATS_DOC_ID}, {"$inc": {"total_alumni": len(docs)}}, upsert=True)
+        await db.counters.update_one({"_id": VERSIONS_DOC_ID}, version_bump("users"), upsert=True)
+        bus.publish("users", [doc["id"] for doc in docs])
+
+    try:
+        with io.open(path, encoding="utf-8-sig", newline="") as stream:
+            report = await import_users(
+                db, stream, fmt or detect_format(path), user_doc_from_record, chunk_size,
+                count_inserted, hash_imported_passwords,
+            )
+    finally:
+        await bus.close()
+        mongo.close()
+
+    print(json.dumps(report, indent=2))
+    return 0 if not (report["invalid"] or report["duplicates"]) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import alumni profiles from CSV or JSONL")
+    parser.add_argument("path", help="CSV or JSONL file with UserCreate fields")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="override format detection by extension")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per insert_many batch")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main(args.path, args.format, args.chunk_size)))
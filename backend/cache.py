@@ -0,0 +1,45 @@
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+
+class TTLCache:
+    """Single cached value refreshed by an async loader at most once per ``ttl`` seconds.
+
+    Concurrent misses share one in-flight load, so an expiry under load costs
+    one backend read instead of one per waiting request.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[Any]], ttl: float):
+        self.loader = loader
+        self.ttl = ttl
+        self.value: Any = None
+        self.expires_at = 0.0
+        self.pending: Optional[asyncio.Future] = None
+        self.generation = 0
+
+    async def get(self) -> Any:
+        if time.monotonic() < self.expires_at:
+            return self.value
+        if self.pending is None:
+            self.pending = asyncio.ensure_future(self._load())
+        pending = self.pending
+        return await asyncio.shield(pending)
+
+    async def _load(self) -> Any:
+        generation = self.generation
+        try:
+            value = await self.loader()
+            # An invalidation while loading means this value may already be stale
+            if generation == self.generation:
+                self.value = value
+                self.expires_at = time.monotonic() + self.ttl
+            return value
+        finally:
+            if generation == self.generation:
+                self.pending = None
+
+    def invalidate(self):
+        self.generation += 1
+        self.expires_at = 0.0
+        self.pending = None
@@ -0,0 +1,180 @@
+"""Response compression for text payloads.
+
+``CompressionMiddleware`` compresses a response when the client accepts it,
+its media type is in ``COMPRESSIBLE_TYPES`` and its body is at least
+``minimum_size`` bytes. It uses brotli when the optional ``brotli`` package
+is installed and the client accepts ``br``, and gzip otherwise. Streamed
+responses (exports) are compressed chunk by chunk with a flush after each,
+so rows still reach the client as they are produced. Event streams, images
+and already-encoded responses pass through untouched.
+
+Re-encoding changes the bytes a strong ETag vouches for, so a compressed
+response's ETag is weakened to ``W/"..."``. ``If-None-Match`` uses weak
+comparison, so revalidation keeps working.
+"""
+import os
+import gzip
+import zlib
+import asyncio
+from typing import Iterable, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/problem+json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+    "text/csv",
+    "text/css",
+    "text/html",
+    "text/plain",
+})
+# Above this size a one-shot body is compressed off the event loop (zlib and brotli release the GIL)
+OFFLOAD_BYTES = 256 * 1024
+
+
+def choose_encoding(accept_encoding: str, available: Iterable[str]) -> Optional[str]:
+    """The first of ``available`` (in server preference order) that the client accepts."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for coding in available:
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        content_types: Iterable[str] = COMPRESSIBLE_TYPES,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.content_types = frozenset(content_types)
+        self.codings: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+
+    def compress(self, coding: str, body: bytes) -> bytes:
+        if coding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def stream(self, coding: str):
+        return _BrotliStream(self.brotli_quality) if coding == "br" else _GzipStream(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept_encoding = Headers(scope=scope).get("accept-encoding")
+        coding = choose_encoding(accept_encoding, self.codings) if accept_encoding else None
+
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is not None:
+                data = encoder.chunk(body) if body else b""
+                if not more_body:
+                    data += encoder.finish()
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            headers = MutableHeaders(raw=list(start.get("headers", ())))
+            start["headers"] = headers.raw
+            media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+            compressible = media_type in self.content_types
+            if compressible:
+                headers.add_vary_header("Accept-Encoding")
+            if (
+                coding is None
+                or not compressible
+                or start["status"] in (204, 206, 304)
+                or "content-encoding" in headers
+                or (not more_body and len(body) < self.minimum_size)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = coding
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            if not more_body:
+                if len(body) >= OFFLOAD_BYTES:
+                    body = await asyncio.to_thread(self.compress, coding, body)
+                else:
+                    body = self.compress(coding, body)
+                headers["Content-Length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+            del headers["Content-Length"]
+            encoder = self.stream(coding)
+            await send(start)
+            await send({"type": "http.response.body", "body": encoder.chunk(body), "more_body": True})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def compression_options_from_env() -> dict:
+    return {
+        "minimum_size": int(os.environ.get('COMPRESSION_MIN_BYTES', '1024')),
+        "gzip_level": int(os.environ.get('GZIP_LEVEL', '6')),
+        "brotli_quality": int(os.environ.get('BROTLI_QUALITY', '4')),
+    }
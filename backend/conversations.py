@@ -0,0 +1,153 @@
+"""Inbox summaries, one document per conversation.
+
+``send_message`` upserts the conversation alongside the message insert:
+
+    {"_id": "<user a>:<user b>", "participants": [a, b],
+     "last_message": {"id", "sender_id", "preview", "timestamp"}, "last_timestamp": ...,
+     "unread": {a: 0, b: 3}, "profiles": {a: {"full_name", "profile_picture"}, b: {...}}}
+
+so ``GET /api/inbox/{user_id}`` is a single query on the
+``participants_recency`` index, newest conversation first, with everything
+a row needs. ``last_message`` only moves forward in time, so of two racing
+sends the newer one stays as the preview whichever write lands last. Unread
+counters are incremented for the receiver on send and reset by the
+mark-read route. Participant profiles are filled in once, when
+the conversation is created, and refreshed when a profile changes.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 140
+PROFILE_FIELDS = ("full_name", "profile_picture")
+PROFILE_PROJECTION = {"_id": 0, "id": 1, "full_name": 1, "profile_picture": 1, "profile_thumbnail": 1}
+INBOX_SORT = [("last_timestamp", -1), ("_id", -1)]
+
+
+def preview(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= PREVIEW_LENGTH else text[:PREVIEW_LENGTH - 1] + "…"
+
+
+def _profile(user: dict) -> dict:
+    # Inbox rows are small, so an uploaded picture is shown as its thumbnail
+    return {"full_name": user.get("full_name"), "profile_picture": user.get("profile_thumbnail") or user.get("profile_picture")}
+
+
+async def fill_profiles(conversations, users, conversation_id: str, user_ids: Iterable[str]):
+    user_ids = sorted(set(user_ids))
+    found = await users.find({"id": {"$in": user_ids}}, PROFILE_PROJECTION).to_list(None)
+    if found:
+        await conversations.update_one(
+            {"_id": conversation_id}, {"$set": {f"profiles.{user['id']}": _profile(user) for user in found}}
+        )
+
+
+async def record_message(conversations, users, message: dict):
+    sender, receiver = message["sender_id"], message["receiver_id"]
+    last_message = {
+        "id": message["id"],
+        "sender_id": sender,
+        "preview": preview(message["message"]),
+        "timestamp": message["timestamp"],
+    }
+    update = {
+        "$max": {"last_timestamp": message["timestamp"]},
+        "$setOnInsert": {"participants": sorted({sender, receiver}), "last_message": last_message},
+    }
+    if sender != receiver:
+        update["$inc"] = {f"unread.{receiver}": 1}
+        update["$setOnInsert"][f"unread.{sender}"] = 0
+    conversation = await conversations.find_one_and_update(
+        {"_id": message["conversation_id"]}, update,
+        projection={"profiles": 1, "last_message.id": 1}, upsert=True, return_document=ReturnDocument.AFTER,
+    )
+    if conversation["last_message"]["id"] != message["id"]:
+        await conversations.update_one(
+            {"_id": message["conversation_id"], "last_message.timestamp": {"$lte": message["timestamp"]}},
+            {"$set": {"last_message": last_message}},
+        )
+    missing = [user_id for user_id in (sender, receiver) if user_id not in (conversation.get("profiles") or {})]
+    if missing:
+        # First message of the conversation
+        await fill_profiles(conversations, users, message["conversation_id"], missing)
+
+
+def inbox_row(conversation: dict, user_id: str) -> dict:
+    others = [participant for participant in conversation["participants"] if participant != user_id]
+    other_id = others[0] if others else user_id
+    profiles = conversation.get("profiles") or {}
+    return {
+        "conversation_id": conversation["_id"],
+        "other_user": {"id": other_id, **profiles.get(other_id, {field: None for field in PROFILE_FIELDS})},
+        "last_message": conversation["last_message"],
+        "unread": (conversation.get("unread") or {}).get(user_id, 0),
+    }
+
+
+async def inbox_page(conversations, user_id: str, limit: int, after: Optional[list] = None) -> List[dict]:
+    query: Dict = {"participants": user_id}
+    if after:
+        last_timestamp, last_id = after
+        query["$or"] = [
+            {"last_timestamp": {"$lt": last_timestamp}},
+            {"last_timestamp": last_timestamp, "_id": {"$lt": last_id}},
+        ]
+    return await conversations.find(query).sort(INBOX_SORT).limit(limit + 1).to_list(limit + 1)
+
+
+async def mark_read(conversations, conversation_id: str, user_id: str) -> bool:
+    result = await conversations.update_one(
+        {"_id": conversation_id, "participants": user_id}, {"$set": {f"unread.{user_id}": 0}}
+    )
+    return result.matched_count > 0
+
+
+async def refresh_profile(conversations, user: dict):
+    await conversations.update_many(
+        {"participants": user["id"]}, {"$set": {f"profiles.{user['id']}": _profile(user)}}
+    )
+
+
+async def backfill(db, batch_size: int = 1000) -> int:
+    """Build summaries for conversations that predate this collection; unread counts start at zero."""
+    if await db.conversations.estimated_document_count() or not await db.messages.estimated_document_count():
+        return 0
+    pipeline = [
+        {"$sort": {"conversation_id": 1, "timestamp": -1, "id": -1}},
+        {"$group": {"_id": "$conversation_id", "last": {"$first": "$$ROOT"}}},
+    ]
+    ops, created = [], 0
+    async for group in db.messages.aggregate(pipeline, allowDiskUse=True):
+        last = group["last"]
+        participants = sorted({last["sender_id"], last["receiver_id"]})
+        ops.append(UpdateOne({"_id": group["_id"]}, {"$setOnInsert": {
+            "participants": participants,
+            "last_message": {
+                "id": last["id"],
+                "sender_id": last["sender_id"],
+                "preview": preview(last["message"]),
+                "timestamp": last["timestamp"],
+            },
+            "last_timestamp": last["timestamp"],
+            "unread": {participant: 0 for participant in participants},
+        }}, upsert=True))
+        if len(ops) >= batch_size:
+            created += (await db.conversations.bulk_write(ops, ordered=False)).upserted_count
+            ops = []
+    if ops:
+        created += (await db.conversations.bulk_write(ops, ordered=False)).upserted_count
+
+    profiles: Dict[str, dict] = {}
+    async for conversation in db.conversations.find({"profiles": {"$exists": False}}, {"participants": 1}):
+        missing = [user_id for user_id in conversation["participants"] if user_id not in profiles]
+        if missing:
+            async for user in db.users.find({"id": {"$in": missing}}, PROFILE_PROJECTION):
+                profiles[user["id"]] = _profile(user)
+        known = {user_id: profiles[user_id] for user_id in conversation["participants"] if user_id in profiles}
+        await db.conversations.update_one({"_id": conversation["_id"]}, {"$set": {"profiles": known}})
+    logger.info("Built %d conversation summaries from existing messages", created)
+    return created
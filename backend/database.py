@@ -0,0 +1,264 @@
+"""MongoDB client lifecycle, pool configuration and pool monitoring.
+
+``MongoConnection`` owns the Motor client for one worker process. It is
+created from the environment at import time but only connects inside the
+app lifespan, where it also pre-warms the pool so the first requests after a
+deploy do not pay for TCP/TLS handshakes and server selection.
+
+Pool sizes are per process: with N workers the server sees up to
+N x ``MONGO_MAX_POOL_SIZE`` connections. Options set here take precedence
+over the same options in ``MONGO_URL``.
+
+    MONGO_MAX_POOL_SIZE=100  MONGO_MIN_POOL_SIZE=10  MONGO_MAX_IDLE_TIME_MS=300000
+    MONGO_CONNECT_TIMEOUT_MS=5000  MONGO_SERVER_SELECTION_TIMEOUT_MS=5000
+    MONGO_SOCKET_TIMEOUT_MS=  MONGO_WAIT_QUEUE_TIMEOUT_MS=  MONGO_READ_PREFERENCE=primary
+    MONGO_WRITE_CONCERNS=feedback=1,donations=majority
+    MONGO_WARM_CONNECTIONS=<min pool size>  MONGO_WARMUP_TIMEOUT_SECONDS=5
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.write_concern import WriteConcern
+
+logger = logging.getLogger(__name__)
+
+# Feedback is fire-and-forget; a donation must survive a primary failover once acknowledged
+DEFAULT_WRITE_CONCERNS = "feedback=1,donations=majority"
+
+
+def parse_write_concerns(spec: str) -> Dict[str, WriteConcern]:
+    """Parse ``collection=w`` pairs, e.g. ``feedback=1,donations=majority``."""
+    concerns = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        collection, _, w = item.partition("=")
+        w = w.strip()
+        if not collection.strip() or not w:
+            raise ValueError(f"Invalid write concern entry: {item!r}")
+        concerns[collection.strip()] = WriteConcern(w=int(w) if w.isdigit() else w)
+    return concerns
+
+
+def _int_env(name: str, default: Optional[int] = None) -> Optional[int]:
+    value = os.environ.get(name, '')
+    return int(value) if value.strip() else default
+
+
+def client_options_from_env() -> dict:
+    options = {
+        "tz_aware": True,
+        "appname": os.environ.get('MONGO_APP_NAME', 'alumni-network'),
+        "maxPoolSize": _int_env('MONGO_MAX_POOL_SIZE', 100),
+        "minPoolSize": _int_env('MONGO_MIN_POOL_SIZE', 10),
+        "maxIdleTimeMS": _int_env('MONGO_MAX_IDLE_TIME_MS', 300000),
+        "connectTimeoutMS": _int_env('MONGO_CONNECT_TIMEOUT_MS', 5000),
+        "serverSelectionTimeoutMS": _int_env('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+        "readPreference": os.environ.get('MONGO_READ_PREFERENCE', 'primary'),
+    }
+    # Unset means no limit, which is pymongo's default for both
+    socket_timeout = _int_env('MONGO_SOCKET_TIMEOUT_MS')
+    if socket_timeout is not None:
+        options["socketTimeoutMS"] = socket_timeout
+    wait_queue_timeout = _int_env('MONGO_WAIT_QUEUE_TIMEOUT_MS')
+    if wait_queue_timeout is not None:
+        options["waitQueueTimeoutMS"] = wait_queue_timeout
+    return options
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Live connection counts per server, from pymongo's connection pool events."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.servers: Dict[str, Dict[str, int]] = {}
+
+    def _update(self, event, **changes):
+        address = "%s:%s" % event.address
+        with self.lock:
+            counts = self.servers.setdefault(address, {
+                "open": 0, "in_use": 0, "waiting": 0, "created": 0, "checkout_failures": 0, "cleared": 0,
+            })
+            for key, delta in changes.items():
+                counts[key] += delta
+
+    def pool_created(self, event):
+        self._update(event)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._update(event, cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._update(event, open=1, created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(event, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._update(event, waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._update(event, waiting=-1, in_use=1)
+
+    def connection_checked_in(self, event):
+        self._update(event, in_use=-1)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self.lock:
+            return {address: dict(counts) for address, counts in self.servers.items()}
+
+
+class ConfiguredDatabase:
+    """A Motor database whose collections carry their configured write concern.
+
+    ``db.feedback`` and ``db["feedback"]`` return the same collection handle,
+    created once with the write concern from ``MONGO_WRITE_CONCERNS``.
+    """
+
+    def __init__(self, database, write_concerns: Dict[str, WriteConcern]):
+        self.database = database
+        self.write_concerns = write_concerns
+        self.collections = {}
+
+    @property
+    def name(self) -> str:
+        return self.database.name
+
+    def __getitem__(self, name: str):
+        collection = self.collections.get(name)
+        if collection is None:
+            write_concern = self.write_concerns.get(name)
+            if write_concern is None:
+                collection = self.database[name]
+            else:
+                collection = self.database.get_collection(name, write_concern=write_concern)
+            self.collections[name] = collection
+        return collection
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, *args, **kwargs):
+        return await self.database.command(*args, **kwargs)
+
+
+class MongoConnection:
+    def __init__(
+        self,
+        url: str,
+        db_name: str,
+        options: dict,
+        write_concerns: Dict[str, WriteConcern],
+        warm_connections: int,
+        warmup_timeout: float = 5.0,
+        event_listeners: Optional[List] = None,
+    ):
+        self.url = url
+        self.db_name = db_name
+        self.options = options
+        self.write_concerns = write_concerns
+        self.warm_connections = warm_connections
+        self.warmup_timeout = warmup_timeout
+        self.event_listeners = list(event_listeners or [])
+        self.pool = PoolMonitor()
+        # Benchmarks swap in an in-memory client here
+        self.client_factory: Optional[Callable[[], object]] = None
+        self.client = None
+        self.db: Optional[ConfiguredDatabase] = None
+
+    @classmethod
+    def from_env(cls, event_listeners: Optional[List] = None) -> "MongoConnection":
+        options = client_options_from_env()
+        return cls(
+            os.environ['MONGO_URL'],
+            os.environ['DB_NAME'],
+            options,
+            parse_write_concerns(os.environ.get('MONGO_WRITE_CONCERNS', DEFAULT_WRITE_CONCERNS)),
+            warm_connections=_int_env('MONGO_WARM_CONNECTIONS', options["minPoolSize"]),
+            warmup_timeout=float(os.environ.get('MONGO_WARMUP_TIMEOUT_SECONDS', '5')),
+            event_listeners=event_listeners,
+        )
+
+    async def connect(self) -> ConfiguredDatabase:
+        if self.db is not None:
+            return self.db
+        if self.client_factory is not None:
+            self.client = self.client_factory()
+        else:
+            self.client = AsyncIOMotorClient(
+                self.url, **self.options, event_listeners=[*self.event_listeners, self.pool]
+            )
+        self.db = ConfiguredDatabase(self.client[self.db_name], self.write_concerns)
+        await self.warm()
+        return self.db
+
+    async def warm(self):
+        """Select a server and open ``warm_connections`` pooled connections before serving traffic."""
+        started = time.perf_counter()
+        # Fails fast (after serverSelectionTimeoutMS) when MongoDB is unreachable
+        await self.db.command("ping")
+        if self.warm_connections > 1:
+            # Concurrent pings each check out their own connection, growing the pool
+            await asyncio.gather(*(self.db.command("ping") for _ in range(self.warm_connections)))
+        deadline = started + self.warmup_timeout
+        while self.open_connections() < min(self.warm_connections, self.options.get("maxPoolSize") or 1):
+            # The driver tops the pool up to minPoolSize in the background
+            if time.perf_counter() >= deadline or self.client_factory is not None:
+                break
+            await asyncio.sleep(0.05)
+        logger.info(
+            "MongoDB ready in %.0f ms with %d pooled connections",
+            (time.perf_counter() - started) * 1000, self.open_connections(),
+        )
+
+    def open_connections(self) -> int:
+        return sum(counts["open"] for counts in self.pool.snapshot().values())
+
+    def pool_stats(self) -> dict:
+        max_size = self.options.get("maxPoolSize") or 0
+        servers = {}
+        for address, counts in self.pool.snapshot().items():
+            servers[address] = {
+                **counts,
+                "utilization": round(counts["in_use"] / max_size, 3) if max_size else None,
+            }
+        return {
+            "max_pool_size": max_size,
+            "min_pool_size": self.options.get("minPoolSize"),
+            "read_preference": self.options.get("readPreference"),
+            "servers": servers,
+        }
+
+    def pool_totals(self) -> dict:
+        totals = {"open": 0, "in_use": 0, "waiting": 0, "checkout_failures": 0}
+        for counts in self.pool.snapshot().values():
+            for key in totals:
+                totals[key] += counts[key]
+        totals["max_size"] = self.options.get("maxPoolSize") or 0
+        return totals
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.db = None
@@ -0,0 +1,197 @@
+"""Donation totals by purpose, month and donor cohort, maintained incrementally.
+
+Each bucket is one document in ``donation_rollups``:
+``{"_id": "purpose:Scholarship Fund", "dimension": "purpose", "key":
+"Scholarship Fund", "amount_cents": ..., "count": ...}``. ``create_donation``
+adds the donation to its purpose, month (``YYYY-MM``, UTC) and cohort
+(donor's ``passout_year``) buckets and to the grand total with ``$inc``
+upserts in one bulk write, so ``/api/donations/analytics`` reads a handful of
+documents no matter how many donations exist. Amounts are kept in integer
+cents so the counters add up exactly.
+
+The rebuild job recomputes every bucket from the full donations collection
+with one vectorized pandas pass and compares it with the stored counters:
+
+    python donation_rollups.py            # report drift, exit 1 if any
+    python donation_rollups.py --repair   # also correct the drifted buckets
+
+A repair applies the difference as an ``$inc`` rather than overwriting, so
+donations recorded while it runs are not lost.
+"""
+import sys
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ("purpose", "month", "cohort")
+TOTAL_ID = "total:all"
+UNKNOWN_COHORT = "unknown"
+VERIFY_ATTEMPTS = 3
+
+Buckets = Dict[str, Tuple[int, int]]
+
+
+def to_cents(amount: float) -> int:
+    return int(round(float(amount) * 100))
+
+
+def bucket_id(dimension: str, key: str) -> str:
+    return f"{dimension}:{key}"
+
+
+def cohort_key(passout_year: Optional[int]) -> str:
+    return str(passout_year) if passout_year is not None else UNKNOWN_COHORT
+
+
+def bucket_keys(donation: dict, passout_year: Optional[int]) -> Dict[str, str]:
+    timestamp: datetime = donation["timestamp"]
+    return {
+        "purpose": donation["purpose"],
+        "month": timestamp.strftime("%Y-%m"),
+        "cohort": cohort_key(passout_year),
+    }
+
+
+def _inc(bucket: str, dimension: str, key: str, cents: int, count: int) -> UpdateOne:
+    return UpdateOne(
+        {"_id": bucket},
+        {"$inc": {"amount_cents": cents, "count": count}, "$setOnInsert": {"dimension": dimension, "key": key}},
+        upsert=True,
+    )
+
+
+async def record_donation(collection, donation: dict, passout_year: Optional[int]):
+    cents = to_cents(donation["amount"])
+    ops = [_inc(TOTAL_ID, "total", "all", cents, 1)]
+    for dimension, key in bucket_keys(donation, passout_year).items():
+        ops.append(_inc(bucket_id(dimension, key), dimension, key, cents, 1))
+    await collection.bulk_write(ops, ordered=False)
+
+
+def _bucket(doc: dict) -> dict:
+    return {"key": doc["key"], "amount": doc["amount_cents"] / 100, "count": doc["count"]}
+
+
+async def read_analytics(collection) -> dict:
+    result = {"total": {"amount": 0.0, "count": 0}, **{f"by_{dimension}": [] for dimension in DIMENSIONS}}
+    async for doc in collection.find({}):
+        if doc["_id"] == TOTAL_ID:
+            result["total"] = {"amount": doc["amount_cents"] / 100, "count": doc["count"]}
+        elif doc.get("dimension") in DIMENSIONS:
+            result[f"by_{doc['dimension']}"].append(_bucket(doc))
+    result["by_purpose"].sort(key=lambda bucket: (-bucket["amount"], bucket["key"]))
+    result["by_month"].sort(key=lambda bucket: bucket["key"])
+    result["by_cohort"].sort(key=lambda bucket: bucket["key"])
+    return result
+
+
+async def stored_buckets(collection) -> Buckets:
+    return {doc["_id"]: (doc["amount_cents"], doc["count"]) async for doc in collection.find({})}
+
+
+async def compute_buckets(db, batch_size: int = 10000) -> Buckets:
+    """Recompute every bucket from ``db.donations`` in one vectorized pass."""
+    import numpy as np
+    import pandas as pd
+
+    columns: Dict[str, list] = {"user_id": [], "amount": [], "purpose": [], "timestamp": []}
+    projection = {"_id": 0, **{column: 1 for column in columns}}
+    async for donation in db.donations.find({}, projection).batch_size(batch_size):
+        for column, values in columns.items():
+            values.append(donation.get(column))
+    if not columns["user_id"]:
+        return {}
+    frame = pd.DataFrame(columns)
+
+    cohorts = {}
+    donors = frame["user_id"].dropna().unique().tolist()
+    for start in range(0, len(donors), batch_size):
+        chunk = donors[start:start + batch_size]
+        async for user in db.users.find({"id": {"$in": chunk}}, {"_id": 0, "id": 1, "passout_year": 1}):
+            cohorts[user["id"]] = cohort_key(user.get("passout_year"))
+
+    frame["cents"] = np.rint(frame["amount"].astype("float64") * 100).astype("int64")
+    frame["month"] = pd.to_datetime(frame["timestamp"], utc=True).dt.strftime("%Y-%m")
+    frame["cohort"] = frame["user_id"].map(cohorts).fillna(UNKNOWN_COHORT)
+
+    buckets: Buckets = {TOTAL_ID: (int(frame["cents"].sum()), len(frame))}
+    for dimension in DIMENSIONS:
+        grouped = frame.groupby(dimension, sort=False)["cents"].agg(["sum", "size"])
+        for key, cents, count in zip(grouped.index, grouped["sum"], grouped["size"]):
+            buckets[bucket_id(dimension, str(key))] = (int(cents), int(count))
+    return buckets
+
+
+def diff_buckets(expected: Buckets, stored: Buckets) -> Dict[str, Tuple[int, int]]:
+    """Per bucket, the (cents, count) that must be added to ``stored`` to reach ``expected``."""
+    drift = {}
+    for bucket in expected.keys() | stored.keys():
+        cents, count = expected.get(bucket, (0, 0))
+        stored_cents, stored_count = stored.get(bucket, (0, 0))
+        if (cents, count) != (stored_cents, stored_count):
+            drift[bucket] = (cents - stored_cents, count - stored_count)
+    return drift
+
+
+async def verify(db, repair: bool = False) -> dict:
+    collection = db.donation_rollups
+    for _ in range(VERIFY_ATTEMPTS):
+        before = await stored_buckets(collection)
+        expected = await compute_buckets(db)
+        after = await stored_buckets(collection)
+        # A donation was recorded mid-scan, so the scan and the counters may disagree; look again
+        if before == after:
+            break
+    else:
+        raise RuntimeError("Donations kept arriving during verification; retry in a quieter period")
+
+    drift = diff_buckets(expected, after)
+    if repair and drift:
+        ops = []
+        for bucket, (cents, count) in drift.items():
+            dimension, _, key = bucket.partition(":")
+            ops.append(_inc(bucket, dimension, key, cents, count))
+        await collection.bulk_write(ops, ordered=False)
+        # Buckets whose donations were all removed
+        await collection.delete_many({"count": 0, "_id": {"$in": list(drift)}})
+    return {
+        "buckets": len(expected),
+        "donations": expected.get(TOTAL_ID, (0, 0))[1],
+        "drifted": sorted(drift),
+        "repaired": repair and bool(drift),
+    }
+
+
+async def _main(repair: bool) -> int:
+    from database import MongoConnection
+
+    load_dotenv(Path(__file__).parent / '.env')
+    mongo = MongoConnection.from_env()
+    try:
+        report = await verify(await mongo.connect(), repair)
+    finally:
+        mongo.close()
+    logger.info(
+        "Checked %d buckets over %d donations; %d drifted%s",
+        report["buckets"], report["donations"], len(report["drifted"]),
+        " and were repaired" if report["repaired"] else "",
+    )
+    for bucket in report["drifted"]:
+        logger.warning("Drifted bucket: %s", bucket)
+    return 0 if repair or not report["drifted"] else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify (and optionally repair) the donation rollups")
+    parser.add_argument("--repair", action="store_true", help="correct drifted buckets in place")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main(args.repair)))
@@ -0,0 +1,224 @@
+import hashlib
+import asyncio
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import orjson
+
+# Initial catalog, inserted into the events collection on first start
+SEED_EVENTS = [
+    {
+        "id": "evt1",
+        "title": "Global Alumni Summit 2025",
+        "date": "2025-12-20",
+        "location": "San Francisco, CA",
+        "image": "https://images.unsplash.com/photo-1590650046871-92c887180603",
+        "description": "Join us for our annual alumni summit featuring keynote speakers from Fortune 500 companies, networking sessions, and celebration dinner. Reconnect with classmates and build meaningful professional relationships.",
+        "has_registration": True,
+        "capacity": 1500,
+        "waitlist": True
+    },
+    {
+        "id": "evt2",
+        "title": "Tech Innovation Workshop",
+        "date": "2025-12-25",
+        "location": "Virtual Event",
+        "image": "https://images.unsplash.com/photo-1758520144420-3e5b22e9b9a4",
+        "description": "Explore cutting-edge technologies with industry leaders. Learn about AI, blockchain, and cloud computing through hands-on workshops. Perfect for alumni looking to upskill and stay ahead in their careers.",
+        "has_registration": True,
+        "capacity": 500,
+        "waitlist": True
+    },
+    {
+        "id": "evt3",
+        "title": "Alumni Career Fair",
+        "date": "2026-01-10",
+        "location": "New York, NY",
+        "image": "https://images.unsplash.com/photo-1758599543132-ba9b306d715e",
+        "description": "Meet top recruiters and explore exciting career opportunities across various industries. Network with hiring managers and learn about job openings tailored for our alumni community.",
+        "has_registration": False,
+        "capacity": None
+    },
+    {
+        "id": "evt4",
+        "title": "Winter Homecoming Celebration",
+        "date": "2026-01-15",
+        "location": "Global Horizon Campus",
+        "image": "https://images.pexels.com/photos/34513728/pexels-photo-34513728.jpeg",
+        "description": "Come back to campus for a nostalgic celebration of memories. Tour the new facilities, meet current students, and enjoy an evening of music, food, and reconnecting with old friends.",
+        "has_registration": True,
+        "capacity": 400,
+        "waitlist": True
+    },
+    {
+        "id": "evt5",
+        "title": "Entrepreneurship Mentorship Program Launch",
+        "date": "2026-02-01",
+        "location": "Boston, MA",
+        "image": "https://images.pexels.com/photos/34504392/pexels-photo-34504392.jpeg",
+        "description": "Launch event for our new mentorship program connecting experienced entrepreneurs with aspiring alumni founders. Get guidance, funding advice, and access to our startup ecosystem.",
+        "has_registration": True,
+        "capacity": 150,
+        "waitlist": True
+    },
+    {
+        "id": "evt6",
+        "title": "Spring Sports Tournament",
+        "date": "2026-03-05",
+        "location": "Los Angeles, CA",
+        "image": "https://images.unsplash.com/photo-1577985043696-8bd54d9f093f",
+        "description": "Annual alumni sports tournament featuring basketball, soccer, and tennis competitions. Bring your competitive spirit and team pride for a day of athletics and camaraderie.",
+        "has_registration": False,
+        "capacity": None
+    },
+    {
+        "id": "evt7",
+        "title": "Women in Leadership Conference",
+        "date": "2026-03-20",
+        "location": "Chicago, IL",
+        "image": "https://images.unsplash.com/photo-1590650046871-92c887180603",
+        "description": "Empowering conference celebrating women alumni leaders. Features panel discussions, workshops on career advancement, and networking opportunities with influential female executives.",
+        "has_registration": False,
+        "capacity": None
+    },
+    {
+        "id": "evt8",
+        "title": "Global Alumni Golf Classic",
+        "date": "2026-04-12",
+        "location": "Pebble Beach, CA",
+        "image": "https://images.unsplash.com/photo-1485182708500-e8f1318ba72",
+        "description": "Prestigious golf tournament at world-class venue. Enjoy a day on the greens with fellow alumni, followed by awards ceremony and gala dinner overlooking the Pacific Ocean.",
+        "has_registration": False,
+        "capacity": None
+    },
+    {
+        "id": "evt9",
+        "title": "Alumni Art & Culture Gala",
+        "date": "2026-05-08",
+        "location": "Washington, DC",
+        "image": "https://images.pexels.com/photos/1454360/pexels-photo-1454360.jpeg",
+        "description": "Elegant evening celebrating artistic achievements of our alumni. Features art exhibition, live performances, and fundraising auction supporting arts education programs at Global Horizon.",
+        "has_registration": False,
+        "capacity": None
+    },
+    {
+        "id": "evt10",
+        "title": "50th Anniversary Reunion Weekend",
+        "date": "2026-06-15",
+        "location": "Global Horizon Campus",
+        "image": "https://images.unsplash.com/photo-1541339907198-e08756dedf3f",
+        "description": "Grand celebration marking 50 years of Global Horizon University. Three days of festivities including campus tours, class reunions, special ceremonies, and commemorative gala dinner.",
+        "has_registration": False,
+        "capacity": None
+    }
+]
+
+EVENT_PROJECTION = {"_id": 0}
+EVENT_SORT = [("date", 1), ("id", 1)]
+MAX_CACHED_VIEWS = 128
+
+
+class CachedResponse:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class EventCatalog:
+    """Date-ordered, in-memory copy of the events collection.
+
+    The catalog is loaded once and kept until a write calls ``invalidate``.
+    Responses are serialized once per distinct filter and cached as bytes with
+    a strong ETag, so an unchanged listing costs a dict lookup.
+    """
+
+    def __init__(self):
+        self.collection = None
+        self.events: List[dict] = []
+        self.dates: List[str] = []
+        self.by_id: Dict[str, dict] = {}
+        self.views: "OrderedDict[tuple, CachedResponse]" = OrderedDict()
+        self.loaded = False
+        self.version = 0
+        self.lock = asyncio.Lock()
+
+    def bind(self, collection):
+        self.collection = collection
+        self.invalidate()
+
+    async def seed(self, events: List[dict]):
+        for event in events:
+            await self.collection.update_one({"id": event["id"]}, {"$setOnInsert": event}, upsert=True)
+        self.invalidate()
+
+    async def ensure_loaded(self):
+        if self.loaded:
+            return
+        async with self.lock:
+            if self.loaded:
+                return
+            version = self.version
+            events = await self.collection.find({}, EVENT_PROJECTION).sort(EVENT_SORT).to_list(None)
+            self.events = events
+            self.dates = [event["date"] for event in events]
+            self.by_id = {event["id"]: event for event in events}
+            self.views.clear()
+            # A write that landed mid-load leaves the catalog marked stale for the next reader
+            self.loaded = version == self.version
+
+    def invalidate(self):
+        self.version += 1
+        self.loaded = False
+        self.views.clear()
+
+    async def all(self) -> List[dict]:
+        await self.ensure_loaded()
+        return self.events
+
+    async def get(self, event_id: str) -> Optional[dict]:
+        await self.ensure_loaded()
+        return self.by_id.get(event_id)
+
+    async def upcoming_count(self, today: str) -> int:
+        await self.ensure_loaded()
+        return len(self.dates) - bisect_left(self.dates, today)
+
+    def _select(self, date_from: Optional[str], date_to: Optional[str], has_registration: Optional[bool]) -> List[dict]:
+        start = bisect_left(self.dates, date_from) if date_from else 0
+        end = bisect_right(self.dates, date_to) if date_to else len(self.dates)
+        events = self.events[start:end]
+        if has_registration is not None:
+            events = [event for event in events if event.get("has_registration") == has_registration]
+        return events
+
+    async def response(
+        self,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        has_registration: Optional[bool] = None,
+    ) -> CachedResponse:
+        await self.ensure_loaded()
+        key = (date_from, date_to, has_registration)
+        cached = self.views.get(key)
+        if cached is not None:
+            self.views.move_to_end(key)
+            return cached
+        events = self._select(date_from, date_to, has_registration)
+        cached = CachedResponse(orjson.dumps(events))
+        self.views[key] = cached
+        if len(self.views) > MAX_CACHED_VIEWS:
+            self.views.popitem(last=False)
+        return cached
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison: a W/ prefix on either side (added by the
+    # compression middleware or a proxy) does not prevent a match
+    etag = etag.removeprefix("W/")
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
@@ -0,0 +1,135 @@
+"""Streaming NDJSON/CSV exports of the main collections.
+
+Documents are pulled from a Motor cursor in ``batch_size`` round trips and
+written to the response as each batch arrives, so memory stays flat however
+large the collection is and the first rows go out before the query finishes.
+"""
+import io
+import csv
+from datetime import date, datetime, time, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional
+
+import orjson
+
+from registrations import PENDING, REGISTERED
+
+# Exports use inclusion projections over these allowlists, so passwords and
+# legacy embedded arrays can never be requested
+EXPORTS: Dict[str, dict] = {
+    "alumni": {
+        "collection": "users",
+        "date_field": "created_at",
+        "fields": [
+            "id", "full_name", "email", "university", "passout_year", "location", "company",
+            "domain", "phone", "profile_picture", "registered_events", "donation_total",
+            "donation_count", "created_at",
+        ],
+    },
+    "donations": {
+        "collection": "donations",
+        "date_field": "timestamp",
+        "fields": ["id", "user_id", "name", "email", "phone", "amount", "purpose", "message", "timestamp"],
+    },
+    "event_registrations": {
+        "collection": "event_registrations",
+        "date_field": "timestamp",
+        "fields": [
+            "user_id", "event_id", "status", "waitlist_position", "name", "email", "phone", "attend_dinner",
+            "timestamp",
+        ],
+        # In-flight registrations hold no seat yet; ones from before statuses existed are confirmed
+        "filter": {"status": {"$ne": PENDING}},
+        "defaults": {"status": REGISTERED},
+    },
+    "feedback": {
+        "collection": "feedback",
+        "date_field": "timestamp",
+        "fields": ["id", "name", "email", "message", "timestamp"],
+    },
+}
+
+FLUSH_BYTES = 64 * 1024
+
+
+def export_fields(dataset: str, requested: Optional[str]) -> List[str]:
+    spec = EXPORTS[dataset]
+    if not requested:
+        return list(spec["fields"])
+    fields = [field.strip() for field in requested.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in spec["fields"]]
+    if unknown:
+        raise ValueError(f"Unknown fields for {dataset}: {', '.join(unknown)}")
+    return fields
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def export_query(dataset: str, date_from: Optional[date], date_to: Optional[date]) -> dict:
+    # Whole UTC days, inclusive of date_to
+    date_range = {}
+    if date_from:
+        date_range["$gte"] = day_start(date_from)
+    if date_to:
+        date_range["$lt"] = day_start(date_to + timedelta(days=1))
+    query = dict(EXPORTS[dataset].get("filter", {}))
+    if date_range:
+        query[EXPORTS[dataset]["date_field"]] = date_range
+    return query
+
+
+def _csv_value(value):
+    if isinstance(value, (list, dict)):
+        return orjson.dumps(value).decode()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return "" if value is None else value
+
+
+async def stream_export(
+    collection,
+    fields: List[str],
+    query: dict,
+    fmt: str,
+    batch_size: int,
+    defaults: Optional[dict] = None,
+) -> AsyncIterator[bytes]:
+    projection = {"_id": 0, **{field: 1 for field in fields}}
+    cursor = collection.find(query, projection).batch_size(batch_size)
+    defaults = {field: value for field, value in (defaults or {}).items() if field in fields}
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        pending = 0
+        async for doc in cursor:
+            for field, value in defaults.items():
+                doc.setdefault(field, value)
+            writer.writerow([_csv_value(doc.get(field)) for field in fields])
+            pending += 1
+            # Flush at each cursor batch boundary, or sooner for wide documents
+            if pending >= batch_size or buffer.tell() >= FLUSH_BYTES:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+        return
+
+    lines: List[bytes] = []
+    size = 0
+    async for doc in cursor:
+        for field, value in defaults.items():
+            doc.setdefault(field, value)
+        line = orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE)
+        lines.append(line)
+        size += len(line)
+        if len(lines) >= batch_size or size >= FLUSH_BYTES:
+            yield b"".join(lines)
+            lines.clear()
+            size = 0
+    if lines:
+        yield b"".join(lines)
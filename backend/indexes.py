@@ -0,0 +1,284 @@
+"""Declared MongoDB index catalog and query-plan verification.
+
+``apply_indexes`` is run from the app lifespan and is idempotent: creating an
+index that already exists with the same spec is a no-op on the server. If
+existing profiles share an email, the unique ``users.email`` index cannot be
+built; it raises ``DuplicateKeys`` naming the addresses instead.
+
+Run ``python indexes.py --check`` to apply the catalog and then ``explain()``
+every query shape the API routes issue; the command exits non-zero if any of
+them would plan a COLLSCAN.
+"""
+import os
+import sys
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY_SORT = [("name_key", ASCENDING), ("id", ASCENDING)]
+
+INDEX_CATALOG: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(DIRECTORY_SORT, name="directory"),
+        IndexModel([("company", ASCENDING)] + DIRECTORY_SORT, name="directory_company"),
+        IndexModel([("domain", ASCENDING)] + DIRECTORY_SORT, name="directory_domain"),
+        IndexModel([("passout_year", ASCENDING)] + DIRECTORY_SORT, name="directory_passout_year"),
+        IndexModel([("location", ASCENDING)] + DIRECTORY_SORT, name="directory_location"),
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+    ],
+    "messages": [
+        IndexModel(
+            [("conversation_id", ASCENDING), ("timestamp", ASCENDING), ("id", ASCENDING)],
+            name="conversation_timestamp",
+        ),
+        IndexModel([("receiver_id", ASCENDING), ("timestamp", DESCENDING)], name="receiver_timestamp"),
+    ],
+    "conversations": [
+        # Multikey on participants: one index serves both sides' inboxes
+        IndexModel(
+            [("participants", ASCENDING), ("last_timestamp", DESCENDING), ("_id", DESCENDING)],
+            name="participants_recency",
+        ),
+    ],
+    "donations": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], name="user_timestamp_id"),
+        IndexModel([("timestamp", ASCENDING)], name="timestamp"),
+    ],
+    "events": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("date", ASCENDING), ("id", ASCENDING)], name="date"),
+    ],
+    "event_registration_audit": [
+        IndexModel([("event_id", ASCENDING), ("timestamp", ASCENDING)], name="event_timestamp"),
+    ],
+    "event_registrations": [
+        IndexModel([("event_id", ASCENDING), ("user_id", ASCENDING)], name="event_user_unique", unique=True),
+        IndexModel(
+            [("event_id", ASCENDING), ("status", ASCENDING), ("waitlist_position", ASCENDING)],
+            name="event_status_waitlist",
+        ),
+        IndexModel([("timestamp", ASCENDING)], name="timestamp"),
+    ],
+    "feedback": [
+        IndexModel([("timestamp", ASCENDING)], name="timestamp"),
+    ],
+    "cache_invalidations": [
+        # Workers only look back a few seconds; entries are kept an hour for debugging
+        IndexModel([("at", ASCENDING)], name="at_ttl", expireAfterSeconds=3600),
+    ],
+}
+
+SAMPLE_ID = "00000000-0000-0000-0000-000000000000"
+SAMPLE_OTHER_ID = "ffffffff-ffff-ffff-ffff-ffffffffffff"
+CONVERSATION_ID = f"{SAMPLE_ID}:{SAMPLE_OTHER_ID}"
+SAMPLE_TIMESTAMP = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+# One entry per query shape issued by a route in server.py, with placeholder values
+QUERY_SHAPES = [
+    {"route": "register / login", "find": "users", "filter": {"email": "a@example.com"}},
+    {"route": "get_user", "find": "users", "filter": {"id": SAMPLE_ID}},
+    {"route": "update_user", "update": "users", "filter": {"id": SAMPLE_ID}},
+    {"route": "register_event", "update": "users", "filter": {"id": SAMPLE_ID}},
+    {
+        "route": "register_event (registration)",
+        "update": "event_registrations",
+        "filter": {"event_id": "evt1", "user_id": SAMPLE_ID},
+    },
+    {
+        "route": "upsert_event (waitlist promotion)",
+        "find": "event_registrations",
+        "filter": {"event_id": "evt1", "status": "waitlisted"},
+        "sort": [("waitlist_position", ASCENDING)],
+    },
+    {"route": "create_donation", "update": "users", "filter": {"id": SAMPLE_ID}},
+    {
+        "route": "get_user_donations",
+        "find": "donations",
+        "filter": {
+            "user_id": SAMPLE_ID,
+            "$or": [{"timestamp": {"$lt": SAMPLE_TIMESTAMP}}, {"timestamp": SAMPLE_TIMESTAMP, "id": {"$lt": SAMPLE_ID}}],
+        },
+        "sort": [("timestamp", DESCENDING), ("id", DESCENDING)],
+    },
+    {"route": "get_alumni", "find": "users", "filter": {}, "sort": DIRECTORY_SORT},
+    {
+        "route": "get_alumni (cursor)",
+        "find": "users",
+        "filter": {"$or": [{"name_key": {"$gt": "m"}}, {"name_key": "m", "id": {"$gt": SAMPLE_ID}}]},
+        "sort": DIRECTORY_SORT,
+    },
+    {"route": "get_alumni (name)", "find": "users", "filter": {"name_key": {"$regex": "^ali"}}, "sort": DIRECTORY_SORT},
+    {"route": "get_alumni (company)", "find": "users", "filter": {"company": "Acme"}, "sort": DIRECTORY_SORT},
+    {"route": "get_alumni (domain)", "find": "users", "filter": {"domain": "Technology"}, "sort": DIRECTORY_SORT},
+    {"route": "get_alumni (passout_year)", "find": "users", "filter": {"passout_year": 2020}, "sort": DIRECTORY_SORT},
+    {"route": "get_alumni (location)", "find": "users", "filter": {"location": "Boston, MA"}, "sort": DIRECTORY_SORT},
+    {"route": "get_events", "find": "events", "filter": {}, "sort": [("date", ASCENDING), ("id", ASCENDING)]},
+    {"route": "upsert_event", "update": "events", "filter": {"id": "evt1"}},
+    {"route": "search_alumni", "find": "users", "filter": {"id": {"$in": [SAMPLE_ID, SAMPLE_OTHER_ID]}}},
+    # Unfiltered exports read whole collections by design; only date-ranged exports are checked
+    {"route": "export_dataset (alumni)", "find": "users", "filter": {"created_at": {"$gte": SAMPLE_TIMESTAMP}}},
+    {"route": "export_dataset (donations)", "find": "donations", "filter": {"timestamp": {"$gte": SAMPLE_TIMESTAMP}}},
+    {
+        "route": "export_dataset (event_registrations)",
+        "find": "event_registrations",
+        "filter": {"timestamp": {"$gte": SAMPLE_TIMESTAMP}},
+    },
+    {"route": "export_dataset (feedback)", "find": "feedback", "filter": {"timestamp": {"$gte": SAMPLE_TIMESTAMP}}},
+    {
+        "route": "get_messages",
+        "find": "messages",
+        "filter": {"conversation_id": CONVERSATION_ID},
+        "sort": [("timestamp", DESCENDING), ("id", DESCENDING)],
+    },
+    {
+        "route": "get_messages (before)",
+        "find": "messages",
+        "filter": {
+            "conversation_id": CONVERSATION_ID,
+            "$or": [{"timestamp": {"$lt": SAMPLE_TIMESTAMP}}, {"timestamp": SAMPLE_TIMESTAMP, "id": {"$lt": SAMPLE_ID}}],
+        },
+        "sort": [("timestamp", DESCENDING), ("id", DESCENDING)],
+    },
+    {
+        "route": "get_messages (since)",
+        "find": "messages",
+        "filter": {
+            "conversation_id": CONVERSATION_ID,
+            "$or": [{"timestamp": {"$gt": SAMPLE_TIMESTAMP}}, {"timestamp": SAMPLE_TIMESTAMP, "id": {"$gt": SAMPLE_ID}}],
+        },
+        "sort": [("timestamp", ASCENDING), ("id", ASCENDING)],
+    },
+    {
+        "route": "get_inbox",
+        "find": "conversations",
+        "filter": {"participants": SAMPLE_ID},
+        "sort": [("last_timestamp", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "route": "get_inbox (cursor)",
+        "find": "conversations",
+        "filter": {
+            "participants": SAMPLE_ID,
+            "$or": [
+                {"last_timestamp": {"$lt": SAMPLE_TIMESTAMP}},
+                {"last_timestamp": SAMPLE_TIMESTAMP, "_id": {"$lt": CONVERSATION_ID}},
+            ],
+        },
+        "sort": [("last_timestamp", DESCENDING), ("_id", DESCENDING)],
+    },
+    {"route": "update_user (conversation profiles)", "update": "conversations", "filter": {"participants": SAMPLE_ID}},
+    {
+        "route": "cache bus (poll)",
+        "find": "cache_invalidations",
+        "filter": {"at": {"$gte": SAMPLE_TIMESTAMP}},
+        "sort": [("at", ASCENDING), ("_id", ASCENDING)],
+    },
+]
+
+
+class DuplicateKeys(RuntimeError):
+    pass
+
+
+async def duplicate_emails(users, limit: int = 20) -> List[dict]:
+    """Emails held by more than one profile, which would fail the ``email_unique`` build."""
+    if "email_unique" in await users.index_information():
+        return []
+    pipeline = [
+        {"$group": {"_id": "$email", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": limit},
+    ]
+    return await users.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+
+async def apply_indexes(db):
+    # Unlike duplicate registrations, duplicate accounts carry their own history, so
+    # they are reported for someone to merge rather than deleted here
+    duplicates = await duplicate_emails(db.users)
+    if duplicates:
+        listed = ", ".join(f"{group['_id']} ({group['count']} profiles)" for group in duplicates)
+        raise DuplicateKeys(
+            f"Cannot build the unique users.email index; merge or remove the duplicate accounts first: {listed}"
+        )
+    for collection, models in INDEX_CATALOG.items():
+        names = await db[collection].create_indexes(models)
+        logger.info("Indexes ensured on %s: %s", collection, ", ".join(names))
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+async def explain_shape(db, shape: dict) -> dict:
+    if "find" in shape:
+        command = {"find": shape["find"], "filter": shape["filter"]}
+        if shape.get("sort"):
+            command["sort"] = dict(shape["sort"])
+    else:
+        command = {
+            "update": shape["update"],
+            "updates": [{"q": shape["filter"], "u": {"$set": {"_explain": True}}}],
+        }
+    explained = await db.command({"explain": command, "verbosity": "queryPlanner"})
+    return explained["queryPlanner"]["winningPlan"]
+
+
+async def check_query_plans(db) -> List[str]:
+    """Return a description of every route query shape whose winning plan is a COLLSCAN."""
+    failures = []
+    for shape in QUERY_SHAPES:
+        plan = await explain_shape(db, shape)
+        stages = list(_plan_stages(plan))
+        collection = shape.get("find") or shape.get("update")
+        if "COLLSCAN" in stages:
+            failures.append(f"{shape['route']} on {collection}: {' <- '.join(stages)}")
+        else:
+            logger.info("%s on %s: %s", shape["route"], collection, " <- ".join(stages))
+    return failures
+
+
+async def _main(check: bool) -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        await apply_indexes(db)
+        if not check:
+            return 0
+        failures = await check_query_plans(db)
+    finally:
+        client.close()
+
+    for failure in failures:
+        logger.error("COLLSCAN planned for %s", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the index catalog and optionally verify query plans")
+    parser.add_argument("--check", action="store_true", help="fail if any route query shape plans a COLLSCAN")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main(args.check)))
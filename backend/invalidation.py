@@ -0,0 +1,270 @@
+"""Cross-worker cache invalidation over a MongoDB collection.
+
+Each worker keeps its own in-memory caches (the event catalog, stats, the
+directory version, the search and recommendation indexes). After a write,
+a worker updates its own caches directly and calls
+``bus.publish(topic, keys)`` to tell the other workers. Publishes are
+coalesced for ``flush_interval`` and written to ``cache_invalidations`` as
+
+    {"_id": ObjectId, "topic": "users", "keys": [...], "origin": "<worker>", "at": <server time>}
+
+Every worker receives the other workers' entries and runs the handlers
+subscribed to the topic. ``keys=None`` means everything in the topic.
+
+* ``change_stream``: a change stream on the collection. It needs a replica
+  set or sharded cluster. If the stream fails and cannot resume, entries
+  may have been missed, so every handler is called with ``None``.
+* ``poll``: for a standalone mongod. Every ``poll_interval`` it reads
+  entries newer than the last one seen. The window reaches back
+  ``POLL_OVERLAP`` so a write that committed late is not skipped.
+* ``auto``: change streams where the deployment supports them, otherwise
+  polling.
+
+``prepare`` fixes where the bus starts reading and must run before the
+caches are loaded; ``start`` begins delivery once the handlers can run.
+Entries written while the caches load are therefore delivered, not lost.
+``at`` is set by the server, so polling does not depend on worker clocks.
+Entries expire after an hour through a TTL index (see ``indexes.py``).
+"""
+import os
+import uuid
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "cache_invalidations"
+MODES = ("off", "auto", "change_stream", "poll")
+# Entries are split so a large import cannot approach the document size limit
+MAX_KEYS_PER_ENTRY = 1000
+POLL_OVERLAP = timedelta(seconds=5)
+WATCH_PIPELINE = [{"$match": {"operationType": "insert"}}]
+
+Handler = Callable[[Optional[list]], Awaitable[None]]
+
+
+class InvalidationBus:
+    def __init__(self, mode: str = "auto", poll_interval: float = 1.0, flush_interval: float = 0.02):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache bus mode: {mode}")
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.flush_interval = flush_interval
+        self.origin = uuid.uuid4().hex
+        self.handlers: Dict[str, List[Handler]] = {}
+        self.collection = None
+        self.transport: Optional[str] = None
+        self.pending: Dict[str, Optional[list]] = {}
+        self.wake = asyncio.Event()
+        self.tasks: List[asyncio.Task] = []
+        self.resume_token = None
+        self.backlog: List[dict] = []
+        self.since = None
+        self.seen: Dict[ObjectId, object] = {}
+        self.published = 0
+        self.written = 0
+        self.received = 0
+        self.resets = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def subscribe(self, topic: str, handler: Handler):
+        self.handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic: str, keys: Optional[list] = None):
+        """Queue ``keys`` of ``topic`` for the other workers; never blocks the caller on the database."""
+        if self.collection is None:
+            return
+        self.published += 1
+        self._queue(topic, keys)
+
+    def _queue(self, topic: str, keys: Optional[list]):
+        if keys is None or (topic in self.pending and self.pending[topic] is None):
+            self.pending[topic] = None
+        else:
+            self.pending.setdefault(topic, []).extend(keys)
+        self.wake.set()
+
+    def bind(self, db):
+        """Publish only; for processes such as the import CLI that have no caches of their own."""
+        self.collection = db[COLLECTION]
+
+    async def prepare(self, db):
+        """Fix the starting point; entries written after this are delivered once ``start`` runs."""
+        if not self.enabled:
+            return
+        self.bind(db)
+        self.transport = await self._choose_transport()
+        if self.transport == "poll":
+            await self._snapshot()
+
+    def start(self):
+        if not self.enabled or self.transport is None:
+            return
+        logger.info("Cache invalidation bus using %s", self.transport)
+        self.tasks = [
+            asyncio.create_task(self._run_flusher()),
+            asyncio.create_task(self._watch() if self.transport == "change_stream" else self._poll()),
+        ]
+
+    async def _choose_transport(self) -> str:
+        if self.mode == "poll":
+            return "poll"
+        try:
+            async with self.collection.watch(WATCH_PIPELINE, max_await_time_ms=1) as stream:
+                change = await stream.try_next()
+                # _watch resumes from here, so nothing written from now on is missed
+                self.resume_token = stream.resume_token
+                if change is not None:
+                    self.backlog.append(change["fullDocument"])
+            return "change_stream"
+        except Exception as exc:
+            if self.mode == "change_stream":
+                raise
+            logger.info("Change streams unavailable (%s); polling every %.1f s", exc, self.poll_interval)
+            return "poll"
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.pending and self.collection is not None:
+            pending, self.pending = self.pending, {}
+            await self._write(pending)
+        self.collection = None
+
+    async def _run_flusher(self):
+        while True:
+            await self.wake.wait()
+            # Writes in the same burst share one round trip
+            await asyncio.sleep(self.flush_interval)
+            self.wake.clear()
+            pending, self.pending = self.pending, {}
+            try:
+                await self._write(pending)
+            except Exception:
+                self.failures += 1
+                logger.exception("Publishing cache invalidations failed; retrying")
+                for topic, keys in pending.items():
+                    self._queue(topic, keys)
+                await asyncio.sleep(self.poll_interval)
+
+    async def _write(self, pending: Dict[str, Optional[list]]):
+        ops = []
+        for topic, keys in pending.items():
+            chunks = [None] if keys is None else [
+                keys[start:start + MAX_KEYS_PER_ENTRY] for start in range(0, len(keys), MAX_KEYS_PER_ENTRY)
+            ]
+            for chunk in chunks:
+                ops.append(UpdateOne(
+                    {"_id": ObjectId()},
+                    {"$set": {"topic": topic, "keys": chunk, "origin": self.origin}, "$currentDate": {"at": True}},
+                    upsert=True,
+                ))
+        if ops:
+            await self.collection.bulk_write(ops, ordered=True)
+            self.written += len(ops)
+
+    async def _deliver(self, entry: dict):
+        if entry.get("origin") == self.origin:
+            return
+        self.received += 1
+        for handler in self.handlers.get(entry["topic"], ()):
+            try:
+                await handler(entry.get("keys"))
+            except Exception:
+                logger.exception("Cache invalidation handler for %s failed", entry["topic"])
+
+    async def _reset(self):
+        # Entries may have been missed, so every cache starts over
+        self.resets += 1
+        for topic, handlers in self.handlers.items():
+            for handler in handlers:
+                try:
+                    await handler(None)
+                except Exception:
+                    logger.exception("Cache reset for %s failed", topic)
+
+    async def _watch(self):
+        resume_token, self.resume_token = self.resume_token, None
+        backlog, self.backlog = self.backlog, []
+        for entry in backlog:
+            await self._deliver(entry)
+        missed = False
+        while True:
+            try:
+                async with self.collection.watch(WATCH_PIPELINE, resume_after=resume_token) as stream:
+                    if missed:
+                        await self._reset()
+                        missed = False
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        await self._deliver(change["fullDocument"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failures += 1
+                logger.exception("Cache invalidation change stream failed; reopening")
+                # Reopening without a token starts from now, so whatever happened in between is lost
+                resume_token = None
+                missed = True
+                await asyncio.sleep(self.poll_interval)
+
+    async def _snapshot(self):
+        latest = await self.collection.find_one({}, {"at": 1}, sort=[("at", DESCENDING)])
+        self.since = latest["at"] if latest else None
+        self.seen = {}
+        if self.since is not None:
+            # Visible before the caches load, so reflected in them; a late commit is not visible yet
+            async for entry in self.collection.find({"at": {"$gte": self.since - POLL_OVERLAP}}, {"at": 1}):
+                self.seen[entry["_id"]] = entry["at"]
+
+    async def _poll(self):
+        since, seen = self.since, self.seen
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                query = {"at": {"$gte": since - POLL_OVERLAP}} if since is not None else {}
+                async for entry in self.collection.find(query).sort([("at", ASCENDING), ("_id", ASCENDING)]):
+                    since = entry["at"] if since is None else max(since, entry["at"])
+                    if entry["_id"] in seen:
+                        continue
+                    seen[entry["_id"]] = entry["at"]
+                    await self._deliver(entry)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failures += 1
+                logger.exception("Polling cache invalidations failed")
+                continue
+            if since is not None:
+                horizon = since - POLL_OVERLAP
+                seen = {entry_id: at for entry_id, at in seen.items() if at >= horizon}
+
+    def stats(self) -> dict:
+        return {
+            "change_stream": int(self.transport == "change_stream"),
+            "pending_topics": len(self.pending),
+            "published": self.published,
+            "written": self.written,
+            "received": self.received,
+            "resets": self.resets,
+            "failures": self.failures,
+        }
+
+
+def invalidation_bus_from_env() -> InvalidationBus:
+    return InvalidationBus(
+        mode=os.environ.get('CACHE_BUS', 'off'),
+        poll_interval=float(os.environ.get('CACHE_BUS_POLL_MS', '1000')) / 1000,
+        flush_interval=float(os.environ.get('CACHE_BUS_FLUSH_MS', '20')) / 1000,
+    )
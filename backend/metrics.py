@@ -0,0 +1,324 @@
+"""Request and MongoDB instrumentation, rendered in the Prometheus text format.
+
+``MetricsMiddleware`` times every HTTP request and records its status and
+response size against the matched route template. ``MongoCommandListener``
+is registered on the Motor client and times every command per collection;
+the command is also charged to the request it ran for through the
+``current_request`` context variable, which Motor copies into its executor
+threads. ``TimedRoute`` splits a route's handler time at the point the
+endpoint returns, so the remainder (response validation and JSON rendering)
+is reported as serialization time. Requests slower than ``slow_seconds``
+are logged with the DB/serialization breakdown.
+"""
+import time
+import asyncio
+import logging
+import functools
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (1, 5, 10, 50, 100, 250, 500, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestTiming:
+    __slots__ = ("started", "db_seconds", "db_commands", "commands", "endpoint_done", "serialization_seconds")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.db_commands = 0
+        self.commands: Dict[Tuple[str, str], List[float]] = {}
+        self.endpoint_done: Optional[float] = None
+        self.serialization_seconds = 0.0
+
+    def breakdown(self, total: float) -> str:
+        parts = ", ".join(
+            f"{collection}.{command} {int(count)}x {seconds * 1000:.1f} ms"
+            for (collection, command), (count, seconds) in sorted(
+                self.commands.items(), key=lambda item: item[1][1], reverse=True
+            )[:5]
+        )
+        other = max(0.0, total - self.db_seconds - self.serialization_seconds)
+        return (
+            f"db {self.db_seconds * 1000:.1f} ms in {self.db_commands} commands"
+            + (f" ({parts})" if parts else "")
+            + f", serialization {self.serialization_seconds * 1000:.1f} ms, other {other * 1000:.1f} ms"
+        )
+
+
+current_request: ContextVar[Optional[RequestTiming]] = ContextVar("current_request", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Family:
+    def __init__(self, name: str, help: str, kind: str, labelnames: Tuple[str, ...], buckets=None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series: Dict[tuple, object] = {}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in sorted(self.series.items()):
+            if self.kind == "histogram":
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    bucket_labels = _labels(self.labelnames, values, 'le="' + le + '"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {series.sum}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {series.count}")
+            else:
+                lines.append(f"{self.name}{_labels(self.labelnames, values)} {series}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        # Mongo events arrive on Motor's executor threads, HTTP ones on the event loop
+        self.lock = threading.Lock()
+        self.families: Dict[str, Family] = {}
+        self.collectors: List[Tuple[str, str, Callable[[], dict]]] = []
+        self.in_flight = 0
+
+        self.requests = self._family("http_requests_total", "HTTP requests by route and status", "counter",
+                                     ("method", "route", "status"))
+        self.latency = self._family("http_request_duration_seconds", "Time until the response was fully sent",
+                                    "histogram", ("method", "route"), LATENCY_BUCKETS)
+        self.sizes = self._family("http_response_size_bytes", "Response body size", "histogram",
+                                  ("method", "route"), SIZE_BUCKETS)
+        self.request_db = self._family("http_request_db_seconds", "MongoDB time spent per request", "histogram",
+                                       ("method", "route"), LATENCY_BUCKETS)
+        self.serialization = self._family("http_request_serialization_seconds",
+                                          "Response validation and rendering time per request", "histogram",
+                                          ("method", "route"), LATENCY_BUCKETS)
+        self.commands = self._family("mongodb_command_duration_seconds", "MongoDB command round trips",
+                                     "histogram", ("collection", "command"), LATENCY_BUCKETS)
+        self.command_failures = self._family("mongodb_command_failures_total", "MongoDB commands that failed",
+                                             "counter", ("collection", "command"))
+        self.flushes = self._family("write_behind_flush_seconds", "Write-behind insert_many round trips",
+                                    "histogram", ("collection",), LATENCY_BUCKETS)
+        self.flush_sizes = self._family("write_behind_batch_documents", "Documents per write-behind batch",
+                                        "histogram", ("collection",), BATCH_BUCKETS)
+        self.admission_queue = self._family("admission_queue_seconds", "Time admitted requests waited for a slot",
+                                            "histogram", ("method", "route"), LATENCY_BUCKETS)
+        self.admission_shed = self._family("admission_shed_total", "Requests rejected by admission control",
+                                           "counter", ("method", "route", "reason"))
+
+    def _family(self, name, help, kind, labelnames, buckets=None) -> Family:
+        family = self.families[name] = Family(name, help, kind, labelnames, buckets)
+        return family
+
+    def _observe(self, family: Family, labels: tuple, value: float):
+        series = family.series.get(labels)
+        if series is None:
+            series = family.series[labels] = Histogram(family.buckets)
+        series.observe(value)
+
+    def _inc(self, family: Family, labels: tuple, amount: int = 1):
+        family.series[labels] = family.series.get(labels, 0) + amount
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, size: int, timing: RequestTiming):
+        with self.lock:
+            self._inc(self.requests, (method, route, str(status)))
+            self._observe(self.latency, (method, route), seconds)
+            self._observe(self.sizes, (method, route), size)
+            self._observe(self.request_db, (method, route), timing.db_seconds)
+            self._observe(self.serialization, (method, route), timing.serialization_seconds)
+
+    def observe_command(self, collection: str, command: str, seconds: float, failed: bool, timing: Optional[RequestTiming]):
+        with self.lock:
+            self._observe(self.commands, (collection, command), seconds)
+            if failed:
+                self._inc(self.command_failures, (collection, command))
+            if timing is not None:
+                timing.db_seconds += seconds
+                timing.db_commands += 1
+                entry = timing.commands.setdefault((collection, command), [0, 0.0])
+                entry[0] += 1
+                entry[1] += seconds
+
+    def observe_flush(self, collection: str, seconds: float, documents: int):
+        with self.lock:
+            self._observe(self.flushes, (collection,), seconds)
+            self._observe(self.flush_sizes, (collection,), documents)
+
+    def observe_admission(self, method: str, route: str, queued_seconds: float):
+        with self.lock:
+            self._observe(self.admission_queue, (method, route), queued_seconds)
+
+    def observe_shed(self, method: str, route: str, reason: str):
+        with self.lock:
+            self._inc(self.admission_shed, (method, route, reason))
+
+    def add_collector(self, prefix: str, help: str, collect: Callable[[], dict]):
+        """Expose the numeric values of ``collect()`` as ``<prefix>_<key>`` gauges at render time."""
+        self.collectors.append((prefix, help, collect))
+
+    def render(self) -> str:
+        with self.lock:
+            lines = []
+            for family in self.families.values():
+                lines.extend(family.render())
+            lines.append("# HELP http_requests_in_flight Requests currently being served")
+            lines.append("# TYPE http_requests_in_flight gauge")
+            lines.append(f"http_requests_in_flight {self.in_flight}")
+        for prefix, help, collect in self.collectors:
+            for key, value in collect().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"# HELP {prefix}_{key} {help}")
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    # Connection handshakes and heartbeats are not work done for a request
+    IGNORED = {"hello", "ismaster", "isMaster", "saslStart", "saslContinue", "ping", "endSessions"}
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self.pending: Dict[tuple, Tuple[str, Optional[RequestTiming]]] = {}
+
+    def started(self, event):
+        if event.command_name in self.IGNORED:
+            return
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        collection = target if isinstance(target, str) else ""
+        self.pending[(event.request_id, event.connection_id)] = (collection, current_request.get())
+
+    def _finish(self, event, failed: bool):
+        pending = self.pending.pop((event.request_id, event.connection_id), None)
+        if pending is None:
+            return
+        collection, timing = pending
+        self.metrics.observe_command(collection, event.command_name, event.duration_micros / 1e6, failed, timing)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+def _timed_endpoint(endpoint):
+    @functools.wraps(endpoint)
+    async def timed(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timing = current_request.get()
+            if timing is not None:
+                timing.endpoint_done = time.perf_counter()
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """Marks when the endpoint returns, so the rest of the handler counts as serialization."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if asyncio.iscoroutinefunction(endpoint):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            timing = current_request.get()
+            if timing is not None and timing.endpoint_done is not None:
+                timing.serialization_seconds += time.perf_counter() - timing.endpoint_done
+            return response
+
+        return timed_handler
+
+
+class MetricsMiddleware:
+    def __init__(self, app, metrics: Metrics, slow_seconds: float = 0.5):
+        self.app = app
+        self.metrics = metrics
+        self.slow_seconds = slow_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timing = RequestTiming()
+        token = current_request.set(timing)
+        status = 500
+        size = 0
+        finished: Optional[float] = None
+        streaming = False
+
+        async def send_wrapper(message):
+            nonlocal status, size, finished, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name.lower() == b"content-type" and value.startswith(b"text/event-stream"):
+                        streaming = True
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    # Background tasks run after this point and are not part of the response time
+                    finished = time.perf_counter()
+            await send(message)
+
+        self.metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.in_flight -= 1
+            current_request.reset(token)
+            elapsed = (finished or time.perf_counter()) - timing.started
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            self.metrics.observe_request(scope["method"], route_path, status, elapsed, size, timing)
+            if elapsed >= self.slow_seconds and not streaming:
+                logger.warning(
+                    "Slow request %s %s -> %d in %.1f ms: %s",
+                    scope["method"], route_path, status, elapsed * 1000, timing.breakdown(elapsed),
+                )
@@ -0,0 +1,94 @@
+"""Move embedded ``users.donations`` arrays into the donations collection.
+
+Users are streamed in batches. For each batch, every embedded donation is
+upserted into ``donations`` by id (most already exist there, since
+``create_donation`` always wrote both copies). Each user then gets the array's
+sum and length added to its running totals and the array removed. The user
+update only matches while the array is still present, so re-running the tool
+is a no-op for migrated users, and the ``$inc`` preserves totals recorded by
+donations made after the new code was deployed.
+
+    python migrate_donations.py [--batch-size 500] [--dry-run]
+"""
+import os
+import sys
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate(db, batch_size: int = 500, dry_run: bool = False) -> dict:
+    totals = {"users": 0, "donations": 0, "amount": 0.0}
+    cursor = db.users.find(
+        {"donations": {"$exists": True}},
+        {"_id": 0, "id": 1, "donations": 1},
+    ).batch_size(batch_size)
+
+    user_ops, donation_ops = [], []
+
+    async def flush():
+        if not dry_run:
+            if donation_ops:
+                await db.donations.bulk_write(donation_ops, ordered=False)
+            if user_ops:
+                await db.users.bulk_write(user_ops, ordered=False)
+        logger.info("Migrated %d users, %d donations so far", totals["users"], totals["donations"])
+        user_ops.clear()
+        donation_ops.clear()
+
+    async for user in cursor:
+        embedded = user.get("donations") or []
+        amount = 0.0
+        for donation in embedded:
+            donation = {key: value for key, value in donation.items() if key != "_id"}
+            donation.setdefault("user_id", user["id"])
+            amount += float(donation.get("amount") or 0)
+            if donation.get("id"):
+                donation_ops.append(UpdateOne({"id": donation["id"]}, {"$setOnInsert": donation}, upsert=True))
+        user_ops.append(UpdateOne(
+            {"id": user["id"], "donations": {"$exists": True}},
+            {
+                "$inc": {"donation_total": amount, "donation_count": len(embedded)},
+                "$unset": {"donations": ""},
+            },
+        ))
+        totals["users"] += 1
+        totals["donations"] += len(embedded)
+        totals["amount"] += amount
+        if len(user_ops) >= batch_size:
+            await flush()
+
+    await flush()
+    return totals
+
+
+async def _main(batch_size: int, dry_run: bool) -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        totals = await migrate(client[os.environ['DB_NAME']], batch_size, dry_run)
+    finally:
+        client.close()
+    logger.info(
+        "%s %d users, %d donations totalling %.2f",
+        "Would migrate" if dry_run else "Migrated",
+        totals["users"], totals["donations"], totals["amount"],
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream embedded user donations into the donations collection")
+    parser.add_argument("--batch-size", type=int, default=500, help="users per bulk write")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main(args.batch_size, args.dry_run)))
@@ -0,0 +1,108 @@
+"""bcrypt password hashing on a dedicated, size-bounded thread pool.
+
+bcrypt is deliberately slow (~100 ms+ per call at production cost) and would
+stall every other request if run on the event loop. ``PasswordHasher`` runs it
+on its own executor (bcrypt releases the GIL while hashing) and admits at
+most ``max_pending`` calls at once; beyond that it raises ``HasherBusy`` so a
+login storm turns into fast 503s instead of an unbounded queue.
+"""
+import os
+import hmac
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+import bcrypt
+
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
+
+class HasherBusy(Exception):
+    pass
+
+
+def is_bcrypt_hash(stored: str) -> bool:
+    return stored.startswith(BCRYPT_PREFIXES)
+
+
+def hash_cost(stored: str) -> int:
+    return int(stored.split("$")[2])
+
+
+def hash_password_sync(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def verify_password_sync(password: str, stored: str) -> bool:
+    if not is_bcrypt_hash(stored):
+        # Accounts created before hashing stored the password verbatim
+        return hmac.compare_digest(password.encode(), stored.encode())
+    return bcrypt.checkpw(password.encode(), stored.encode())
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int = 12, workers: int = 4, max_pending: int = 64):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        # workers=0 hashes inline on the event loop; only useful as a benchmark baseline
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash") if workers else None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._dummy_hash: Optional[str] = None
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HasherBusy()
+        self.pending += 1
+        try:
+            if self.executor is None:
+                return func(*args)
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str, rounds: Optional[int] = None) -> str:
+        return await self._run(hash_password_sync, password, rounds or self.rounds)
+
+    async def verify(self, password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+        """Return ``(matches, needs_rehash)``; an unknown account still pays for one bcrypt check."""
+        if stored is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = await self.hash("", self.rounds)
+            await self._run(verify_password_sync, password, self._dummy_hash)
+            return False, False
+        matches = await self._run(verify_password_sync, password, stored)
+        return matches, matches and self.needs_rehash(stored)
+
+    def needs_rehash(self, stored: str) -> bool:
+        return not is_bcrypt_hash(stored) or hash_cost(stored) < self.rounds
+
+    def hash_many_sync(self, passwords: Iterable[str], rounds: int) -> List[str]:
+        """Hash a batch in the calling thread (bulk import), so interactive logins keep the pool."""
+        return [hash_password_sync(password, rounds) for password in passwords]
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def hasher_from_env() -> PasswordHasher:
+    return PasswordHasher(
+        rounds=int(os.environ.get('BCRYPT_ROUNDS', '12')),
+        workers=int(os.environ.get('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1)))),
+        max_pending=int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '64')),
+    )
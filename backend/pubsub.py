@@ -0,0 +1,166 @@
+"""Pub/sub fan-out for pushing freshly persisted messages to connected clients.
+
+``Broker`` is the interface routes publish to and stream endpoints subscribe
+through. ``InProcessBroker`` fans out within a single worker. ``BusBroker``
+does the same and also relays every payload to the other workers over the
+cache invalidation bus (``invalidation.py``), which delivers it to their
+local subscriptions.
+
+Every subscription owns a bounded queue. A consumer that falls more than
+``max_queue`` payloads behind is cut off with an overflow marker instead of
+letting the queue grow; the client reconnects and catches up through the
+regular paginated ``since`` fetch.
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_QUEUE = 100
+
+# Delivered in place of a payload when a subscriber fell too far behind
+OVERFLOW = object()
+# Delivered when the broker shuts down; the client reconnects to another worker
+CLOSED = object()
+MESSAGES_TOPIC = "messages"
+
+
+class Subscription:
+    def __init__(self, broker: "Broker", channel: str, max_queue: int):
+        self.broker = broker
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue + 1)
+        self.max_queue = max_queue
+        self.overflowed = False
+        self.closed = False
+
+    def deliver(self, payload: str) -> bool:
+        """Queue ``payload`` without blocking the publisher; False once the subscriber has overflowed."""
+        if self.overflowed or self.closed:
+            return False
+        if self.queue.qsize() >= self.max_queue:
+            # The spare slot guarantees the marker fits even when the queue is full
+            self.overflowed = True
+            self.queue.put_nowait(OVERFLOW)
+            return False
+        self.queue.put_nowait(payload)
+        return True
+
+    def end(self):
+        """Wake the consumer with ``CLOSED`` and unsubscribe."""
+        if not self.closed and not self.overflowed:
+            try:
+                self.queue.put_nowait(CLOSED)
+            except asyncio.QueueFull:
+                pass
+        self.close()
+
+    async def get(self, timeout: Optional[float] = None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broker.unsubscribe(self)
+
+
+class Broker(ABC):
+    @abstractmethod
+    async def publish(self, channel: str, payload: str) -> int:
+        """Deliver ``payload`` to every subscriber of ``channel``; returns the local delivery count."""
+
+    @abstractmethod
+    def subscribe(self, channel: str, max_queue: int = DEFAULT_MAX_QUEUE) -> Subscription:
+        ...
+
+    @abstractmethod
+    def unsubscribe(self, subscription: Subscription):
+        ...
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InProcessBroker(Broker):
+    def __init__(self):
+        self.channels: Dict[str, Set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    async def publish(self, channel: str, payload: str) -> int:
+        self.published += 1
+        delivered = 0
+        for subscription in list(self.channels.get(channel, ())):
+            if subscription.deliver(payload):
+                delivered += 1
+            elif subscription.overflowed:
+                self.overflows += 1
+                logger.warning("Dropping slow subscriber on %s after %d queued payloads", channel, subscription.max_queue)
+                self.unsubscribe(subscription)
+        self.delivered += delivered
+        return delivered
+
+    def subscribe(self, channel: str, max_queue: int = DEFAULT_MAX_QUEUE) -> Subscription:
+        subscription = Subscription(self, channel, max_queue)
+        self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self.channels.get(subscription.channel)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self.channels[subscription.channel]
+
+    async def close(self):
+        for subscribers in list(self.channels.values()):
+            for subscription in list(subscribers):
+                subscription.end()
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self.channels),
+            "subscribers": sum(len(subscribers) for subscribers in self.channels.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+        }
+
+
+class BusBroker(InProcessBroker):
+    def __init__(self, bus):
+        super().__init__()
+        self.bus = bus
+        self.relayed = 0
+        bus.subscribe(MESSAGES_TOPIC, self._receive)
+
+    async def publish(self, channel: str, payload: str) -> int:
+        delivered = await super().publish(channel, payload)
+        self.bus.publish(MESSAGES_TOPIC, [[channel, payload]])
+        return delivered
+
+    async def _receive(self, entries: Optional[list]):
+        # A bus reset (entries=None) cannot replay payloads; clients catch up on their next since fetch
+        for channel, payload in entries or ():
+            self.relayed += 1
+            await super().publish(channel, payload)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "relayed": self.relayed}
+
+
+def create_broker(kind: str = "memory", bus=None) -> Broker:
+    if kind == "memory":
+        return InProcessBroker()
+    if kind == "bus":
+        if bus is None or not bus.enabled:
+            raise ValueError("MESSAGE_BROKER=bus needs the cache bus (CACHE_BUS) enabled")
+        return BusBroker(bus)
+    raise ValueError(f"Unknown message broker: {kind}")
@@ -0,0 +1,287 @@
+"""Precomputed "alumni you may know" neighbours.
+
+Every profile is encoded as a row of small integers: codes for ``company``,
+``domain`` and ``location`` (0 when missing, compared case-insensitively)
+plus ``passout_year``. The similarity of two alumni is
+
+    3.0 * same company + 2.0 * same domain + 1.5 * same location
+    + 1.0 * max(0, 1 - |year gap| / 6)
+
+so the best matches for anyone always share a company, domain or location,
+or graduated close to them. ``rebuild`` uses that to avoid the all-pairs
+comparison. For each grouping in ``GROUPINGS`` (every combination that
+shares the company, then domain and location, domain, location, and
+finally everyone) the rows are sorted by group and then by year, and each
+alumnus's candidates are the ``CANDIDATES_PER_GROUP`` group members with the
+closest years on either side. The candidates are scored and deduplicated in
+numpy blocks of ``BLOCK_ROWS`` users, and the best ``top_k`` are kept in a
+dense ``(rows, top_k)`` int32 array. Serving recommendations is one row lookup.
+
+A profile added or changed between rebuilds is only re-encoded; its own
+list is computed exactly (one vectorized pass over all rows) the first time
+it is requested, and other alumni's lists pick the change up at the next
+rebuild.
+"""
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CATEGORICAL_WEIGHTS = {"company": 3.0, "domain": 2.0, "location": 1.5}
+YEAR_WEIGHT = 1.0
+YEAR_WINDOW = 5
+CANDIDATES_PER_GROUP = 16
+BLOCK_ROWS = 8192
+GROUPINGS: Tuple[Tuple[str, ...], ...] = (
+    ("company", "domain", "location"), ("company", "domain"), ("company", "location"), ("company",),
+    ("domain", "location"), ("domain",), ("location",), (),
+)
+
+MISSING = 0
+
+
+def _normalize(value) -> Optional[str]:
+    if value is None:
+        return None
+    text = " ".join(str(value).split()).casefold()
+    return text or None
+
+
+class AlumniRecommender:
+    def __init__(self, top_k: int = 20):
+        self.top_k = top_k
+        self.ids: List[str] = []
+        self.row_of: Dict[str, int] = {}
+        self.vocab: Dict[str, Dict[str, int]] = {field: {} for field in CATEGORICAL_WEIGHTS}
+        self.features: Dict[str, np.ndarray] = {}
+        self.ranked = np.zeros(0, dtype=bool)
+        self.neighbors = np.full((0, top_k), -1, dtype=np.int32)
+        self.scores = np.zeros((0, top_k), dtype=np.float32)
+        self._allocate(1024)
+        self.ready = False
+        self.rebuilding = False
+        self.dirty: set = set()
+        self.last_rebuild_seconds = 0.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _allocate(self, capacity: int):
+        grown = {}
+        for field in CATEGORICAL_WEIGHTS:
+            grown[field] = np.zeros(capacity, dtype=np.int32)
+        grown["year"] = np.zeros(capacity, dtype=np.int16)
+        for field, array in self.features.items():
+            grown[field][:len(array)] = array
+        self.features = grown
+        ranked = np.zeros(capacity, dtype=bool)
+        ranked[:len(self.ranked)] = self.ranked
+        self.ranked = ranked
+        neighbors = np.full((capacity, self.top_k), -1, dtype=np.int32)
+        scores = np.zeros((capacity, self.top_k), dtype=np.float32)
+        neighbors[:len(self.neighbors)] = self.neighbors
+        scores[:len(self.scores)] = self.scores
+        self.neighbors, self.scores = neighbors, scores
+
+    def _code(self, field: str, value) -> int:
+        key = _normalize(value)
+        if key is None:
+            return MISSING
+        vocab = self.vocab[field]
+        code = vocab.get(key)
+        if code is None:
+            code = vocab[key] = len(vocab) + 1
+        return code
+
+    def _encode(self, profile: dict) -> int:
+        row = self.row_of.get(profile["id"])
+        if row is None:
+            row = len(self.ids)
+            if row >= len(self.features["year"]):
+                self._allocate(row * 2)
+            self.ids.append(profile["id"])
+            self.row_of[profile["id"]] = row
+            changed = True
+        else:
+            changed = False
+        for field in CATEGORICAL_WEIGHTS:
+            code = self._code(field, profile.get(field))
+            if self.features[field][row] != code:
+                self.features[field][row] = code
+                changed = True
+        year = profile.get("passout_year")
+        year = int(year) if isinstance(year, int) and 0 < year < 32767 else 0
+        if self.features["year"][row] != year:
+            self.features["year"][row] = year
+            changed = True
+        if not changed:
+            return row
+        self.ranked[row] = False
+        if self.rebuilding:
+            self.dirty.add(row)
+        return row
+
+    def update(self, profile: dict):
+        """Add or re-encode a profile; its recommendations are recomputed when next requested."""
+        self._encode(profile)
+
+    def load(self, profiles: Sequence[dict]):
+        for profile in profiles:
+            self._encode(profile)
+
+    def _rank_row(self, row: int):
+        count = len(self.ids)
+        scores = np.zeros(count, dtype=np.float32)
+        for field, weight in CATEGORICAL_WEIGHTS.items():
+            code = self.features[field][row]
+            if code != MISSING:
+                scores += weight * (self.features[field][:count] == code)
+        year = int(self.features["year"][row])
+        if year:
+            years = self.features["year"][:count].astype(np.int32)
+            closeness = np.clip(1.0 - np.abs(years - year) / (YEAR_WINDOW + 1), 0.0, 1.0)
+            scores += YEAR_WEIGHT * np.where(years > 0, closeness, 0.0).astype(np.float32)
+        scores[row] = -np.inf
+        chosen, top_scores = _top_k(np.arange(count, dtype=np.int64)[None, :], scores[None, :], self.top_k)
+        k = chosen.shape[1]
+        self.neighbors[row] = -1
+        self.scores[row] = 0
+        self.neighbors[row, :k] = chosen[0]
+        self.scores[row, :k] = top_scores[0]
+        self.ranked[row] = True
+
+    def recommend(self, user_id: str, limit: int = 20) -> List[Tuple[str, float]]:
+        row = self.row_of.get(user_id)
+        if row is None:
+            return []
+        if not self.ranked[row]:
+            self._rank_row(row)
+        result = []
+        for neighbor, score in zip(self.neighbors[row, :limit].tolist(), self.scores[row, :limit].tolist()):
+            if neighbor < 0:
+                break
+            result.append((self.ids[neighbor], score))
+        return result
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        count = len(self.ids)
+        return {field: array[:count].copy() for field, array in self.features.items()}
+
+    def compute(self, features: Dict[str, np.ndarray]) -> Tuple[int, np.ndarray, np.ndarray]:
+        """Rank every row of a ``snapshot``; touches no shared state, so it can run in a thread."""
+        count = len(features["year"])
+        neighbors = np.full((count, self.top_k), -1, dtype=np.int32)
+        scores = np.zeros((count, self.top_k), dtype=np.float32)
+        if count < 2:
+            return count, neighbors, scores
+
+        groups = [_group_order(features, fields, count) for fields in GROUPINGS]
+        offsets = np.concatenate([
+            np.arange(-CANDIDATES_PER_GROUP, 0), np.arange(1, CANDIDATES_PER_GROUP + 1)
+        ])
+        for start in range(0, count, BLOCK_ROWS):
+            rows = np.arange(start, min(start + BLOCK_ROWS, count))
+            candidates = np.concatenate([
+                _group_candidates(rows, keys, order, position, offsets, count)
+                for keys, order, position in groups
+            ], axis=1)
+            # Drop candidates found through more than one grouping
+            candidates.sort(axis=1)
+            repeated = np.zeros(candidates.shape, dtype=bool)
+            repeated[:, 1:] = candidates[:, 1:] == candidates[:, :-1]
+            candidates[repeated] = -1
+
+            chosen, top_scores = _top_k(candidates, _pair_scores(features, rows, candidates), self.top_k)
+            neighbors[rows, :chosen.shape[1]] = chosen
+            scores[rows, :chosen.shape[1]] = top_scores
+        return count, neighbors, scores
+
+    def install(self, count: int, neighbors: np.ndarray, scores: np.ndarray):
+        """Swap in a ``compute`` result, then re-rank rows that changed while it ran."""
+        self.neighbors[:count] = neighbors
+        self.scores[:count] = scores
+        self.ranked[:count] = True
+        # Rows added after the snapshot are still unranked
+        for row in self.dirty:
+            self.ranked[row] = False
+        self.dirty.clear()
+        self.ready = True
+
+    def stats(self) -> dict:
+        return {
+            "profiles": len(self.ids),
+            "unranked": int(len(self.ids) - self.ranked[:len(self.ids)].sum()),
+            "top_k": self.top_k,
+            "ready": self.ready,
+            "last_rebuild_seconds": round(self.last_rebuild_seconds, 3),
+        }
+
+
+def _top_k(candidates: np.ndarray, scores: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best ``top_k`` candidates per row by score, highest first; -1 where there is no match."""
+    k = min(top_k, candidates.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    chosen = np.take_along_axis(candidates, np.take_along_axis(top, order, axis=1), axis=1).astype(np.int32)
+    # Nothing in common at all is not a recommendation
+    matched = top_scores > 0
+    return np.where(matched, chosen, -1), np.where(matched, top_scores, 0).astype(np.float32)
+
+
+def _group_order(features: Dict[str, np.ndarray], fields: Tuple[str, ...], count: int):
+    """Group keys per row (-1 when a field is missing), rows sorted by (key, year), and each row's position."""
+    keys = np.zeros(count, dtype=np.int64)
+    missing = np.zeros(count, dtype=bool)
+    for field in fields:
+        codes = features[field].astype(np.int64)
+        keys = keys * (int(codes.max()) + 1) + codes
+        missing |= codes == MISSING
+    if not fields:
+        missing = features["year"] == 0
+    keys[missing] = -1
+    order = np.lexsort((features["year"], keys))
+    position = np.empty(count, dtype=np.int64)
+    position[order] = np.arange(count)
+    return keys, order, position
+
+
+def _group_candidates(rows, keys, order, position, offsets, count) -> np.ndarray:
+    neighbor_positions = position[rows][:, None] + offsets[None, :]
+    inside = (neighbor_positions >= 0) & (neighbor_positions < count)
+    candidates = order[np.clip(neighbor_positions, 0, count - 1)]
+    row_keys = keys[rows][:, None]
+    valid = inside & (keys[candidates] == row_keys) & (row_keys >= 0)
+    return np.where(valid, candidates, -1)
+
+
+def _pair_scores(features: Dict[str, np.ndarray], rows: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    safe = np.maximum(candidates, 0)
+    scores = np.zeros(candidates.shape, dtype=np.float32)
+    for field, weight in CATEGORICAL_WEIGHTS.items():
+        mine = features[field][rows][:, None]
+        scores += weight * ((features[field][safe] == mine) & (mine != MISSING))
+    mine = features["year"][rows].astype(np.int32)[:, None]
+    theirs = features["year"][safe].astype(np.int32)
+    closeness = np.clip(1.0 - np.abs(theirs - mine) / (YEAR_WINDOW + 1), 0.0, 1.0)
+    scores += YEAR_WEIGHT * np.where((mine > 0) & (theirs > 0), closeness, 0.0).astype(np.float32)
+    scores[candidates < 0] = -np.inf
+    return scores
+
+
+async def rebuild(recommender: AlumniRecommender) -> float:
+    """Recompute every row in a worker thread; numpy releases the GIL for the heavy parts."""
+    started = time.perf_counter()
+    recommender.rebuilding = True
+    try:
+        result = await asyncio.to_thread(recommender.compute, recommender.snapshot())
+        recommender.install(*result)
+    finally:
+        recommender.rebuilding = False
+    recommender.last_rebuild_seconds = time.perf_counter() - started
+    return recommender.last_rebuild_seconds
@@ -0,0 +1,190 @@
+"""Idempotent, capacity-aware event registration.
+
+Each (event, user) pair has at most one document in ``event_registrations``,
+enforced by a unique index: registering is an upsert, so retries and
+double-clicks return the existing registration instead of adding another.
+
+Seats are counted per event in ``event_seats`` (``registered`` and
+``waitlisted``). A new registration claims a seat with one conditional
+``$inc`` (``registered < capacity``), so capacity holds however many
+requests race for the last seats. When the event is full, the registration
+joins the waitlist if the event has one, and is rejected otherwise.
+``GET /api/events/{event_id}/registrations/count`` reads the counters
+directly.
+
+A registration is inserted as ``pending`` and gets its final status once
+the seat is claimed. ``reconcile`` rebuilds the counters from the
+registrations at startup and drops pending documents left by a crash.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+PENDING = "pending"
+REGISTERED = "registered"
+WAITLISTED = "waitlisted"
+
+# Older than any in-flight request, so reconciliation never races a live registration
+STALE_PENDING = timedelta(minutes=1)
+
+SEATS_PROJECTION = {"_id": 0, "registered": 1, "waitlisted": 1}
+
+
+class EventFull(Exception):
+    pass
+
+
+class RegistrationResult:
+    def __init__(self, status: str, created: bool, waitlist_position: Optional[int] = None):
+        self.status = status
+        self.created = created
+        self.waitlist_position = waitlist_position
+
+
+class SeatLedger:
+    def __init__(self):
+        self.registrations = None
+        self.seats = None
+
+    def bind(self, registrations, seats):
+        self.registrations = registrations
+        self.seats = seats
+
+    async def register(self, event: dict, doc: dict) -> RegistrationResult:
+        key = {"event_id": event["id"], "user_id": doc["user_id"]}
+        try:
+            result = await self.registrations.update_one(
+                key, {"$setOnInsert": {**doc, "status": PENDING}}, upsert=True
+            )
+            created = result.upserted_id is not None
+        except DuplicateKeyError:
+            # A concurrent duplicate of this request inserted first
+            created = False
+        if not created:
+            existing = await self.registrations.find_one(key, {"_id": 0, "status": 1, "waitlist_position": 1}) or {}
+            # Registrations from before statuses existed are confirmed seats
+            return RegistrationResult(
+                existing.get("status", REGISTERED), False, existing.get("waitlist_position")
+            )
+
+        update = {"status": REGISTERED}
+        if not await self.claim_seat(event):
+            if not event.get("waitlist"):
+                await self.registrations.delete_one({**key, "status": PENDING})
+                raise EventFull(event["id"])
+            seats = await self.seats.find_one_and_update(
+                {"_id": event["id"]}, {"$inc": {"waitlisted": 1, "waitlist_tickets": 1}},
+                projection={"waitlist_tickets": 1}, return_document=ReturnDocument.AFTER,
+            )
+            update = {"status": WAITLISTED, "waitlist_position": seats["waitlist_tickets"]}
+        await self.registrations.update_one(key, {"$set": update})
+        return RegistrationResult(update["status"], True, update.get("waitlist_position"))
+
+    async def claim_seat(self, event: dict) -> bool:
+        query = {"_id": event["id"]}
+        if event.get("capacity") is not None:
+            query["registered"] = {"$lt": event["capacity"]}
+        result = await self.seats.update_one(query, {"$inc": {"registered": 1}})
+        if result.modified_count:
+            return True
+        # Created on another worker, or before this process reconciled
+        if await self.ensure(event["id"]):
+            result = await self.seats.update_one(query, {"$inc": {"registered": 1}})
+            return bool(result.modified_count)
+        return False
+
+    async def ensure(self, event_id: str) -> bool:
+        """Create the event's counters if missing; returns whether they were created."""
+        try:
+            result = await self.seats.update_one(
+                {"_id": event_id},
+                {"$setOnInsert": {"registered": 0, "waitlisted": 0, "waitlist_tickets": 0}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return result.upserted_id is not None
+
+    async def promote(self, event: dict) -> List[str]:
+        """Move waitlisted registrations into seats freed by a capacity increase, oldest first."""
+        promoted = []
+        while await self.claim_seat(event):
+            registration = await self.registrations.find_one_and_update(
+                {"event_id": event["id"], "status": WAITLISTED},
+                {"$set": {"status": REGISTERED}, "$unset": {"waitlist_position": ""}},
+                sort=[("waitlist_position", ASCENDING)],
+                projection={"_id": 0, "user_id": 1},
+            )
+            if registration is None:
+                await self.seats.update_one({"_id": event["id"]}, {"$inc": {"registered": -1}})
+                break
+            await self.seats.update_one({"_id": event["id"]}, {"$inc": {"waitlisted": -1}})
+            promoted.append(registration["user_id"])
+        return promoted
+
+    async def counts(self, event: dict) -> dict:
+        seats = await self.seats.find_one({"_id": event["id"]}, SEATS_PROJECTION) or {}
+        registered = seats.get("registered", 0)
+        capacity = event.get("capacity")
+        return {
+            "event_id": event["id"],
+            "capacity": capacity,
+            "registered": registered,
+            "waitlisted": seats.get("waitlisted", 0),
+            "available": max(0, capacity - registered) if capacity is not None else None,
+        }
+
+    async def tally(self, event_id: str) -> dict:
+        counts = {REGISTERED: 0, WAITLISTED: 0}
+        pipeline = [
+            {"$match": {"event_id": event_id}},
+            {"$group": {"_id": {"$ifNull": ["$status", REGISTERED]}, "count": {"$sum": 1}}},
+        ]
+        async for group in self.registrations.aggregate(pipeline):
+            if group["_id"] in counts:
+                counts[group["_id"]] = group["count"]
+        return counts
+
+    async def reconcile(self, event_ids: List[str]) -> List[str]:
+        """Drop stale pending registrations and repair counters; returns the events that drifted."""
+        cutoff = datetime.now(timezone.utc) - STALE_PENDING
+        await self.registrations.delete_many({"status": PENDING, "timestamp": {"$lt": cutoff}})
+        drifted = []
+        for event_id in event_ids:
+            await self.ensure(event_id)
+            before = await self.seats.find_one({"_id": event_id}, SEATS_PROJECTION)
+            counts = await self.tally(event_id)
+            after = await self.seats.find_one({"_id": event_id}, SEATS_PROJECTION)
+            # A registration landed mid-count; the next reconciliation will look again
+            if before != after:
+                continue
+            if after != counts:
+                drifted.append(event_id)
+                await self.seats.update_one({"_id": event_id}, {"$set": counts})
+        return drifted
+
+
+async def dedupe_registrations(collection) -> int:
+    """Remove duplicate (event, user) registrations so the unique index can be built.
+
+    Keeps the earliest registration of each pair; a no-op once the unique
+    index exists, since duplicates can no longer be written.
+    """
+    indexes = await collection.index_information()
+    if "event_user_unique" in indexes:
+        return 0
+    removed = 0
+    duplicates = collection.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": {"event_id": "$event_id", "user_id": "$user_id"}, "ids": {"$push": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ], allowDiskUse=True)
+    async for group in duplicates:
+        result = await collection.delete_many({"_id": {"$in": group["ids"][1:]}})
+        removed += result.deleted_count
+    # Superseded by event_user_unique on the same keys
+    if "event_user" in indexes:
+        await collection.drop_index("event_user")
+    return removed
@@ -0,0 +1,250 @@
+import re
+import math
+import heapq
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+# Field weights used when ranking: a hit in the name beats a hit in the location
+SEARCH_FIELDS = {
+    "full_name": 3.0,
+    "company": 2.0,
+    "domain": 1.5,
+    "location": 1.0,
+}
+
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.7
+FUZZY_MATCH = 0.45
+
+MAX_PREFIX_EXPANSIONS = 50
+MAX_FUZZY_EXPANSIONS = 20
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.casefold())
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"^{token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(token: str) -> int:
+    if len(token) < 4:
+        return 0
+    if len(token) < 8:
+        return 1
+    return 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance with transpositions, giving up once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev_prev = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(prev[j] + 1, current[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], prev_prev[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > limit:
+            return limit + 1
+        prev_prev, prev = prev, current
+    return prev[-1]
+
+
+class AlumniSearchIndex:
+    """In-memory inverted index over the searchable alumni profile fields.
+
+    Each token's postings are bucketed by the weight of the strongest field it
+    appeared in, so ranked single-term lookups can walk buckets from the best
+    possible score down and stop after ``limit`` documents. A sorted vocabulary
+    serves prefix lookups and a trigram index over the vocabulary finds typo
+    candidates, so a query never touches documents that cannot match.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[float, Set[str]]] = {}
+        self.doc_tokens: Dict[str, Dict[str, float]] = {}
+        self.doc_freq: Dict[str, int] = {}
+        self.vocabulary: List[str] = []
+        self.gram_index: Dict[str, Set[str]] = {}
+        self.ready = False
+
+    def __len__(self):
+        return len(self.doc_tokens)
+
+    def add(self, profile: dict, overwrite: bool = True):
+        doc_id = profile["id"]
+        if doc_id in self.doc_tokens:
+            if not overwrite:
+                return
+            self.remove(doc_id)
+
+        weights: Dict[str, float] = {}
+        for field, weight in SEARCH_FIELDS.items():
+            for token in tokenize(profile.get(field)):
+                if weight > weights.get(token, 0.0):
+                    weights[token] = weight
+
+        for token, weight in weights.items():
+            buckets = self.postings.get(token)
+            if buckets is None:
+                buckets = self.postings[token] = {}
+                self.doc_freq[token] = 0
+                self._add_vocabulary(token)
+            buckets.setdefault(weight, set()).add(doc_id)
+            self.doc_freq[token] += 1
+        self.doc_tokens[doc_id] = weights
+
+    def remove(self, doc_id: str):
+        for token, weight in self.doc_tokens.pop(doc_id, {}).items():
+            buckets = self.postings.get(token)
+            if buckets is None:
+                continue
+            ids = buckets.get(weight)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del buckets[weight]
+            self.doc_freq[token] -= 1
+            if not self.doc_freq[token]:
+                del self.postings[token]
+                del self.doc_freq[token]
+                self._remove_vocabulary(token)
+
+    def _add_vocabulary(self, token: str):
+        self.vocabulary.insert(bisect_left(self.vocabulary, token), token)
+        for gram in trigrams(token):
+            self.gram_index.setdefault(gram, set()).add(token)
+
+    def _remove_vocabulary(self, token: str):
+        position = bisect_left(self.vocabulary, token)
+        if position < len(self.vocabulary) and self.vocabulary[position] == token:
+            del self.vocabulary[position]
+        for gram in trigrams(token):
+            tokens = self.gram_index.get(gram)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self.gram_index[gram]
+
+    def _prefix_tokens(self, prefix: str) -> List[str]:
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + "\U0010ffff", start)
+        tokens = [token for token in self.vocabulary[start:end] if token != prefix]
+        if len(tokens) > MAX_PREFIX_EXPANSIONS:
+            # Short prefixes fan out widely; keep the completions most profiles share
+            tokens = heapq.nlargest(MAX_PREFIX_EXPANSIONS, tokens, key=self.doc_freq.__getitem__)
+        return tokens
+
+    def _fuzzy_tokens(self, term: str) -> List[Tuple[str, int]]:
+        limit = max_edits(term)
+        if not limit:
+            return []
+        grams = trigrams(term)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.gram_index.get(gram, ()))
+        # A substitution, insertion or deletion destroys at most three trigrams and an
+        # adjacent transposition at most four, which bounds the overlap a real match must keep
+        required = max(1, len(grams) - 4 * limit)
+        candidates = [token for token, count in shared.most_common() if count >= required]
+        # A short term can share no trigram at all with its transposed spelling ("jhon", "john")
+        for i in range(len(term) - 1):
+            swapped = term[:i] + term[i + 1] + term[i] + term[i + 2:]
+            if swapped != term and swapped in self.postings and swapped not in shared:
+                candidates.insert(0, swapped)
+        matches = []
+        for token in candidates:
+            distance = edit_distance(term, token, limit)
+            if distance <= limit:
+                matches.append((token, distance))
+                if len(matches) >= MAX_FUZZY_EXPANSIONS:
+                    break
+        return matches
+
+    def _expand(self, term: str, prefix: bool) -> List[Tuple[str, float]]:
+        expansions = []
+        if term in self.postings:
+            expansions.append((term, EXACT_MATCH))
+        if prefix:
+            expansions.extend((token, PREFIX_MATCH) for token in self._prefix_tokens(term))
+        # Only go looking for typos when the literal term found nothing
+        if not expansions:
+            expansions.extend(
+                (token, FUZZY_MATCH / distance) for token, distance in self._fuzzy_tokens(term)
+            )
+        return expansions
+
+    def _buckets(self, expansions: List[Tuple[str, float]]) -> List[Tuple[float, Set[str]]]:
+        total = len(self.doc_tokens)
+        buckets = []
+        for token, quality in expansions:
+            idf = math.log(1.0 + total / self.doc_freq[token])
+            for weight, ids in self.postings[token].items():
+                buckets.append((quality * idf * weight, ids))
+        buckets.sort(key=lambda bucket: bucket[0], reverse=True)
+        return buckets
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Rank profiles matching every query term; the last term also matches as a prefix."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        expanded = []
+        for position, term in enumerate(terms):
+            expansions = self._expand(term, prefix=position == len(terms) - 1)
+            if not expansions:
+                return []
+            buckets = self._buckets(expansions)
+            expanded.append((sum(len(ids) for _, ids in buckets), buckets))
+        # Seed from the most selective term so later terms only probe surviving documents
+        expanded.sort(key=lambda item: item[0])
+
+        if len(expanded) == 1:
+            # Buckets are in descending score order and a document scores its best
+            # bucket, so the first ``limit`` distinct documents are the top hits
+            ranked: Dict[str, float] = {}
+            for score, ids in expanded[0][1]:
+                for doc_id in ids:
+                    if doc_id not in ranked:
+                        ranked[doc_id] = score
+                        if len(ranked) >= limit:
+                            return list(ranked.items())
+            return list(ranked.items())
+
+        scores: Dict[str, float] = {}
+        for score, ids in reversed(expanded[0][1]):
+            for doc_id in ids:
+                scores[doc_id] = score
+
+        for size, buckets in expanded[1:]:
+            best: Dict[str, float] = {}
+            if size <= len(scores) * len(buckets):
+                for score, ids in reversed(buckets):
+                    for doc_id in ids:
+                        if doc_id in scores:
+                            best[doc_id] = score
+            else:
+                for doc_id in scores:
+                    for score, ids in buckets:
+                        if doc_id in ids:
+                            best[doc_id] = score
+                            break
+            scores = {doc_id: scores[doc_id] + score for doc_id, score in best.items()}
+            if not scores:
+                return []
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,102 @@
+"""Production entry point: several uvicorn workers sharing one listening socket.
+
+    python serve.py --workers 4 --port 8001
+
+Each worker is a separate process with its own event loop, MongoDB pool and
+in-memory caches. The cache invalidation bus (``invalidation.py``) keeps the
+caches coherent and relays live messages between workers; unless
+``CACHE_BUS`` is set it is switched on whenever more than one worker runs.
+Pools sized per process (``MONGO_MAX_POOL_SIZE``, ``PASSWORD_HASH_WORKERS``,
+``AVATAR_WORKERS``) multiply with the worker count. ``JWT_SECRET`` is
+required with more than one worker, since a worker with its own random
+signing key rejects every session issued by the others.
+
+SIGTERM or SIGINT shuts down gracefully. Workers stop accepting
+connections and end open message streams; clients reconnect to whichever
+worker is up. They finish in-flight requests for up to
+``--graceful-timeout`` seconds, then run the app's shutdown, which drains
+the write-behind queue. All workers drain at the same time. A worker that
+exits unexpectedly is replaced.
+"""
+import os
+import sys
+import logging
+import argparse
+
+import uvicorn
+from uvicorn._subprocess import get_subprocess
+from uvicorn.supervisors.multiprocess import Multiprocess
+
+logger = logging.getLogger("uvicorn.error")
+
+WORKER_CHECK_SECONDS = 1.0
+
+
+class DrainingServer(uvicorn.Server):
+    def handle_exit(self, sig, frame):
+        first = not self.should_exit
+        super().handle_exit(sig, frame)
+        app_module = sys.modules.get("server")
+        if first and app_module is not None:
+            # Open streams would otherwise hold the shutdown until the graceful timeout
+            app_module.begin_shutdown()
+
+
+class Supervisor(Multiprocess):
+    def run(self):
+        self.startup()
+        while not self.should_exit.wait(WORKER_CHECK_SECONDS):
+            for index, process in enumerate(self.processes):
+                if not process.is_alive():
+                    logger.warning("Worker %s exited with code %s; starting a replacement", process.pid, process.exitcode)
+                    process = get_subprocess(config=self.config, target=self.target, sockets=self.sockets)
+                    process.start()
+                    self.processes[index] = process
+        self.shutdown()
+
+    def shutdown(self):
+        # Signal every worker before waiting on any, so they drain in parallel
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        logger.info("Stopping parent process [%d]", self.pid)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument("--port", type=int, default=int(os.environ.get('PORT', '8001')))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get('WEB_CONCURRENCY', str(os.cpu_count() or 1))))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.environ.get('GRACEFUL_TIMEOUT', '30')),
+                        help="seconds in-flight requests get to finish on shutdown")
+    parser.add_argument("--forwarded-allow-ips", default=os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1'),
+                        help="proxies trusted to set X-Forwarded-For (the client address admission limits use)")
+    parser.add_argument("--log-level", default=os.environ.get('LOG_LEVEL', 'info'))
+    args = parser.parse_args(argv)
+    if args.workers > 1 and not os.environ.get('JWT_SECRET'):
+        parser.error("JWT_SECRET must be set when running more than one worker; "
+                     "otherwise each worker signs sessions with its own random key and rejects the others'")
+
+    # Inherited by the workers, which read it when they import the app
+    os.environ.setdefault('CACHE_BUS', 'auto' if args.workers > 1 else 'off')
+
+    config = uvicorn.Config(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+    )
+    server = DrainingServer(config)
+    if args.workers > 1:
+        Supervisor(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
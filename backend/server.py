@@ -1,28 +1,250 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Header, Depends, UploadFile, File, BackgroundTasks
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+import io
 import os
+import re
+import base64
+import hmac
+import hashlib
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
 import uuid
-from datetime import datetime, timezone
+import orjson
+from datetime import datetime, timezone, date
+import asyncio
+from contextlib import asynccontextmanager
+from search import AlumniSearchIndex, SEARCH_FIELDS
+from recommendations import CATEGORICAL_WEIGHTS, AlumniRecommender, rebuild as rebuild_recommendations
+from indexes import DIRECTORY_SORT, apply_indexes, check_query_plans
+from pubsub import CLOSED, OVERFLOW, create_broker
+from cache import TTLCache
+from events import SEED_EVENTS, EventCatalog, etag_matches
+from bulk_import import detect_format, import_users
+from exports import EXPORTS, export_fields, export_query, stream_export
+from passwords import HasherBusy, hasher_from_env
+from avatars import CACHE_CONTROL as AVATAR_CACHE_CONTROL, DIRECTORY_SIZE, PROFILE_SIZE, ImageStoreBusy, InvalidImage, image_store_from_env
+from auth import Principal, TokenError, bearer_token, tokens_from_env
+from metrics import Metrics, MetricsMiddleware, MongoCommandListener, TimedRoute
+from compression import CompressionMiddleware, compression_options_from_env
+from invalidation import invalidation_bus_from_env
+from admission import AdmissionMiddleware, RoutePolicy, admission_from_env
+from database import ConfiguredDatabase, MongoConnection
+from donation_rollups import read_analytics, record_donation
+from write_behind import WriteQueueFull, write_behind_from_env
+from conversations import backfill as backfill_conversations, inbox_page, inbox_row, mark_read, record_message, refresh_profile
+from registrations import PENDING, REGISTERED, WAITLISTED, EventFull, SeatLedger, dedupe_registrations
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connectionisview
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+metrics = Metrics()
+
+# MongoDB connection; the client is created and warmed in the lifespan
+mongo = MongoConnection.from_env(event_listeners=[MongoCommandListener(metrics)])
+db: Optional[ConfiguredDatabase] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global db
+    db = await mongo.connect()
+    removed = await dedupe_registrations(db.event_registrations)
+    if removed:
+        logger.warning("Removed %d duplicate event registrations", removed)
+    await apply_indexes(db)
+    if os.environ.get('INDEX_CHECK_ON_STARTUP', '').lower() in ('1', 'true', 'yes'):
+        failures = await check_query_plans(db)
+        if failures:
+            raise RuntimeError("Query shapes planned as COLLSCAN: " + "; ".join(failures))
+    # Before any cache loads, so invalidations written meanwhile are not lost
+    await cache_bus.prepare(db)
+    await backfill_name_keys()
+    await backfill_conversation_ids()
+    await backfill_native_dates()
+    await backfill_conversations(db)
+    search_index_task = asyncio.create_task(build_search_index())
+    recommendations_task = asyncio.create_task(run_recommendations())
+    event_catalog.bind(db.events)
+    await event_catalog.seed(SEED_EVENTS)
+    seat_ledger.bind(db.event_registrations, db.event_seats)
+    write_behind.start(db)
+    cache_bus.start()
+    await reconcile_seats()
+    await reconcile_stats()
+    stats_reconciler_task = asyncio.create_task(run_stats_reconciler())
+
+    yield
+
+    stats_reconciler_task.cancel()
+    search_index_task.cancel()
+    recommendations_task.cancel()
+    await write_behind.drain()
+    password_hasher.shutdown()
+    image_store.shutdown()
+    await broker.close()
+    await cache_bus.close()
+    mongo.close()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", route_class=TimedRoute)
+
+# Directory listing only ships the fields a profile card needs
+DIRECTORY_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "full_name": 1,
+    "name_key": 1,
+    "university": 1,
+    "passout_year": 1,
+    "location": 1,
+    "company": 1,
+    "domain": 1,
+    "profile_picture": 1,
+    "profile_thumbnail": 1,
+}
+
+# Profile reads never ship the password or a legacy embedded donation history
+PROFILE_PROJECTION = {"_id": 0, "password": 0, "donations": 0}
+
+# Login reads the hash plus the slim profile the client keeps for the session
+SESSION_PROFILE_FIELDS = [
+    "id", "full_name", "email", "university", "passout_year", "location", "company",
+    "domain", "phone", "profile_picture", "registered_events", "donation_total", "donation_count",
+]
+LOGIN_PROJECTION = {"_id": 0, "password": 1, **{field: 1 for field in SESSION_PROFILE_FIELDS}}
+
+search_index = AlumniSearchIndex()
+recommender = AlumniRecommender(top_k=int(os.environ.get('RECOMMENDATIONS_TOP_K', '20')))
+RECOMMENDATIONS_REBUILD_SECONDS = float(os.environ.get('RECOMMENDATIONS_REBUILD_SECONDS', '3600'))
+password_hasher = hasher_from_env()
+# Uploaded profile pictures; thumbnails are generated in worker processes
+image_store = image_store_from_env()
+session_tokens = tokens_from_env()
+# Imported accounts get a cheap hash that is upgraded to BCRYPT_ROUNDS on first login
+IMPORT_BCRYPT_ROUNDS = int(os.environ.get('IMPORT_BCRYPT_ROUNDS', '4'))
+# Feedback and the registration audit trail are batched; see WRITE_BEHIND_COLLECTIONS
+write_behind = write_behind_from_env(metrics)
+# Admission control per route; see admission.py. Routes not listed (events, stats,
+# counts, media, the message stream) are cheap or long-lived and are never queued
+ADMISSION_POLICIES = {
+    # Bounded ahead of the hash pool, so a login storm queues briefly instead of failing at once
+    "POST /api/login": RoutePolicy(concurrency=32, queue=128, queue_timeout=2.0, client_rate=1, client_burst=20),
+    "POST /api/register": RoutePolicy(concurrency=16, queue=64, queue_timeout=2.0, client_rate=0.2, client_burst=5),
+    "GET /api/user/{user_id}": RoutePolicy(concurrency=64, queue=512, queue_timeout=1.0),
+    "PUT /api/user/{user_id}": RoutePolicy(concurrency=16, queue=64, queue_timeout=2.0, client_rate=1, client_burst=10),
+    "POST /api/user/{user_id}/avatar": RoutePolicy(concurrency=4, queue=16, queue_timeout=5.0, client_rate=0.1, client_burst=3),
+    "GET /api/alumni": RoutePolicy(concurrency=32, queue=256, queue_timeout=1.0, client_concurrency=8),
+    "GET /api/alumni/search": RoutePolicy(concurrency=32, queue=256, queue_timeout=1.0, client_concurrency=8),
+    "GET /api/user/{user_id}/recommendations": RoutePolicy(concurrency=32, queue=256, queue_timeout=1.0),
+    "POST /api/events/register": RoutePolicy(concurrency=64, queue=1024, queue_timeout=3.0, client_concurrency=16),
+    "POST /api/messages": RoutePolicy(concurrency=64, queue=512, queue_timeout=1.0, client_rate=5, client_burst=20),
+    "GET /api/messages/{user_id}": RoutePolicy(concurrency=64, queue=256, queue_timeout=1.0),
+    "GET /api/inbox/{user_id}": RoutePolicy(concurrency=64, queue=256, queue_timeout=1.0),
+    "POST /api/donate": RoutePolicy(concurrency=32, queue=512, queue_timeout=3.0, client_concurrency=4),
+    "GET /api/user/{user_id}/donations": RoutePolicy(concurrency=32, queue=256, queue_timeout=1.0),
+    "POST /api/feedback": RoutePolicy(rate=100, burst=500, client_rate=0.1, client_burst=5),
+    "POST /api/admin/import/alumni": RoutePolicy(concurrency=1, queue=2, queue_timeout=60.0),
+    "GET /api/admin/export/{dataset}": RoutePolicy(concurrency=2, queue=4, queue_timeout=30.0),
+}
+admission = admission_from_env(ADMISSION_POLICIES, metrics)
+# Tells the other workers about writes that affect their in-memory caches (off with one worker)
+cache_bus = invalidation_bus_from_env()
+broker = create_broker(os.environ.get('MESSAGE_BROKER', 'bus' if cache_bus.enabled else 'memory'), bus=cache_bus)
+STREAM_QUEUE_SIZE = int(os.environ.get('STREAM_QUEUE_SIZE', '100'))
+STREAM_KEEPALIVE_SECONDS = 15
+
+event_catalog = EventCatalog()
+seat_ledger = SeatLedger()
+EVENTS_CACHE_CONTROL = "public, no-cache"
+REGISTRATION_MESSAGES = {
+    REGISTERED: "Registration Successful!",
+    WAITLISTED: "The event is full, so you have been added to the waitlist",
+    PENDING: "Your registration is being processed",
+}
+
+# Dashboard stats are served from counters in this document, kept current with $inc
+STATS_DOC_ID = "stats"
+STATS_SOURCES = {
+    "total_alumni": "users",
+    "total_donations": "donations",
+    "total_event_registrations": "event_registrations",
+}
+# Waitlisted and in-flight registrations do not hold a seat
+STATS_FILTERS = {"total_event_registrations": {"status": {"$nin": [PENDING, WAITLISTED]}}}
+STATS_CACHE_TTL = float(os.environ.get('STATS_CACHE_TTL', '5'))
+# Bumped on every write to what a collection's listing shows; listing ETags are derived from it
+VERSIONS_DOC_ID = "versions"
+DIRECTORY_VERSION_TTL = float(os.environ.get('DIRECTORY_VERSION_TTL_SECONDS', '1'))
+DIRECTORY_CACHE_CONTROL = "public, no-cache"
+MESSAGES_CACHE_CONTROL = "private, no-cache"
+STATS_RECONCILE_SECONDS = float(os.environ.get('STATS_RECONCILE_SECONDS', '300'))
+HEALTH_PING_TIMEOUT = float(os.environ.get('HEALTH_PING_TIMEOUT_SECONDS', '2'))
+
+def name_key(full_name: str) -> str:
+    return " ".join(full_name.split()).lower()
+
+def conversation_key(user_id: str, other_user_id: str) -> str:
+    # Both participants map to the same key regardless of who sent the message
+    return ":".join(sorted((user_id, other_user_id)))
+
+def utc_now() -> datetime:
+    # BSON dates keep milliseconds; truncating here keeps responses and cursors equal to what is stored
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def timestamp_cursor(cursor: str) -> list:
+    values = decode_cursor(cursor)
+    if len(values) != 2:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        timestamp = datetime.fromisoformat(values[0])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return [timestamp, values[1]]
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(values)).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = orjson.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Cursor values go straight into query filters, so anything but strings (e.g. {"$ne": null}) is rejected
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+async def require_admin(x_admin_key: Optional[str] = Header(None)):
+    admin_key = os.environ.get('ADMIN_API_KEY')
+    if not admin_key:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key, admin_key):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+async def current_user(authorization: Optional[str] = Header(None)) -> Principal:
+    token = bearer_token(authorization)
+    if token is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return session_tokens.verify(token)
+    except TokenError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+
+def require_self(principal: Principal, user_id: str):
+    if principal.id != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed to act for another user")
 
 # Models
 class UserCreate(BaseModel):
@@ -37,12 +259,15 @@ class UserCreate(BaseModel):
     phone: str
     profile_picture: Optional[str] = None
 
-class User(BaseModel):
+class LoginRequest(BaseModel):
+    email: str
+    password: str
+
+class SessionProfile(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str
     full_name: str
     email: str
-    password: str
     university: str
     passout_year: int
     location: str
@@ -51,12 +276,14 @@ class User(BaseModel):
     phone: str
     profile_picture: Optional[str] = None
     registered_events: List[str] = []
-    donations: List[dict] = []
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    donation_total: float = 0.0
+    donation_count: int = 0
 
-class LoginRequest(BaseModel):
-    email: str
-    password: str
+class Session(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+    user: SessionProfile
 
 class EventRegistration(BaseModel):
     user_id: str
@@ -69,10 +296,11 @@ class EventRegistration(BaseModel):
 class Message(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    conversation_id: str = ""
     sender_id: str
     receiver_id: str
     message: str
-    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    timestamp: datetime = Field(default_factory=utc_now)
 
 class MessageCreate(BaseModel):
     sender_id: str
@@ -89,7 +317,7 @@ class Donation(BaseModel):
     amount: float
     purpose: str
     message: Optional[str] = None
-    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    timestamp: datetime = Field(default_factory=utc_now)
 
 class DonationCreate(BaseModel):
     user_id: str
@@ -106,13 +334,23 @@ class Feedback(BaseModel):
     name: str
     email: str
     message: str
-    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    timestamp: datetime = Field(default_factory=utc_now)
 
 class FeedbackCreate(BaseModel):
     name: str
     email: str
     message: str
 
+class EventUpsert(BaseModel):
+    title: str
+    date: date
+    location: str
+    image: Optional[str] = None
+    description: str
+    has_registration: bool = False
+    capacity: Optional[int] = Field(default=None, ge=0)
+    waitlist: bool = False
+
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     location: Optional[str] = None
@@ -121,240 +359,689 @@ class UserUpdate(BaseModel):
     phone: Optional[str] = None
     profile_picture: Optional[str] = None
 
+def new_user_doc(user: UserCreate) -> dict:
+    doc = {"id": str(uuid.uuid4()), **user.model_dump()}
+    doc.update(
+        registered_events=[],
+        donation_total=0.0,
+        donation_count=0,
+        created_at=utc_now(),
+        name_key=name_key(user.full_name),
+    )
+    return doc
+
+def user_doc_from_record(record: dict) -> dict:
+    return new_user_doc(UserCreate.model_validate(record))
+
+def hash_imported_passwords(docs: List[dict]):
+    hashes = password_hasher.hash_many_sync([doc["password"] for doc in docs], IMPORT_BCRYPT_ROUNDS)
+    for doc, hashed in zip(docs, hashes):
+        doc["password"] = hashed
+
+def new_session(profile: dict) -> ORJSONResponse:
+    return ORJSONResponse({
+        "access_token": session_tokens.issue(profile),
+        "token_type": "bearer",
+        "expires_in": session_tokens.ttl,
+        "user": {field: profile[field] for field in SESSION_PROFILE_FIELDS if field in profile},
+    })
+
+def version_bump(collection: str) -> dict:
+    # A new epoch whenever the document is recreated keeps a rebuilt database from matching old ETags
+    return {"$inc": {collection: 1}, "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}}
+
+def listing_etag(kind: str, version: str, query: str) -> str:
+    # Weak: the same listing may be sent gzip-, brotli- or un-encoded
+    digest = hashlib.blake2b(query.encode(), digest_size=8).hexdigest()
+    return f'W/"{kind}-{version}-{digest}"'
+
+def directory_card(profile: dict) -> dict:
+    # Cards show the small thumbnail when the picture was uploaded rather than linked
+    profile.pop("name_key", None)
+    thumbnail = profile.pop("profile_thumbnail", None)
+    if thumbnail:
+        profile["profile_picture"] = thumbnail
+    return profile
+
+def auth_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Authentication is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 # Routes
-@api_router.post("/register", response_model=User)
+@api_router.post("/register", response_model=Session)
 async def register(user_data: UserCreate):
     # Check if email exists
     existing = await db.users.find_one({"email": user_data.email})
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    user = User(**user_data.model_dump())
-    doc = user.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
+    doc = new_user_doc(user_data)
+    try:
+        doc['password'] = await password_hasher.hash(user_data.password)
+    except HasherBusy:
+        raise auth_busy()
     
-    await db.users.insert_one(doc)
-    return user
+    try:
+        await db.users.insert_one(doc)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration for the same email
+        raise HTTPException(status_code=400, detail="Email already registered")
+    await bump_stat("total_alumni")
+    await bump_version("users")
+    cache_bus.publish("users", [doc["id"]])
+    search_index.add(doc)
+    recommender.update(doc)
+    return new_session(doc)
 
-@api_router.post("/login")
-async def login(login_data: LoginRequest):
-    user = await db.users.find_one({"email": login_data.email, "password": login_data.password}, {"_id": 0})
-    if not user:
+@api_router.post("/login", response_model=Session)
+async def login(login_data: LoginRequest, background_tasks: BackgroundTasks):
+    user = await db.users.find_one({"email": login_data.email}, LOGIN_PROJECTION)
+    stored = user.get("password") if user else None
+    try:
+        matches, needs_rehash = await password_hasher.verify(login_data.password, stored)
+    except HasherBusy:
+        raise auth_busy()
+    if not matches:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    
-    return user
+
+    if needs_rehash:
+        background_tasks.add_task(upgrade_password_hash, user["id"], stored, login_data.password)
+    return new_session(user)
+
+async def upgrade_password_hash(user_id: str, stored: str, password: str):
+    try:
+        hashed = await password_hasher.hash(password)
+    except HasherBusy:
+        return  # Upgrade again on a later login
+    # Only replace the exact hash we verified, never a password changed in the meantime
+    await db.users.update_one({"id": user_id, "password": stored}, {"$set": {"password": hashed}})
 
 @api_router.get("/user/{user_id}")
 async def get_user(user_id: str):
-    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    user = await db.users.find_one({"id": user_id}, PROFILE_PROJECTION)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return ORJSONResponse(user)
 
 @api_router.put("/user/{user_id}")
-async def update_user(user_id: str, update_data: UserUpdate):
+async def update_user(user_id: str, update_data: UserUpdate, principal: Principal = Depends(current_user)):
+    require_self(principal, user_id)
     update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
     
     if not update_dict:
         raise HTTPException(status_code=400, detail="No fields to update")
+    if "full_name" in update_dict:
+        update_dict["name_key"] = name_key(update_dict["full_name"])
+    if "profile_picture" in update_dict:
+        # A different linked picture replaces an uploaded one, thumbnails included
+        await db.users.update_one(
+            {"id": user_id, "profile_picture": {"$ne": update_dict["profile_picture"]}},
+            {"$unset": {"profile_thumbnail": "", "avatar": ""}},
+        )
     
     result = await db.users.update_one({"id": user_id}, {"$set": update_dict})
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     
-    updated_user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
-    return updated_user
+    if update_dict.keys() & DIRECTORY_PROJECTION.keys():
+        await bump_version("users")
+    updated_user = await db.users.find_one({"id": user_id}, PROFILE_PROJECTION)
+    cache_bus.publish("users", [user_id])
+    if updated_user:
+        search_index.add(updated_user)
+        recommender.update(updated_user)
+        if update_dict.keys() & {"full_name", "profile_picture"}:
+            await refresh_profile(db.conversations, updated_user)
+    return ORJSONResponse(updated_user)
+
+@api_router.post("/user/{user_id}/avatar")
+async def upload_avatar(user_id: str, file: UploadFile = File(...), principal: Principal = Depends(current_user)):
+    require_self(principal, user_id)
+    data = await file.read(image_store.max_bytes + 1)
+    if len(data) > image_store.max_bytes:
+        raise HTTPException(status_code=413, detail=f"Images are limited to {image_store.max_bytes // 2 ** 20} MB")
+    try:
+        urls = await image_store.save(data)
+    except InvalidImage as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {exc}")
+    except ImageStoreBusy:
+        raise HTTPException(status_code=503, detail="Image processing is busy, please retry shortly",
+                            headers={"Retry-After": "1"})
+
+    updated_user = await db.users.find_one_and_update(
+        {"id": user_id},
+        {"$set": {"profile_picture": urls[PROFILE_SIZE], "profile_thumbnail": urls[DIRECTORY_SIZE], "avatar": urls}},
+        projection=PROFILE_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+    if not updated_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    await bump_version("users")
+    cache_bus.publish("users", [user_id])
+    await refresh_profile(db.conversations, updated_user)
+    return ORJSONResponse(updated_user)
+
+@api_router.get("/media/avatars/{name}")
+async def get_avatar(name: str):
+    path = image_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    # The name is the hash of the content, so it can be cached for good
+    return FileResponse(path, media_type="image/webp", headers={"Cache-Control": AVATAR_CACHE_CONTROL})
 
 @api_router.get("/events")
-async def get_events():
-    # Return hardcoded events for prototype
-    events = [
-        {
-            "id": "evt1",
-            "title": "Global Alumni Summit 2025",
-            "date": "2025-12-20",
-            "location": "San Francisco, CA",
-            "image": "https://images.unsplash.com/photo-1590650046871-92c887180603",
-            "description": "Join us for our annual alumni summit featuring keynote speakers from Fortune 500 companies, networking sessions, and celebration dinner. Reconnect with classmates and build meaningful professional relationships.",
-            "has_registration": True
-        },
-        {
-            "id": "evt2",
-            "title": "Tech Innovation Workshop",
-            "date": "2025-12-25",
-            "location": "Virtual Event",
-            "image": "https://images.unsplash.com/photo-1758520144420-3e5b22e9b9a4",
-            "description": "Explore cutting-edge technologies with industry leaders. Learn about AI, blockchain, and cloud computing through hands-on workshops. Perfect for alumni looking to upskill and stay ahead in their careers.",
-            "has_registration": True
-        },
-        {
-            "id": "evt3",
-            "title": "Alumni Career Fair",
-            "date": "2026-01-10",
-            "location": "New York, NY",
-            "image": "https://images.unsplash.com/photo-1758599543132-ba9b306d715e",
-            "description": "Meet top recruiters and explore exciting career opportunities across various industries. Network with hiring managers and learn about job openings tailored for our alumni community.",
-            "has_registration": False
-        },
-        {
-            "id": "evt4",
-            "title": "Winter Homecoming Celebration",
-            "date": "2026-01-15",
-            "location": "Global Horizon Campus",
-            "image": "https://images.pexels.com/photos/34513728/pexels-photo-34513728.jpeg",
-            "description": "Come back to campus for a nostalgic celebration of memories. Tour the new facilities, meet current students, and enjoy an evening of music, food, and reconnecting with old friends.",
-            "has_registration": True
-        },
-        {
-            "id": "evt5",
-            "title": "Entrepreneurship Mentorship Program Launch",
-            "date": "2026-02-01",
-            "location": "Boston, MA",
-            "image": "https://images.pexels.com/photos/34504392/pexels-photo-34504392.jpeg",
-            "description": "Launch event for our new mentorship program connecting experienced entrepreneurs with aspiring alumni founders. Get guidance, funding advice, and access to our startup ecosystem.",
-            "has_registration": True
-        },
-        {
-            "id": "evt6",
-            "title": "Spring Sports Tournament",
-            "date": "2026-03-05",
-            "location": "Los Angeles, CA",
-            "image": "https://images.unsplash.com/photo-1577985043696-8bd54d9f093f",
-            "description": "Annual alumni sports tournament featuring basketball, soccer, and tennis competitions. Bring your competitive spirit and team pride for a day of athletics and camaraderie.",
-            "has_registration": False
-        },
-        {
-            "id": "evt7",
-            "title": "Women in Leadership Conference",
-            "date": "2026-03-20",
-            "location": "Chicago, IL",
-            "image": "https://images.unsplash.com/photo-1590650046871-92c887180603",
-            "description": "Empowering conference celebrating women alumni leaders. Features panel discussions, workshops on career advancement, and networking opportunities with influential female executives.",
-            "has_registration": False
-        },
-        {
-            "id": "evt8",
-            "title": "Global Alumni Golf Classic",
-            "date": "2026-04-12",
-            "location": "Pebble Beach, CA",
-            "image": "https://images.unsplash.com/photo-1485182708500-e8f1318ba72",
-            "description": "Prestigious golf tournament at world-class venue. Enjoy a day on the greens with fellow alumni, followed by awards ceremony and gala dinner overlooking the Pacific Ocean.",
-            "has_registration": False
-        },
-        {
-            "id": "evt9",
-            "title": "Alumni Art & Culture Gala",
-            "date": "2026-05-08",
-            "location": "Washington, DC",
-            "image": "https://images.pexels.com/photos/1454360/pexels-photo-1454360.jpeg",
-            "description": "Elegant evening celebrating artistic achievements of our alumni. Features art exhibition, live performances, and fundraising auction supporting arts education programs at Global Horizon.",
-            "has_registration": False
-        },
-        {
-            "id": "evt10",
-            "title": "50th Anniversary Reunion Weekend",
-            "date": "2026-06-15",
-            "location": "Global Horizon Campus",
-            "image": "https://images.unsplash.com/photo-1541339907198-e08756dedf3f",
-            "description": "Grand celebration marking 50 years of Global Horizon University. Three days of festivities including campus tours, class reunions, special ceremonies, and commemorative gala dinner.",
-            "has_registration": False
-        }
-    ]
-    return events
+async def get_events(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    has_registration: Optional[bool] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    cached = await event_catalog.response(
+        date_from.isoformat() if date_from else None,
+        date_to.isoformat() if date_to else None,
+        has_registration,
+    )
+    headers = {"ETag": cached.etag, "Cache-Control": EVENTS_CACHE_CONTROL}
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+@api_router.put("/events/{event_id}", dependencies=[Depends(require_admin)])
+async def upsert_event(event_id: str, event_data: EventUpsert):
+    doc = event_data.model_dump()
+    doc['date'] = doc['date'].isoformat()
+    await db.events.update_one({"id": event_id}, {"$set": doc}, upsert=True)
+    event_catalog.invalidate()
+    stats_cache.invalidate()
+    cache_bus.publish("events", [event_id])
+    if doc["has_registration"]:
+        # A capacity increase frees seats for the waitlist
+        promoted = await seat_ledger.promote({"id": event_id, **doc})
+        if promoted:
+            await db.users.update_many({"id": {"$in": promoted}}, {"$addToSet": {"registered_events": event_id}})
+            await bump_stat("total_event_registrations", len(promoted))
+    return {"id": event_id, **doc}
 
 @api_router.post("/events/register")
-async def register_event(registration: EventRegistration):
+async def register_event(registration: EventRegistration, principal: Principal = Depends(current_user)):
+    require_self(principal, registration.user_id)
+    event = await event_catalog.get(registration.event_id)
+    if event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if not event.get("has_registration"):
+        raise HTTPException(status_code=400, detail="This event does not take registrations")
+
     reg_doc = registration.model_dump()
-    reg_doc['timestamp'] = datetime.now(timezone.utc).isoformat()
-    
-    await db.event_registrations.insert_one(reg_doc)
-    
-    # Add event to user's registered events
-    await db.users.update_one(
-        {"id": registration.user_id},
-        {"$addToSet": {"registered_events": registration.event_id}}
-    )
-    
-    return {"message": "Registration Successful!", "success": True}
+    reg_doc['timestamp'] = utc_now()
+    try:
+        result = await seat_ledger.register(event, reg_doc)
+    except EventFull:
+        await audit_registration(registration, "rejected", created=False)
+        raise HTTPException(status_code=409, detail="Event is full")
+    await audit_registration(registration, result.status, result.created)
+
+    if result.created and result.status == REGISTERED:
+        await bump_stat("total_event_registrations")
+        # Add event to user's registered events
+        await db.users.update_one(
+            {"id": registration.user_id},
+            {"$addToSet": {"registered_events": registration.event_id}}
+        )
+
+    response = {
+        "message": REGISTRATION_MESSAGES[result.status],
+        "success": True,
+        "status": result.status,
+        "already_registered": not result.created,
+    }
+    if result.status == WAITLISTED:
+        response["waitlist_position"] = result.waitlist_position
+    return ORJSONResponse(response)
+
+async def audit_registration(registration: EventRegistration, outcome: str, created: bool):
+    try:
+        await write_behind.insert("event_registration_audit", {
+            "event_id": registration.event_id,
+            "user_id": registration.user_id,
+            "outcome": outcome,
+            "created": created,
+            "timestamp": utc_now(),
+        })
+    except WriteQueueFull:
+        # The registration itself is stored; only its audit entry is lost
+        logger.warning("Audit entry dropped for %s on %s", registration.user_id, registration.event_id)
+
+@api_router.get("/events/{event_id}/registrations/count")
+async def get_registration_count(event_id: str):
+    event = await event_catalog.get(event_id)
+    if event is None or not event.get("has_registration"):
+        raise HTTPException(status_code=404, detail="Event not found")
+    return ORJSONResponse(await seat_ledger.counts(event))
 
 @api_router.get("/alumni")
-async def get_alumni():
-    alumni = await db.users.find({}, {"_id": 0, "password": 0}).to_list(1000)
-    return alumni
+async def get_alumni(
+    request: Request,
+    limit: int = Query(30, ge=1, le=100),
+    cursor: Optional[str] = None,
+    name: Optional[str] = None,
+    company: Optional[str] = None,
+    domain: Optional[str] = None,
+    passout_year: Optional[int] = None,
+    location: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    # Read before the page so the ETag can only be older than the data, never newer
+    etag = listing_etag("alumni", await directory_version.get(), request.url.query)
+    headers = {"ETag": etag, "Cache-Control": DIRECTORY_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    query = {}
+    if name and name.strip():
+        query["name_key"] = {"$regex": "^" + re.escape(name_key(name))}
+    if company:
+        query["company"] = company
+    if domain:
+        query["domain"] = domain
+    if passout_year is not None:
+        query["passout_year"] = passout_year
+    if location:
+        query["location"] = location
+
+    # Keyset pagination on (name_key, id): each page is an index seek, not a skip
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 2:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        last_key, last_id = values
+        query["$or"] = [
+            {"name_key": {"$gt": last_key}},
+            {"name_key": last_key, "id": {"$gt": last_id}},
+        ]
+
+    alumni = await db.users.find(query, DIRECTORY_PROJECTION).sort(DIRECTORY_SORT).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(alumni) > limit:
+        alumni = alumni[:limit]
+        next_cursor = encode_cursor([alumni[-1]["name_key"], alumni[-1]["id"]])
+    for alumnus in alumni:
+        directory_card(alumnus)
+
+    return ORJSONResponse({"items": alumni, "next_cursor": next_cursor}, headers=headers)
+
+@api_router.post("/admin/import/alumni", dependencies=[Depends(require_admin)])
+async def import_alumni(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$"),
+    chunk_size: int = Query(1000, ge=1, le=10000),
+):
+    try:
+        fmt = format or detect_format(file.filename)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    async def index_imported(docs: List[dict]):
+        await bump_stat("total_alumni", len(docs))
+        await bump_version("users")
+        cache_bus.publish("users", [doc["id"] for doc in docs])
+        for doc in docs:
+            search_index.add(doc)
+            recommender.update(doc)
+
+    # The upload is spooled to a temporary file; rows are read from it lazily
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return await import_users(
+            db, stream, fmt, user_doc_from_record, chunk_size, index_imported, hash_imported_passwords
+        )
+    finally:
+        stream.detach()
+
+@api_router.get("/admin/export/{dataset}", dependencies=[Depends(require_admin)])
+async def export_dataset(
+    dataset: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    fields: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    batch_size: int = Query(1000, ge=1, le=10000),
+):
+    if dataset not in EXPORTS:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    try:
+        selected = export_fields(dataset, fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    collection = db[EXPORTS[dataset]["collection"]]
+    query = export_query(dataset, date_from, date_to)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    extension = "csv" if format == "csv" else "ndjson"
+    return StreamingResponse(
+        stream_export(collection, selected, query, format, batch_size, EXPORTS[dataset].get("defaults")),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{extension}"'},
+    )
+
+@api_router.get("/alumni/search")
+async def search_alumni(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=50),
+):
+    if not search_index.ready:
+        raise HTTPException(status_code=503, detail="Search index is warming up")
+
+    ranked = search_index.search(q, limit)
+    if not ranked:
+        return {"items": []}
+
+    ids = [doc_id for doc_id, _ in ranked]
+    profiles = await db.users.find({"id": {"$in": ids}}, DIRECTORY_PROJECTION).to_list(len(ids))
+    by_id = {}
+    for profile in profiles:
+        by_id[profile["id"]] = directory_card(profile)
+
+    items = []
+    for doc_id, score in ranked:
+        profile = by_id.get(doc_id)
+        if profile is not None:
+            profile["score"] = round(score, 4)
+            items.append(profile)
+    return ORJSONResponse({"items": items})
+
+@api_router.get("/user/{user_id}/recommendations")
+async def get_recommendations(
+    user_id: str,
+    limit: int = Query(12, ge=1, le=50),
+    principal: Principal = Depends(current_user),
+):
+    require_self(principal, user_id)
+    if not recommender.ready:
+        raise HTTPException(status_code=503, detail="Recommendations are warming up")
+
+    ranked = recommender.recommend(user_id, limit)
+    if not ranked:
+        return ORJSONResponse({"items": []})
+
+    ids = [doc_id for doc_id, _ in ranked]
+    profiles = await db.users.find({"id": {"$in": ids}}, DIRECTORY_PROJECTION).to_list(len(ids))
+    by_id = {}
+    for profile in profiles:
+        by_id[profile["id"]] = directory_card(profile)
+
+    items = []
+    for doc_id, score in ranked:
+        profile = by_id.get(doc_id)
+        if profile is not None:
+            profile["score"] = round(score, 4)
+            items.append(profile)
+    return ORJSONResponse({"items": items})
 
 @api_router.post("/messages", response_model=Message)
-async def send_message(message_data: MessageCreate):
-    message = Message(**message_data.model_dump())
-    doc = message.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    
+async def send_message(message_data: MessageCreate, principal: Principal = Depends(current_user)):
+    require_self(principal, message_data.sender_id)
+    doc = {
+        "id": str(uuid.uuid4()),
+        "conversation_id": conversation_key(message_data.sender_id, message_data.receiver_id),
+        **message_data.model_dump(),
+        "timestamp": utc_now(),
+    }
+    # The summary is written after the message: conversation ETags are derived from its last
+    # message, so it must never point at a message that is not readable yet
     await db.messages.insert_one(doc)
-    return message
+    await record_message(db.conversations, db.users, doc)
+    doc.pop("_id", None)
+
+    # Serialized once for the stream fan-out and the response; push to both participants
+    # so the sender's other open tabs update too
+    payload = orjson.dumps(doc)
+    text = payload.decode()
+    await broker.publish(f"user:{message_data.receiver_id}", text)
+    if message_data.sender_id != message_data.receiver_id:
+        await broker.publish(f"user:{message_data.sender_id}", text)
+    return Response(content=payload, media_type="application/json")
+
+@api_router.get("/messages/{user_id}/stream")
+async def stream_messages(
+    user_id: str,
+    request: Request,
+    access_token: Optional[str] = None,
+    authorization: Optional[str] = Header(None),
+):
+    # EventSource cannot set headers, so the token may also come as a query parameter
+    if access_token:
+        authorization = f"Bearer {access_token}"
+    require_self(await current_user(authorization), user_id)
+    subscription = broker.subscribe(f"user:{user_id}", max_queue=STREAM_QUEUE_SIZE)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    payload = await subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if payload is CLOSED:
+                    # This worker is shutting down; the client reconnects to another one
+                    break
+                if payload is OVERFLOW:
+                    # Client fell behind; it reconnects and catches up with a since fetch
+                    yield "event: overflow\ndata: {}\n\n"
+                    break
+                yield f"event: message\ndata: {payload}\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @api_router.get("/messages/{user_id}")
-async def get_messages(user_id: str, other_user_id: str):
-    messages = await db.messages.find(
-        {
-            "$or": [
-                {"sender_id": user_id, "receiver_id": other_user_id},
-                {"sender_id": other_user_id, "receiver_id": user_id}
+async def get_messages(
+    request: Request,
+    user_id: str,
+    other_user_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    since: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    principal: Principal = Depends(current_user),
+):
+    require_self(principal, user_id)
+    if before and since:
+        raise HTTPException(status_code=400, detail="Use either before or since, not both")
+
+    # Messages are never edited, so the conversation's latest message versions every page of it
+    conversation_id = conversation_key(user_id, other_user_id)
+    summary = await db.conversations.find_one({"_id": conversation_id}, {"last_message.id": 1})
+    last_message_id = summary["last_message"]["id"] if summary else "empty"
+    etag = listing_etag("messages", last_message_id, request.url.query)
+    headers = {"ETag": etag, "Cache-Control": MESSAGES_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    query = {"conversation_id": conversation_id}
+    if since:
+        # Incremental fetch: only messages newer than the client's latest, oldest first
+        last_timestamp, last_id = timestamp_cursor(since)
+        query["$or"] = [
+            {"timestamp": {"$gt": last_timestamp}},
+            {"timestamp": last_timestamp, "id": {"$gt": last_id}},
+        ]
+        sort = [("timestamp", 1), ("id", 1)]
+    else:
+        # Backwards pagination: newest page first, older pages via the before cursor
+        if before:
+            first_timestamp, first_id = timestamp_cursor(before)
+            query["$or"] = [
+                {"timestamp": {"$lt": first_timestamp}},
+                {"timestamp": first_timestamp, "id": {"$lt": first_id}},
             ]
-        },
-        {"_id": 0}
-    ).sort("timestamp", 1).to_list(1000)
-    
-    return messages
+        sort = [("timestamp", -1), ("id", -1)]
+
+    messages = await db.messages.find(query, {"_id": 0}).sort(sort).limit(limit + 1).to_list(limit + 1)
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if not since:
+        messages.reverse()
+
+    older_cursor = None
+    if messages and not since and has_more:
+        older_cursor = encode_cursor([messages[0]["timestamp"], messages[0]["id"]])
+    newest_cursor = since
+    if messages:
+        newest_cursor = encode_cursor([messages[-1]["timestamp"], messages[-1]["id"]])
+
+    return ORJSONResponse({
+        "items": messages,
+        "before": older_cursor,
+        "since": newest_cursor,
+        "has_more": has_more,
+    }, headers=headers)
+
+@api_router.get("/inbox/{user_id}")
+async def get_inbox(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    principal: Principal = Depends(current_user),
+):
+    require_self(principal, user_id)
+    conversations = await inbox_page(db.conversations, user_id, limit, timestamp_cursor(cursor) if cursor else None)
+
+    next_cursor = None
+    if len(conversations) > limit:
+        conversations = conversations[:limit]
+        next_cursor = encode_cursor([conversations[-1]["last_timestamp"], conversations[-1]["_id"]])
+    return ORJSONResponse({
+        "items": [inbox_row(conversation, user_id) for conversation in conversations],
+        "next_cursor": next_cursor,
+    })
+
+@api_router.post("/inbox/{user_id}/{other_user_id}/read")
+async def mark_conversation_read(user_id: str, other_user_id: str, principal: Principal = Depends(current_user)):
+    require_self(principal, user_id)
+    conversation_id = conversation_key(user_id, other_user_id)
+    if not await mark_read(db.conversations, conversation_id, user_id):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return ORJSONResponse({"conversation_id": conversation_id, "unread": 0})
 
 @api_router.post("/donate", response_model=Donation)
-async def create_donation(donation_data: DonationCreate):
-    donation = Donation(**donation_data.model_dump())
-    doc = donation.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    
+async def create_donation(donation_data: DonationCreate, principal: Principal = Depends(current_user)):
+    require_self(principal, donation_data.user_id)
+    doc = {"id": str(uuid.uuid4()), **donation_data.model_dump(), "timestamp": utc_now()}
     await db.donations.insert_one(doc)
+    doc.pop("_id", None)
+    await bump_stat("total_donations")
     
-    # Add to user's donation history (create a clean copy without MongoDB _id)
-    user_donation = {
-        "id": donation.id,
-        "user_id": donation.user_id,
-        "name": donation.name,
-        "email": donation.email,
-        "phone": donation.phone,
-        "amount": donation.amount,
-        "purpose": donation.purpose,
-        "message": donation.message,
-        "timestamp": doc['timestamp']
-    }
-    await db.users.update_one(
+    # The history lives in db.donations; the profile only keeps running totals
+    donor = await db.users.find_one_and_update(
         {"id": donation_data.user_id},
-        {"$push": {"donations": user_donation}}
+        {"$inc": {"donation_total": donation_data.amount, "donation_count": 1}},
+        projection={"_id": 0, "passout_year": 1},
     )
+    await record_donation(db.donation_rollups, doc, (donor or {}).get("passout_year"))
     
-    return donation
+    return ORJSONResponse(doc)
+
+@api_router.get("/donations/analytics", dependencies=[Depends(require_admin)])
+async def get_donation_analytics():
+    return ORJSONResponse(await read_analytics(db.donation_rollups))
+
+@api_router.get("/user/{user_id}/donations")
+async def get_user_donations(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    principal: Principal = Depends(current_user),
+):
+    require_self(principal, user_id)
+    query = {"user_id": user_id}
+    if cursor:
+        last_timestamp, last_id = timestamp_cursor(cursor)
+        query["$or"] = [
+            {"timestamp": {"$lt": last_timestamp}},
+            {"timestamp": last_timestamp, "id": {"$lt": last_id}},
+        ]
+
+    donations = await db.donations.find(query, {"_id": 0}).sort(
+        [("timestamp", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(donations) > limit:
+        donations = donations[:limit]
+        next_cursor = encode_cursor([donations[-1]["timestamp"], donations[-1]["id"]])
+    return ORJSONResponse({"items": donations, "next_cursor": next_cursor})
 
 @api_router.post("/feedback", response_model=Feedback)
 async def create_feedback(feedback_data: FeedbackCreate):
-    feedback = Feedback(**feedback_data.model_dump())
-    doc = feedback.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    
-    await db.feedback.insert_one(doc)
-    return feedback
+    doc = {"id": str(uuid.uuid4()), **feedback_data.model_dump(), "timestamp": utc_now()}
+    try:
+        # The queue's copy gets an _id when flushed; the response keeps the original
+        await write_behind.insert("feedback", dict(doc))
+    except WriteQueueFull:
+        raise HTTPException(status_code=503, detail="Too many pending writes, please retry shortly",
+                            headers={"Retry-After": "1"})
+    return ORJSONResponse(doc)
 
-@api_router.get("/stats")
-async def get_stats():
-    total_alumni = await db.users.count_documents({})
-    total_donations = await db.donations.count_documents({})
-    
+async def load_stats():
+    counters = await db.counters.find_one({"_id": STATS_DOC_ID}) or {}
+    today = datetime.now(timezone.utc).date().isoformat()
     return {
-        "total_alumni": total_alumni,
-        "upcoming_events": 10,
-        "recent_donations": total_donations
+        "total_alumni": counters.get("total_alumni", 0),
+        "upcoming_events": await event_catalog.upcoming_count(today),
+        "recent_donations": counters.get("total_donations", 0),
+        "total_event_registrations": counters.get("total_event_registrations", 0),
     }
 
+stats_cache = TTLCache(load_stats, ttl=STATS_CACHE_TTL)
+
+@api_router.get("/stats")
+async def get_stats():
+    return await stats_cache.get()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=HEALTH_PING_TIMEOUT)
+    except Exception as error:
+        logger.warning("Health check failed: %r", error)
+        return ORJSONResponse({"status": "unavailable", "mongo": mongo.pool_stats()}, status_code=503)
+    return {"status": "ok", "mongo": mongo.pool_stats()}
+
+metrics.add_collector("mongo_pool", "MongoDB connection pool state", mongo.pool_totals)
+metrics.add_collector("write_behind", "Write-behind queue state", write_behind.stats)
+metrics.add_collector("password_hasher", "Password hashing pool state", password_hasher.stats)
+metrics.add_collector("avatar_store", "Profile picture processing pool state", image_store.stats)
+metrics.add_collector("message_broker", "Message fan-out state", broker.stats)
+metrics.add_collector("cache_bus", "Cross-worker cache invalidation bus", cache_bus.stats)
+metrics.add_collector("session_token_cache", "Verified session token cache", session_tokens.stats)
+metrics.add_collector("recommendations", "Alumni recommendation index", recommender.stats)
+metrics.add_collector("admission", "Admission control totals across limited routes", admission.stats)
+metrics.add_collector("search_index", "Alumni search index", lambda: {"documents": len(search_index)})
+
 # Include the router in the main app
 app.include_router(api_router)
+admission.bind(app.routes)
+
+# Innermost, so rejections still get CORS headers and every one is counted by the metrics
+app.add_middleware(AdmissionMiddleware, controller=admission)
 
 app.add_middleware(
     CORSMiddleware,
@@ -364,6 +1051,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware, **compression_options_from_env())
+
+# Outermost, so the timings include every other middleware
+app.add_middleware(
+    MetricsMiddleware,
+    metrics=metrics,
+    slow_seconds=float(os.environ.get('SLOW_REQUEST_MS', '500')) / 1000,
+)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -371,6 +1067,134 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def backfill_name_keys():
+    # Profiles created before the directory sort key existed
+    updated = 0
+    async for user in db.users.find({"name_key": {"$exists": False}}, {"_id": 0, "id": 1, "full_name": 1}):
+        await db.users.update_one({"id": user["id"]}, {"$set": {"name_key": name_key(user["full_name"])}})
+        updated += 1
+    if updated:
+        await bump_version("users")
+
+async def backfill_conversation_ids():
+    # Messages stored before conversation keys existed; one server-side pipeline update
+    await db.messages.update_many(
+        {"conversation_id": {"$exists": False}},
+        [{"$set": {"conversation_id": {"$cond": [
+            {"$lt": ["$sender_id", "$receiver_id"]},
+            {"$concat": ["$sender_id", ":", "$receiver_id"]},
+            {"$concat": ["$receiver_id", ":", "$sender_id"]},
+        ]}}}],
+    )
+
+# Timestamps were stored as ISO-8601 strings before they became BSON dates
+DATE_FIELDS = {
+    "users": "created_at",
+    "messages": "timestamp",
+    "donations": "timestamp",
+    "event_registrations": "timestamp",
+    "feedback": "timestamp",
+}
+
+async def backfill_native_dates(batch_size: int = 1000):
+    # Parsed client-side: $toDate does not accept every offset/precision isoformat() wrote
+    for collection, field in DATE_FIELDS.items():
+        ops = []
+        async for doc in db[collection].find({field: {"$type": "string"}}, {"_id": 1, field: 1}):
+            try:
+                value = datetime.fromisoformat(doc[field])
+            except ValueError:
+                logger.warning("Unparseable %s.%s on %s: %r", collection, field, doc["_id"], doc[field])
+                continue
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {field: value}}))
+            if len(ops) >= batch_size:
+                await db[collection].bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            await db[collection].bulk_write(ops, ordered=False)
+
+async def bump_stat(field: str, amount: int = 1):
+    await db.counters.update_one({"_id": STATS_DOC_ID}, {"$inc": {field: amount}}, upsert=True)
+
+async def bump_version(collection: str):
+    await db.counters.update_one({"_id": VERSIONS_DOC_ID}, version_bump(collection), upsert=True)
+    if collection == "users":
+        directory_version.invalidate()
+
+async def load_directory_version() -> str:
+    versions = await db.counters.find_one({"_id": VERSIONS_DOC_ID}) or {}
+    return f"{versions.get('epoch', '0')}.{versions.get('users', 0)}"
+
+# Other workers' writes are seen within the TTL; this worker's own writes invalidate it at once
+directory_version = TTLCache(load_directory_version, ttl=DIRECTORY_VERSION_TTL)
+
+async def on_events_changed(event_ids: Optional[list]):
+    event_catalog.invalidate()
+    stats_cache.invalidate()
+
+async def on_users_changed(user_ids: Optional[list]):
+    # Another worker wrote these profiles; None means any of them may have changed
+    directory_version.invalidate()
+    query = {} if user_ids is None else {"id": {"$in": user_ids}}
+    async for profile in db.users.find(query, PROFILE_PROJECTION).batch_size(5000):
+        search_index.add(profile)
+        recommender.update(profile)
+
+cache_bus.subscribe("events", on_events_changed)
+cache_bus.subscribe("users", on_users_changed)
+
+def begin_shutdown():
+    """Called by serve.py when a worker starts shutting down: end message streams so connections can drain."""
+    asyncio.ensure_future(broker.close())
+
+async def reconcile_stats():
+    """Re-check the stat counters against true collection counts and repair drift."""
+    for field, collection in STATS_SOURCES.items():
+        before = (await db.counters.find_one({"_id": STATS_DOC_ID}, {field: 1}) or {}).get(field)
+        actual = await db[collection].count_documents(STATS_FILTERS.get(field, {}))
+        after = (await db.counters.find_one({"_id": STATS_DOC_ID}, {field: 1}) or {}).get(field)
+        # A write landed mid-count, so the count may already be stale; retry next round
+        if before != after:
+            continue
+        if after != actual:
+            if after is not None:
+                logger.warning("Stat %s drifted: counter=%s actual=%d", field, after, actual)
+            await db.counters.update_one({"_id": STATS_DOC_ID}, {"$set": {field: actual}}, upsert=True)
+    stats_cache.invalidate()
+
+async def reconcile_seats():
+    events = [event["id"] for event in await event_catalog.all() if event.get("has_registration")]
+    for event_id in await seat_ledger.reconcile(events):
+        logger.warning("Seat counters for event %s drifted and were rebuilt", event_id)
+
+async def run_stats_reconciler():
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_SECONDS)
+        try:
+            await reconcile_stats()
+            await reconcile_seats()
+        except Exception:
+            logger.exception("Stats reconciliation failed")
+
+async def run_recommendations():
+    projection = {"_id": 0, "id": 1, "passout_year": 1, **{field: 1 for field in CATEGORICAL_WEIGHTS}}
+    while True:
+        try:
+            # Re-read every profile so changes made through other workers are picked up
+            async for profile in db.users.find({}, projection).batch_size(5000):
+                recommender.update(profile)
+            seconds = await rebuild_recommendations(recommender)
+            logger.info("Recommendations rebuilt for %d profiles in %.1f s", len(recommender), seconds)
+        except Exception:
+            logger.exception("Recommendation rebuild failed")
+        await asyncio.sleep(RECOMMENDATIONS_REBUILD_SECONDS)
+
+async def build_search_index():
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in SEARCH_FIELDS}}
+    async for profile in db.users.find({}, projection).batch_size(5000):
+        # Live register/update calls may have indexed a newer copy already
+        search_index.add(profile, overwrite=False)
+    search_index.ready = True
+    logger.info("Search index built with %d profiles", len(search_index))
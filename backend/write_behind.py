@@ -0,0 +1,171 @@
+"""Write-behind batching for low-priority inserts.
+
+Routes whose documents nobody reads back in the same request (feedback, the
+registration audit trail) hand them to ``WriteBehindQueue.insert`` and
+respond without waiting for MongoDB. A single flusher task coalesces queued
+documents into one ``insert_many`` per collection, flushing when
+``batch_size`` documents are waiting or ``flush_interval`` seconds after the
+first one arrived, whichever comes first.
+
+The queue holds at most ``max_pending`` documents. When it is full,
+``insert`` waits up to ``enqueue_timeout`` for room and then raises
+``WriteQueueFull``, so a stalled database turns into fast 503s instead of
+unbounded memory. Shutdown drains whatever is queued. Documents still queued
+when a process dies are lost, which is why only collections listed in
+``WRITE_BEHIND_COLLECTIONS`` are eligible; inserts into any other collection
+go straight to MongoDB.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+FLUSH_RETRIES = 3
+
+
+class WriteQueueFull(Exception):
+    pass
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        collections: Iterable[str],
+        max_pending: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        enqueue_timeout: float = 1.0,
+        metrics=None,
+    ):
+        self.collections = frozenset(collections)
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.metrics = metrics
+        self.db = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.flushed = 0
+        self.batches = 0
+        self.failed = 0
+        self.rejected = 0
+        self.last_flush_seconds = 0.0
+
+    def start(self, db):
+        self.db = db
+        self.closed = False
+        self.queue = asyncio.Queue(self.max_pending)
+        self.task = asyncio.create_task(self.run())
+
+    async def insert(self, collection: str, doc: dict):
+        if collection not in self.collections or self.task is None or self.closed:
+            await self.db[collection].insert_one(doc)
+            return
+        item = (collection, doc)
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self.queue.put(item), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise WriteQueueFull(collection)
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self.flush(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def flush(self, batch: List[Tuple[str, dict]]):
+        grouped: Dict[str, List[dict]] = {}
+        for collection, doc in batch:
+            grouped.setdefault(collection, []).append(doc)
+        for collection, docs in grouped.items():
+            await self._insert_many(collection, docs)
+
+    async def _insert_many(self, collection: str, docs: List[dict]):
+        for attempt in range(1, FLUSH_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                await self.db[collection].insert_many(docs, ordered=False)
+                inserted = len(docs)
+            except BulkWriteError as error:
+                # Unordered: everything but the failed documents was written; retrying would duplicate
+                errors = error.details.get("writeErrors", [])
+                inserted = len(docs) - len(errors)
+                self.failed += len(errors)
+                logger.error("Write-behind insert into %s rejected %d documents: %s",
+                             collection, len(errors), errors[0].get("errmsg") if errors else error)
+            except Exception:
+                if attempt == FLUSH_RETRIES:
+                    self.failed += len(docs)
+                    logger.exception("Dropped %d write-behind documents for %s", len(docs), collection)
+                    return
+                await asyncio.sleep(0.1 * 2 ** attempt)
+                continue
+            self.last_flush_seconds = time.perf_counter() - started
+            self.flushed += inserted
+            self.batches += 1
+            if self.metrics is not None:
+                self.metrics.observe_flush(collection, self.last_flush_seconds, len(docs))
+            return
+
+    async def drain(self, timeout: float = 10.0):
+        """Stop queueing new writes and flush everything already queued."""
+        if self.task is None:
+            return
+        self.closed = True
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error("Write-behind drain timed out with %d documents queued", self.queue.qsize())
+        self.task.cancel()
+        self.task = None
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_pending": self.max_pending,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+
+def write_behind_from_env(metrics=None) -> WriteBehindQueue:
+    collections = os.environ.get('WRITE_BEHIND_COLLECTIONS', 'feedback,event_registration_audit')
+    return WriteBehindQueue(
+        collections=[name.strip() for name in collections.split(",") if name.strip()],
+        max_pending=int(os.environ.get('WRITE_BEHIND_MAX_PENDING', '10000')),
+        batch_size=int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '500')),
+        flush_interval=float(os.environ.get('WRITE_BEHIND_FLUSH_MS', '50')) / 1000,
+        enqueue_timeout=float(os.environ.get('WRITE_BEHIND_ENQUEUE_TIMEOUT_MS', '1000')) / 1000,
+        metrics=metrics,
+    )
@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import axios from 'axios';
 import { BrowserRouter, Routes, Route, Navigate } from 'react-router-dom';
 import '@/App.css';
 import Homepage from '@/pages/Homepage';
@@ -19,18 +20,33 @@ function App() {
   useEffect(() => {
     // Check if user is logged in
     const user = localStorage.getItem('currentUser');
-    if (user) {
+    const token = localStorage.getItem('accessToken');
+    if (user && token) {
+      axios.defaults.headers.common.Authorization = `Bearer ${token}`;
       setCurrentUser(JSON.parse(user));
     }
+
+    // An expired or revoked session sends the user back to the login page
+    const interceptor = axios.interceptors.response.use(undefined, (error) => {
+      if (error.response?.status === 401 && axios.defaults.headers.common.Authorization) {
+        handleLogout();
+      }
+      return Promise.reject(error);
+    });
+    return () => axios.interceptors.response.eject(interceptor);
   }, []);
 
-  const handleLogin = (user) => {
-    localStorage.setItem('currentUser', JSON.stringify(user));
-    setCurrentUser(user);
+  const handleLogin = (session) => {
+    localStorage.setItem('currentUser', JSON.stringify(session.user));
+    localStorage.setItem('accessToken', session.access_token);
+    axios.defaults.headers.common.Authorization = `Bearer ${session.access_token}`;
+    setCurrentUser(session.user);
   };
 
   const handleLogout = () => {
     localStorage.removeItem('currentUser');
+    localStorage.removeItem('accessToken');
+    delete axios.defaults.headers.common.Authorization;
     setCurrentUser(null);
   };
 
@@ -4,3 +4,8 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// Uploaded pictures are served by the backend under a root-relative path
+export function mediaUrl(src) {
+  return src && src.startsWith('/') ? `${process.env.REACT_APP_BACKEND_URL}${src}` : src;
+}
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import Sidebar from '@/components/Sidebar';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
@@ -9,41 +9,89 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle } from '@/components/u
 import { ScrollArea } from '@/components/ui/scroll-area';
 import { Search, Send } from 'lucide-react';
 import { toast } from 'sonner';
+import { mediaUrl } from '@/lib/utils';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
 export default function Connect({ user, onLogout }) {
   const [alumni, setAlumni] = useState([]);
-  const [filteredAlumni, setFilteredAlumni] = useState([]);
+  const [recommended, setRecommended] = useState([]);
+  const [inbox, setInbox] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [searchQuery, setSearchQuery] = useState('');
   const [selectedAlumni, setSelectedAlumni] = useState(null);
   const [showChat, setShowChat] = useState(false);
   const [messages, setMessages] = useState([]);
+  const [olderCursor, setOlderCursor] = useState(null);
   const [newMessage, setNewMessage] = useState('');
 
   useEffect(() => {
-    fetchAlumni();
-  }, []);
+    const timer = setTimeout(() => fetchAlumni(null), 250);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
 
   useEffect(() => {
-    if (searchQuery) {
-      const filtered = alumni.filter(
-        (a) =>
-          a.id !== user.id &&
-          (a.full_name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-            a.company.toLowerCase().includes(searchQuery.toLowerCase()))
-      );
-      setFilteredAlumni(filtered);
-    } else {
-      setFilteredAlumni(alumni.filter((a) => a.id !== user.id));
-    }
-  }, [searchQuery, alumni, user.id]);
+    axios
+      .get(`${API}/user/${user.id}/recommendations`, { params: { limit: 6 } })
+      .then((response) => setRecommended(response.data.items))
+      .catch(() => setRecommended([]));
+  }, [user.id]);
+
+  const fetchInbox = () =>
+    axios
+      .get(`${API}/inbox/${user.id}`, { params: { limit: 6 } })
+      .then((response) => setInbox(response.data.items))
+      .catch(() => setInbox([]));
+
+  useEffect(() => {
+    fetchInbox();
+  }, [user.id]);
+
+  const selectedAlumniRef = useRef(null);
+
+  useEffect(() => {
+    selectedAlumniRef.current = showChat ? selectedAlumni : null;
+  }, [selectedAlumni, showChat]);
+
+  useEffect(() => {
+    // EventSource cannot send an Authorization header, so the token goes in the query string
+    const token = encodeURIComponent(localStorage.getItem('accessToken') || '');
+    const source = new EventSource(`${API}/messages/${user.id}/stream?access_token=${token}`);
 
-  const fetchAlumni = async () => {
+    source.addEventListener('message', (event) => {
+      const msg = JSON.parse(event.data);
+      const other = selectedAlumniRef.current;
+      fetchInbox();
+      if (!other || (msg.sender_id !== other.id && msg.receiver_id !== other.id)) return;
+      setMessages((current) => (current.some((m) => m.id === msg.id) ? current : [...current, msg]));
+    });
+
+    // The server cut us off for falling behind; reload the open conversation
+    source.addEventListener('overflow', () => {
+      if (selectedAlumniRef.current) openChat(selectedAlumniRef.current);
+    });
+
+    return () => source.close();
+  }, [user.id]);
+
+  const filteredAlumni = alumni.filter((a) => a.id !== user.id);
+
+  const fetchAlumni = async (cursor) => {
     try {
-      const response = await axios.get(`${API}/alumni`);
-      setAlumni(response.data);
+      if (searchQuery.trim()) {
+        const response = await axios.get(`${API}/alumni/search`, {
+          params: { q: searchQuery.trim(), limit: 30 }
+        });
+        setAlumni(response.data.items);
+        setNextCursor(null);
+        return;
+      }
+      const params = { limit: 30 };
+      if (cursor) params.cursor = cursor;
+      const response = await axios.get(`${API}/alumni`, { params });
+      setAlumni(cursor ? [...alumni, ...response.data.items] : response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error fetching alumni:', error);
     }
@@ -57,7 +105,23 @@ export default function Connect({ user, onLogout }) {
       const response = await axios.get(`${API}/messages/${user.id}`, {
         params: { other_user_id: alumniMember.id }
       });
-      setMessages(response.data);
+      setMessages(response.data.items);
+      setOlderCursor(response.data.before);
+    } catch (error) {
+      console.error('Error fetching messages:', error);
+    }
+    if (inbox.some((conversation) => conversation.other_user.id === alumniMember.id && conversation.unread > 0)) {
+      axios.post(`${API}/inbox/${user.id}/${alumniMember.id}/read`).then(fetchInbox).catch(() => {});
+    }
+  };
+
+  const loadEarlierMessages = async () => {
+    try {
+      const response = await axios.get(`${API}/messages/${user.id}`, {
+        params: { other_user_id: selectedAlumni.id, before: olderCursor }
+      });
+      setMessages([...response.data.items, ...messages]);
+      setOlderCursor(response.data.before);
     } catch (error) {
       console.error('Error fetching messages:', error);
     }
@@ -73,7 +137,9 @@ export default function Connect({ user, onLogout }) {
         message: newMessage
       });
 
-      setMessages([...messages, response.data]);
+      setMessages((current) =>
+        current.some((m) => m.id === response.data.id) ? current : [...current, response.data]
+      );
       setNewMessage('');
     } catch (error) {
       toast.error('Failed to send message');
@@ -96,7 +162,7 @@ export default function Connect({ user, onLogout }) {
               <Search className="absolute left-3 top-3 h-5 w-5 text-gray-400" />
               <Input
                 data-testid="connect-search-input"
-                placeholder="Search by name or company..."
+                placeholder="Search by name, company, domain or location..."
                 value={searchQuery}
                 onChange={(e) => setSearchQuery(e.target.value)}
                 className="pl-10"
@@ -104,6 +170,71 @@ export default function Connect({ user, onLogout }) {
             </div>
           </div>
 
+          {!searchQuery && inbox.length > 0 && (
+            <div className="mb-8" data-testid="connect-inbox">
+              <h2 className="text-xl font-semibold text-gray-800 mb-4">Recent conversations</h2>
+              <div className="grid sm:grid-cols-2 md:grid-cols-3 gap-4">
+                {inbox.map((conversation) => (
+                  <Card
+                    key={conversation.conversation_id}
+                    className="hover-lift cursor-pointer"
+                    onClick={() => openChat(conversation.other_user)}
+                    data-testid={`inbox-card-${conversation.other_user.id}`}
+                  >
+                    <CardHeader className="flex flex-row items-center gap-4">
+                      <Avatar className="w-12 h-12">
+                        <AvatarImage src={mediaUrl(conversation.other_user.profile_picture)} />
+                        <AvatarFallback className="bg-gradient-to-br from-blue-500 to-purple-500 text-white">
+                          {(conversation.other_user.full_name || '?').charAt(0)}
+                        </AvatarFallback>
+                      </Avatar>
+                      <div className="min-w-0 flex-1">
+                        <CardTitle className="text-base">{conversation.other_user.full_name}</CardTitle>
+                        <p className="text-sm text-gray-600 truncate">{conversation.last_message.preview}</p>
+                      </div>
+                      {conversation.unread > 0 && (
+                        <span className="rounded-full bg-blue-600 px-2 py-0.5 text-xs font-semibold text-white">
+                          {conversation.unread}
+                        </span>
+                      )}
+                    </CardHeader>
+                  </Card>
+                ))}
+              </div>
+            </div>
+          )}
+
+          {!searchQuery && recommended.length > 0 && (
+            <div className="mb-8" data-testid="connect-recommendations">
+              <h2 className="text-xl font-semibold text-gray-800 mb-4">Alumni you may know</h2>
+              <div className="grid sm:grid-cols-2 md:grid-cols-3 gap-4">
+                {recommended.map((alumniMember) => (
+                  <Card
+                    key={alumniMember.id}
+                    className="hover-lift cursor-pointer"
+                    onClick={() => openChat(alumniMember)}
+                    data-testid={`recommended-card-${alumniMember.id}`}
+                  >
+                    <CardHeader className="flex flex-row items-center gap-4">
+                      <Avatar className="w-12 h-12">
+                        <AvatarImage src={mediaUrl(alumniMember.profile_picture)} />
+                        <AvatarFallback className="bg-gradient-to-br from-blue-500 to-purple-500 text-white">
+                          {alumniMember.full_name.charAt(0)}
+                        </AvatarFallback>
+                      </Avatar>
+                      <div>
+                        <CardTitle className="text-base">{alumniMember.full_name}</CardTitle>
+                        <p className="text-sm text-gray-600">
+                          {alumniMember.company} · Batch of {alumniMember.passout_year}
+                        </p>
+                      </div>
+                    </CardHeader>
+                  </Card>
+                ))}
+              </div>
+            </div>
+          )}
+
           <div className="grid md:grid-cols-3 gap-6">
             {filteredAlumni.map((alumniMember) => (
               <Card
@@ -114,7 +245,7 @@ export default function Connect({ user, onLogout }) {
               >
                 <CardHeader className="flex flex-row items-center gap-4">
                   <Avatar className="w-16 h-16">
-                    <AvatarImage src={alumniMember.profile_picture} />
+                    <AvatarImage src={mediaUrl(alumniMember.profile_picture)} />
                     <AvatarFallback className="bg-gradient-to-br from-blue-500 to-purple-500 text-white text-lg">
                       {alumniMember.full_name.charAt(0)}
                     </AvatarFallback>
@@ -132,6 +263,18 @@ export default function Connect({ user, onLogout }) {
               </Card>
             ))}
           </div>
+
+          {nextCursor && (
+            <div className="flex justify-center mt-8">
+              <Button
+                data-testid="connect-load-more-btn"
+                variant="outline"
+                onClick={() => fetchAlumni(nextCursor)}
+              >
+                Load more
+              </Button>
+            </div>
+          )}
         </div>
       </div>
 
@@ -141,7 +284,7 @@ export default function Connect({ user, onLogout }) {
           <DialogHeader>
             <div className="flex items-center gap-3">
               <Avatar>
-                <AvatarImage src={selectedAlumni?.profile_picture} />
+                <AvatarImage src={mediaUrl(selectedAlumni?.profile_picture)} />
                 <AvatarFallback className="bg-gradient-to-br from-blue-500 to-purple-500 text-white">
                   {selectedAlumni?.full_name?.charAt(0)}
                 </AvatarFallback>
@@ -155,9 +298,21 @@ export default function Connect({ user, onLogout }) {
 
           <ScrollArea className="h-96 pr-4" data-testid="connect-chat-messages">
             <div className="space-y-4">
-              {messages.map((msg, idx) => (
+              {olderCursor && (
+                <div className="flex justify-center">
+                  <Button
+                    data-testid="connect-chat-load-earlier-btn"
+                    variant="ghost"
+                    size="sm"
+                    onClick={loadEarlierMessages}
+                  >
+                    Load earlier messages
+                  </Button>
+                </div>
+              )}
+              {messages.map((msg) => (
                 <div
-                  key={idx}
+                  key={msg.id}
                   className={`flex ${
                     msg.sender_id === user.id ? 'justify-end' : 'justify-start'
                   }`}
@@ -48,7 +48,7 @@ export default function Events({ user, onLogout }) {
     setLoading(true);
 
     try {
-      await axios.post(`${API}/events/register`, {
+      const response = await axios.post(`${API}/events/register`, {
         user_id: user.id,
         event_id: selectedEvent.id,
         name: formData.name,
@@ -57,10 +57,18 @@ export default function Events({ user, onLogout }) {
         attend_dinner: formData.attend_dinner === 'yes'
       });
 
-      toast.success('Registration Successful!');
+      if (response.data.status === 'waitlisted') {
+        toast.info(`${response.data.message} (position ${response.data.waitlist_position})`);
+      } else {
+        toast.success(response.data.message);
+      }
       setShowModal(false);
     } catch (error) {
-      toast.error('Registration failed. Please try again.');
+      if (error.response?.status === 409) {
+        toast.error('Sorry, this event is full.');
+      } else {
+        toast.error('Registration failed. Please try again.');
+      }
     } finally {
       setLoading(false);
     }
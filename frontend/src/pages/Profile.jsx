@@ -7,7 +7,8 @@ import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
 import { Avatar, AvatarFallback, AvatarImage } from '@/components/ui/avatar';
 import { toast } from 'sonner';
-import { Pencil, Save, Calendar, MessageSquare, Heart } from 'lucide-react';
+import { mediaUrl } from '@/lib/utils';
+import { Pencil, Save, Calendar, MessageSquare, Heart, Upload } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -23,12 +24,28 @@ export default function Profile({ user, onLogout, setUser }) {
     profile_picture: user.profile_picture || ''
   });
   const [events, setEvents] = useState([]);
+  const [donations, setDonations] = useState([]);
+  const [donationsCursor, setDonationsCursor] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [uploading, setUploading] = useState(false);
 
   useEffect(() => {
     fetchEvents();
+    fetchDonations(null);
   }, []);
 
+  const fetchDonations = async (cursor) => {
+    try {
+      const params = { limit: 10 };
+      if (cursor) params.cursor = cursor;
+      const response = await axios.get(`${API}/user/${user.id}/donations`, { params });
+      setDonations(cursor ? [...donations, ...response.data.items] : response.data.items);
+      setDonationsCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error fetching donations:', error);
+    }
+  };
+
   const fetchEvents = async () => {
     try {
       const response = await axios.get(`${API}/events`);
@@ -70,6 +87,27 @@ export default function Profile({ user, onLogout, setUser }) {
     }
   };
 
+  const handleAvatarUpload = async (e) => {
+    const file = e.target.files[0];
+    e.target.value = '';
+    if (!file) return;
+    setUploading(true);
+    try {
+      const body = new FormData();
+      body.append('file', file);
+      const response = await axios.post(`${API}/user/${user.id}/avatar`, body);
+      const updatedUser = { ...user, ...response.data };
+      setUser(updatedUser);
+      localStorage.setItem('currentUser', JSON.stringify(updatedUser));
+      setFormData({ ...formData, profile_picture: response.data.profile_picture });
+      toast.success('Profile picture updated!');
+    } catch (error) {
+      toast.error(error.response?.data?.detail || 'Failed to upload picture. Please try again.');
+    } finally {
+      setUploading(false);
+    }
+  };
+
   return (
     <div className="flex h-screen bg-gradient-to-br from-blue-50 to-purple-50">
       <div className="w-64 flex-shrink-0">
@@ -109,11 +147,23 @@ export default function Profile({ user, onLogout, setUser }) {
             <Card className="md:col-span-1">
               <CardContent className="p-6 text-center">
                 <Avatar className="w-32 h-32 mx-auto mb-4">
-                  <AvatarImage src={user.profile_picture} />
+                  <AvatarImage src={mediaUrl(user.profile_picture)} />
                   <AvatarFallback className="bg-gradient-to-br from-purple-500 to-blue-500 text-white text-4xl">
                     {user.full_name.charAt(0)}
                   </AvatarFallback>
                 </Avatar>
+                <label className="inline-flex items-center gap-2 text-sm text-purple-600 hover:text-purple-700 cursor-pointer mb-4">
+                  <Upload className="w-4 h-4" />
+                  {uploading ? 'Uploading...' : 'Upload photo'}
+                  <input
+                    type="file"
+                    accept="image/jpeg,image/png,image/webp,image/gif"
+                    className="hidden"
+                    data-testid="profile-picture-upload"
+                    onChange={handleAvatarUpload}
+                    disabled={uploading}
+                  />
+                </label>
                 <h2 className="text-2xl font-bold text-gray-800 mb-1">{user.full_name}</h2>
                 <p className="text-gray-600 mb-4">Class of {user.passout_year}</p>
                 <div className="bg-gradient-to-r from-blue-50 to-purple-50 rounded-lg p-4 space-y-2">
@@ -124,7 +174,7 @@ export default function Profile({ user, onLogout, setUser }) {
                   </div>
                   <div className="flex items-center justify-center gap-2 text-sm">
                     <Heart className="w-4 h-4 text-orange-600" />
-                    <span className="font-medium">{user.donations?.length || 0}</span>
+                    <span className="font-medium">{user.donation_count || 0}</span>
                     <span className="text-gray-600">Donations</span>
                   </div>
                   <div className="flex items-center justify-center gap-2 text-sm">
@@ -285,16 +335,16 @@ export default function Profile({ user, onLogout, setUser }) {
           )}
 
           {/* Donation History */}
-          {user.donations?.length > 0 && (
+          {donations.length > 0 && (
             <Card className="mt-8">
               <CardHeader>
                 <CardTitle>Donation History</CardTitle>
               </CardHeader>
               <CardContent>
                 <div className="space-y-4">
-                  {user.donations.map((donation, idx) => (
+                  {donations.map((donation) => (
                     <div
-                      key={idx}
+                      key={donation.id}
                       className="flex justify-between items-center p-4 bg-gradient-to-r from-orange-50 to-purple-50 rounded-lg"
                     >
                       <div>
@@ -307,6 +357,17 @@ export default function Profile({ user, onLogout, setUser }) {
                     </div>
                   ))}
                 </div>
+                {donationsCursor && (
+                  <div className="flex justify-center mt-4">
+                    <Button
+                      data-testid="profile-donations-load-more-btn"
+                      variant="outline"
+                      onClick={() => fetchDonations(donationsCursor)}
+                    >
+                      Load more
+                    </Button>
+                  </div>
+                )}
               </CardContent>
             </Card>
           )}
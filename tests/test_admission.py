@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+
+import admission
+from admission import Rejected, RouteGate, RoutePolicy, TokenBucket
+
+
+async def hold(gate: RouteGate, client: str, release: asyncio.Event, seconds: float = 0.01):
+    await gate.acquire(client)
+    try:
+        await release.wait()
+    finally:
+        gate.release(client, seconds)
+
+
+def test_requests_beyond_concurrency_queue_in_order():
+    async def scenario():
+        gate = RouteGate("GET /x", RoutePolicy(concurrency=1, queue=2, queue_timeout=5))
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(gate, "a", release))
+        await asyncio.sleep(0)
+        order = []
+
+        async def queued(client):
+            await gate.acquire(client)
+            order.append(client)
+            gate.release(client, 0.01)
+
+        waiters = [asyncio.create_task(queued(client)) for client in ("b", "c")]
+        await asyncio.sleep(0)
+        assert gate.stats()["queued"] == 2
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        assert order == ["b", "c"]
+        assert (gate.active, len(gate.waiters)) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_rejected_with_503():
+    async def scenario():
+        gate = RouteGate("GET /x", RoutePolicy(concurrency=1, queue=1, queue_timeout=5))
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(gate, "a", release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(gate.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as rejected:
+            await gate.acquire("c")
+        assert (rejected.value.status, rejected.value.reason) == (503, "queue_full")
+        release.set()
+        await holder
+        await waiter
+        gate.release("b", 0.01)
+        assert gate.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_queued_request_times_out_and_gives_up_its_place():
+    async def scenario():
+        gate = RouteGate("GET /x", RoutePolicy(concurrency=1, queue=4, queue_timeout=0.05))
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(gate, "a", release))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as rejected:
+            await gate.acquire("b")
+        assert (rejected.value.status, rejected.value.reason) == (503, "queue_timeout")
+        assert (len(gate.waiters), gate.clients["b"].active) == (0, 0)
+        release.set()
+        await holder
+        assert gate.active == 0
+        # The slot is free again for the next request
+        assert await gate.acquire("c") == 0.0
+
+    asyncio.run(scenario())
+
+
+def test_expected_wait_beyond_the_timeout_is_shed_on_arrival():
+    async def scenario():
+        gate = RouteGate("GET /x", RoutePolicy(concurrency=1, queue=10, queue_timeout=0.5))
+        gate.service_seconds = 1.0
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(gate, "a", release, seconds=1.0))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as rejected:
+            await gate.acquire("b")
+        assert rejected.value.reason == "queue_budget"
+        assert rejected.value.retry_after == pytest.approx(1.0)
+        release.set()
+        await holder
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue_without_taking_a_slot():
+    async def scenario():
+        gate = RouteGate("GET /x", RoutePolicy(concurrency=1, queue=4, queue_timeout=5))
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(gate, "a", release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(gate.acquire("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert (len(gate.waiters), gate.clients["b"].active) == (0, 0)
+        release.set()
+        await holder
+        assert gate.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_slot_handed_over_as_the_wait_times_out_is_returned(monkeypatch):
+    async def late_wait_for(waiter, timeout):
+        # What wait_for can do from Python 3.12: time out although the waiter already has its result
+        gate.release("a", 0.01)
+        assert waiter.done()
+        raise asyncio.TimeoutError
+
+    async def scenario():
+        await gate.acquire("a")
+        with pytest.raises(Rejected):
+            await gate.acquire("b")
+        assert gate.active == 0
+        assert await gate.acquire("c") == 0.0
+
+    gate = RouteGate("GET /x", RoutePolicy(concurrency=1, queue=4, queue_timeout=5))
+    monkeypatch.setattr(admission.asyncio, "wait_for", late_wait_for)
+    asyncio.run(scenario())
+
+
+def test_client_limits_are_429_and_route_rate_is_503():
+    async def scenario():
+        gate = RouteGate("POST /x", RoutePolicy(client_concurrency=1, client_rate=1, client_burst=2, rate=100, burst=3))
+        await gate.acquire("a")
+        with pytest.raises(Rejected) as rejected:
+            await gate.acquire("a")
+        assert (rejected.value.status, rejected.value.reason) == (429, "client_concurrency")
+        gate.release("a", 0.01)
+        await gate.acquire("a")
+        gate.release("a", 0.01)
+        with pytest.raises(Rejected) as rejected:
+            await gate.acquire("a")
+        assert (rejected.value.status, rejected.value.reason) == (429, "client_rate")
+        await gate.acquire("b")
+        with pytest.raises(Rejected) as rejected:
+            await gate.acquire("c")
+        assert (rejected.value.status, rejected.value.reason) == (503, "rate")
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate=2, capacity=2)
+    now = bucket.updated
+    assert bucket.take(now) == 0.0
+    assert bucket.take(now) == 0.0
+    assert bucket.take(now) == pytest.approx(0.5)
+    assert bucket.take(now + 0.5) == 0.0
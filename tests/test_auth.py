@@ -0,0 +1,84 @@
+import time
+
+import jwt
+import pytest
+
+from auth import SessionTokens, TokenError, bearer_token
+
+SECRET = "a" * 32
+OTHER_SECRET = "b" * 32
+USER = {"id": "user-1", "email": "ada@example.com", "full_name": "Ada Lovelace"}
+
+
+def test_issued_token_verifies_to_its_principal():
+    tokens = SessionTokens(SECRET)
+    principal = tokens.verify(tokens.issue(USER))
+    assert (principal.id, principal.email, principal.full_name) == ("user-1", "ada@example.com", "Ada Lovelace")
+
+
+def test_expired_token_is_rejected():
+    tokens = SessionTokens(SECRET, ttl=-1)
+    with pytest.raises(TokenError):
+        tokens.verify(tokens.issue(USER))
+
+
+def test_cached_token_is_not_trusted_past_its_expiry(monkeypatch):
+    tokens = SessionTokens(SECRET, ttl=60)
+    token = tokens.issue(USER)
+    tokens.verify(token)
+    tokens.verify(token)
+    assert (tokens.hits, tokens.misses) == (1, 1)
+    expires_at = jwt.decode(token, options={"verify_signature": False})["exp"]
+    monkeypatch.setattr(time, "time", lambda: expires_at + 1)
+    # The stale entry is dropped and the token goes back through full verification
+    tokens.verify(token)
+    assert (tokens.hits, tokens.misses) == (1, 2)
+
+
+def test_tampered_token_is_rejected():
+    tokens = SessionTokens(SECRET)
+    header, payload, signature = tokens.issue(USER).split(".")
+    # Claims swapped for another user's, original signature kept
+    forged_payload = tokens.issue({**USER, "id": "user-2"}).split(".")[1]
+    with pytest.raises(TokenError):
+        tokens.verify(f"{header}.{forged_payload}.{signature}")
+    flipped = signature[:-2] + ("AA" if signature[-2:] != "AA" else "BB")
+    with pytest.raises(TokenError):
+        tokens.verify(f"{header}.{payload}.{flipped}")
+
+
+def test_token_signed_with_another_key_is_rejected():
+    # What a worker sees for a token issued by a worker with a different random key
+    with pytest.raises(TokenError):
+        SessionTokens(OTHER_SECRET).verify(SessionTokens(SECRET).issue(USER))
+
+
+def test_invalid_tokens_are_not_cached():
+    tokens = SessionTokens(SECRET)
+    with pytest.raises(TokenError):
+        tokens.verify("not-a-token")
+    assert len(tokens.cache) == 0
+
+
+def test_verified_tokens_are_served_from_a_bounded_lru():
+    tokens = SessionTokens(SECRET, cache_size=2)
+    first, second, third = (tokens.issue({**USER, "id": f"user-{index}"}) for index in range(3))
+    tokens.verify(first)
+    tokens.verify(second)
+    tokens.verify(first)  # now the most recently used
+    tokens.verify(third)
+    assert list(tokens.cache) == [first, third]
+    assert (tokens.hits, tokens.misses) == (1, 3)
+    assert tokens.verify(second).id == "user-1"
+    assert tokens.misses == 4
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("Bearer abc.def.ghi", "abc.def.ghi"),
+    ("bearer  abc ", "abc"),
+    ("Basic abc", None),
+    ("Bearer ", None),
+    (None, None),
+])
+def test_bearer_token(header, expected):
+    assert bearer_token(header) == expected
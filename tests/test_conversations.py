@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from conversations import inbox_page, record_message
+
+ALICE, BOB = "alice", "bob"
+CONVERSATION_ID = f"{ALICE}:{BOB}"
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def message(message_id: str, sender: str, receiver: str, seconds: int) -> dict:
+    return {
+        "id": message_id,
+        "conversation_id": CONVERSATION_ID,
+        "sender_id": sender,
+        "receiver_id": receiver,
+        "message": f"message {message_id}",
+        "timestamp": START + timedelta(seconds=seconds),
+    }
+
+
+async def seed_users(db):
+    await db.users.insert_many([
+        {"id": ALICE, "full_name": "Alice", "profile_picture": None},
+        {"id": BOB, "full_name": "Bob", "profile_picture": None},
+    ])
+
+
+def test_first_message_creates_the_summary(db):
+    async def scenario():
+        await seed_users(db)
+        await record_message(db.conversations, db.users, message("m1", ALICE, BOB, 1))
+        conversation = await db.conversations.find_one({"_id": CONVERSATION_ID})
+        assert conversation["participants"] == [ALICE, BOB]
+        assert conversation["last_message"]["id"] == "m1"
+        assert conversation["last_timestamp"] == START + timedelta(seconds=1)
+        assert conversation["unread"] == {BOB: 1, ALICE: 0}
+        assert conversation["profiles"][BOB]["full_name"] == "Bob"
+
+    asyncio.run(scenario())
+
+
+def test_older_message_landing_last_does_not_replace_the_newer_preview(db):
+    async def scenario():
+        await seed_users(db)
+        await record_message(db.conversations, db.users, message("m1", ALICE, BOB, 1))
+        # m3 was sent after m2 but its update reaches the database first
+        await record_message(db.conversations, db.users, message("m3", BOB, ALICE, 3))
+        await record_message(db.conversations, db.users, message("m2", ALICE, BOB, 2))
+        conversation = await db.conversations.find_one({"_id": CONVERSATION_ID})
+        assert conversation["last_message"]["id"] == "m3"
+        assert conversation["last_message"]["preview"] == "message m3"
+        assert conversation["last_timestamp"] == START + timedelta(seconds=3)
+        # Every message still counts as unread for its receiver
+        assert conversation["unread"] == {BOB: 2, ALICE: 1}
+
+    asyncio.run(scenario())
+
+
+def test_newer_message_moves_the_conversation_up_the_inbox(db):
+    async def scenario():
+        await seed_users(db)
+        await db.users.insert_one({"id": "carol", "full_name": "Carol", "profile_picture": None})
+        await record_message(db.conversations, db.users, message("m1", ALICE, BOB, 1))
+        await record_message(db.conversations, db.users, {
+            **message("c1", "carol", ALICE, 2), "conversation_id": f"{ALICE}:carol",
+        })
+        await record_message(db.conversations, db.users, message("m2", BOB, ALICE, 5))
+        page = await inbox_page(db.conversations, ALICE, limit=10)
+        assert [conversation["_id"] for conversation in page] == [CONVERSATION_ID, f"{ALICE}:carol"]
+        assert page[0]["last_message"]["id"] == "m2"
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+import asyncio
+import csv
+import io
+
+import orjson
+
+from exports import EXPORTS, export_fields, export_query, stream_export
+
+
+async def export(collection, dataset: str, fmt: str) -> bytes:
+    chunks = [chunk async for chunk in stream_export(
+        collection, export_fields(dataset, None), export_query(dataset, None, None), fmt, 2,
+        EXPORTS[dataset].get("defaults"),
+    )]
+    return b"".join(chunks)
+
+
+def test_registration_export_reports_status_and_skips_in_flight_rows(db):
+    async def scenario():
+        await db.event_registrations.insert_many([
+            {"event_id": "evt1", "user_id": "u1", "status": "registered", "name": "Ada"},
+            {"event_id": "evt1", "user_id": "u2", "status": "waitlisted", "waitlist_position": 1, "name": "Grace"},
+            {"event_id": "evt1", "user_id": "u3", "status": "pending", "name": "Linus"},
+            # From before registrations had a status
+            {"event_id": "evt1", "user_id": "u4", "name": "Barbara"},
+        ])
+        rows = [orjson.loads(line) for line in (await export(db.event_registrations, "event_registrations", "ndjson")).splitlines()]
+        assert {row["user_id"]: (row["status"], row.get("waitlist_position")) for row in rows} == {
+            "u1": ("registered", None),
+            "u2": ("waitlisted", 1),
+            "u4": ("registered", None),
+        }
+        table = list(csv.DictReader(io.StringIO((await export(db.event_registrations, "event_registrations", "csv")).decode())))
+        assert [(row["user_id"], row["status"], row["waitlist_position"]) for row in table] == [
+            ("u1", "registered", ""), ("u2", "waitlisted", "1"), ("u4", "registered", ""),
+        ]
+
+    asyncio.run(scenario())
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from indexes import DuplicateKeys, apply_indexes
+
+
+def test_duplicate_emails_are_reported_before_the_unique_index_is_built(db):
+    async def scenario():
+        await db.users.insert_many([
+            {"id": "1", "email": "ada@example.com"},
+            {"id": "2", "email": "ada@example.com"},
+            {"id": "3", "email": "grace@example.com"},
+        ])
+        with pytest.raises(DuplicateKeys, match=r"ada@example\.com \(2 profiles\)") as raised:
+            await apply_indexes(db)
+        assert "grace@example.com" not in str(raised.value)
+        assert "email_unique" not in await db.users.index_information()
+
+    asyncio.run(scenario())
+
+
+def test_unique_emails_build_the_catalog(db):
+    async def scenario():
+        await db.users.insert_many([{"id": "1", "email": "ada@example.com"}, {"id": "2", "email": "grace@example.com"}])
+        await apply_indexes(db)
+        assert "email_unique" in await db.users.index_information()
+        # Idempotent once the index exists
+        await apply_indexes(db)
+
+    asyncio.run(scenario())
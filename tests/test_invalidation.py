@@ -0,0 +1,206 @@
+import asyncio
+
+import pytest
+
+import invalidation
+from invalidation import InvalidationBus
+
+POLL = 0.01
+
+
+def make_bus(**options) -> InvalidationBus:
+    return InvalidationBus(mode="poll", poll_interval=POLL, flush_interval=0.005, **options)
+
+
+def recorder(bus: InvalidationBus, topic: str) -> list:
+    received = []
+
+    async def handler(keys):
+        received.append(keys)
+
+    bus.subscribe(topic, handler)
+    return received
+
+
+async def settle(seconds: float = 0.08):
+    await asyncio.sleep(seconds)
+
+
+async def started(db) -> InvalidationBus:
+    bus = make_bus()
+    await bus.prepare(db)
+    bus.start()
+    return bus
+
+
+def test_publishes_in_a_burst_are_coalesced_into_one_entry(db):
+    async def scenario():
+        sender = await started(db)
+        sender.publish("users", ["u1"])
+        sender.publish("users", ["u2"])
+        sender.publish("events", ["e1"])
+        sender.publish("events")  # everything in the topic absorbs the keys
+        sender.publish("events", ["e2"])
+        await settle()
+        entries = {entry["topic"]: entry["keys"] async for entry in db.cache_invalidations.find()}
+        assert entries == {"users": ["u1", "u2"], "events": None}
+        assert (sender.published, sender.written) == (5, 2)
+        await sender.close()
+
+    asyncio.run(scenario())
+
+
+def test_large_publishes_are_split_across_entries(db, monkeypatch):
+    monkeypatch.setattr(invalidation, "MAX_KEYS_PER_ENTRY", 3)
+
+    async def scenario():
+        sender = await started(db)
+        receiver = await started(db)
+        received = recorder(receiver, "users")
+        sender.publish("users", [f"u{index}" for index in range(7)])
+        await settle()
+        assert await db.cache_invalidations.count_documents({}) == 3
+        assert sorted(key for keys in received for key in keys) == sorted(f"u{index}" for index in range(7))
+        await asyncio.gather(sender.close(), receiver.close())
+
+    asyncio.run(scenario())
+
+
+def test_other_workers_receive_entries_but_the_publisher_does_not(db):
+    async def scenario():
+        sender, receiver = await started(db), await started(db)
+        own = recorder(sender, "events")
+        received = recorder(receiver, "events")
+        sender.publish("events", ["e1"])
+        await settle()
+        assert (own, received) == ([], [["e1"]])
+        await asyncio.gather(sender.close(), receiver.close())
+
+    asyncio.run(scenario())
+
+
+def test_entries_written_while_caches_load_are_delivered(db):
+    async def scenario():
+        publisher = make_bus()
+        publisher.bind(db)
+        # Already there when the worker starts, so reflected in the caches it loads
+        publisher.publish("users", ["before"])
+        await publisher.close()
+
+        receiver = make_bus()
+        received = recorder(receiver, "users")
+        await receiver.prepare(db)
+        # Written after the starting point was fixed, while the caches were loading
+        publisher.bind(db)
+        publisher.publish("users", ["during"])
+        await publisher.close()
+        receiver.start()
+        await settle()
+        assert received == [["during"]]
+        await receiver.close()
+
+    asyncio.run(scenario())
+
+
+def test_overlapping_poll_windows_deliver_each_entry_once(db):
+    async def scenario():
+        sender, receiver = await started(db), await started(db)
+        received = recorder(receiver, "users")
+        for index in range(3):
+            sender.publish("users", [f"u{index}"])
+            await settle(POLL * 3)
+        # Every later poll re-reads the earlier entries, which are all within POLL_OVERLAP
+        await settle()
+        assert received == [["u0"], ["u1"], ["u2"]]
+        assert receiver.received == 3
+        await asyncio.gather(sender.close(), receiver.close())
+
+    asyncio.run(scenario())
+
+
+def test_failed_write_is_retried(db):
+    async def scenario():
+        sender = await started(db)
+        write = sender._write
+        calls = []
+
+        async def flaky_write(pending):
+            calls.append(dict(pending))
+            if len(calls) == 1:
+                raise ConnectionError("primary stepped down")
+            await write(pending)
+
+        sender._write = flaky_write
+        sender.publish("users", ["u1"])
+        await settle(0.1)
+        assert sender.failures == 1
+        assert [entry["keys"] async for entry in db.cache_invalidations.find()] == [["u1"]]
+        await sender.close()
+
+    asyncio.run(scenario())
+
+
+class FailingStreams:
+    """A collection whose first change stream dies after one entry, then works."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.opened = []
+
+    def watch(self, pipeline=None, resume_after=None, **kwargs):
+        self.opened.append(resume_after)
+        collection = self
+
+        class Stream:
+            resume_token = {"_data": "token"}
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                if collection.entries:
+                    return {"fullDocument": collection.entries.pop(0)}
+                if len(collection.opened) == 1:
+                    raise ConnectionError("change stream lost")
+                await asyncio.sleep(3600)
+
+            async def try_next(self):
+                return None
+
+        return Stream()
+
+
+def test_change_stream_failure_resets_every_cache(monkeypatch):
+    async def scenario():
+        bus = InvalidationBus(mode="change_stream", poll_interval=POLL)
+        users, events = recorder(bus, "users"), recorder(bus, "events")
+        streams = FailingStreams([{"topic": "users", "keys": ["u1"], "origin": "other"}])
+        bus.collection = streams
+        bus.transport = "change_stream"
+        bus.resume_token = {"_data": "start"}
+        bus.start()
+        await settle()
+        # Resumed from the token captured at startup, then reopened from scratch after the failure
+        assert streams.opened == [{"_data": "start"}, None]
+        assert users == [["u1"], None]
+        assert events == [None]
+        assert (bus.failures, bus.resets) == (1, 1)
+        bus.collection = None
+        await bus.close()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("mode", ["off", "bogus"])
+def test_modes(mode):
+    if mode == "off":
+        assert not InvalidationBus(mode=mode).enabled
+    else:
+        with pytest.raises(ValueError):
+            InvalidationBus(mode=mode)
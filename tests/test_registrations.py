@@ -0,0 +1,161 @@
+import random
+import asyncio
+import inspect
+from datetime import datetime, timezone
+
+import pytest
+from pymongo import ASCENDING
+
+from registrations import REGISTERED, WAITLISTED, EventFull, SeatLedger
+
+
+class Interleaved:
+    """Yields to the loop a random number of times around every call, as a real driver would.
+
+    The in-memory collections never suspend, so without this concurrent
+    registrations would simply run one after another.
+    """
+
+    def __init__(self, collection, rng: random.Random):
+        self.collection = collection
+        self.rng = rng
+
+    def __getattr__(self, name):
+        attribute = getattr(self.collection, name)
+        if not inspect.iscoroutinefunction(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            for _ in range(self.rng.randrange(4)):
+                await asyncio.sleep(0)
+            result = await attribute(*args, **kwargs)
+            for _ in range(self.rng.randrange(4)):
+                await asyncio.sleep(0)
+            return result
+
+        return call
+
+
+async def make_ledger(db, seed: int = 0) -> SeatLedger:
+    await db.event_registrations.create_index(
+        [("event_id", ASCENDING), ("user_id", ASCENDING)], unique=True, name="event_user_unique"
+    )
+    rng = random.Random(seed)
+    ledger = SeatLedger()
+    ledger.bind(Interleaved(db.event_registrations, rng), Interleaved(db.event_seats, rng))
+    return ledger
+
+
+def registration(event: dict, user_id: str) -> dict:
+    return {"event_id": event["id"], "user_id": user_id, "timestamp": datetime.now(timezone.utc)}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_concurrent_registrations_never_exceed_capacity(db, seed):
+    event = {"id": "evt1", "capacity": 10, "waitlist": True}
+
+    async def scenario():
+        ledger = await make_ledger(db, seed)
+        results = await asyncio.gather(*(ledger.register(event, registration(event, f"user-{index}")) for index in range(50)))
+        statuses = [result.status for result in results]
+        assert statuses.count(REGISTERED) == 10
+        assert statuses.count(WAITLISTED) == 40
+        assert sorted(result.waitlist_position for result in results if result.status == WAITLISTED) == list(range(1, 41))
+        assert await db.event_registrations.count_documents({"event_id": "evt1", "status": REGISTERED}) == 10
+        counts = await ledger.counts(event)
+        assert (counts["registered"], counts["waitlisted"], counts["available"]) == (10, 40, 0)
+
+    asyncio.run(scenario())
+
+
+def test_full_event_without_waitlist_rejects_and_leaves_no_registration(db):
+    event = {"id": "evt1", "capacity": 3, "waitlist": False}
+
+    async def scenario():
+        ledger = await make_ledger(db)
+        outcomes = await asyncio.gather(
+            *(ledger.register(event, registration(event, f"user-{index}")) for index in range(8)), return_exceptions=True
+        )
+        assert sum(isinstance(outcome, EventFull) for outcome in outcomes) == 5
+        assert await db.event_registrations.count_documents({"event_id": "evt1"}) == 3
+        assert (await ledger.counts(event))["registered"] == 3
+
+    asyncio.run(scenario())
+
+
+def test_repeat_registration_is_idempotent(db):
+    event = {"id": "evt1", "capacity": 5, "waitlist": True}
+
+    async def scenario():
+        ledger = await make_ledger(db)
+        first = await ledger.register(event, registration(event, "user-1"))
+        retries = await asyncio.gather(*(ledger.register(event, registration(event, "user-1")) for _ in range(5)))
+        assert (first.status, first.created) == (REGISTERED, True)
+        assert all((retry.status, retry.created) == (REGISTERED, False) for retry in retries)
+        assert await db.event_registrations.count_documents({"event_id": "evt1", "user_id": "user-1"}) == 1
+        assert (await ledger.counts(event))["registered"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_repeat_waitlisted_registration_keeps_its_place(db):
+    event = {"id": "evt1", "capacity": 1, "waitlist": True}
+
+    async def scenario():
+        ledger = await make_ledger(db)
+        await ledger.register(event, registration(event, "user-1"))
+        first = await ledger.register(event, registration(event, "user-2"))
+        again = await ledger.register(event, registration(event, "user-2"))
+        assert (first.status, first.waitlist_position) == (WAITLISTED, 1)
+        assert (again.status, again.created, again.waitlist_position) == (WAITLISTED, False, 1)
+        assert (await ledger.counts(event))["waitlisted"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_capacity_increase_promotes_the_waitlist_in_order(db):
+    event = {"id": "evt1", "capacity": 2, "waitlist": True}
+
+    async def scenario():
+        ledger = await make_ledger(db)
+        for index in range(5):
+            await ledger.register(event, registration(event, f"user-{index}"))
+        promoted = await ledger.promote({**event, "capacity": 4})
+        assert promoted == ["user-2", "user-3"]
+        remaining = await db.event_registrations.find_one({"event_id": "evt1", "user_id": "user-4"})
+        assert remaining["status"] == WAITLISTED
+        counts = await ledger.counts({**event, "capacity": 4})
+        assert (counts["registered"], counts["waitlisted"], counts["available"]) == (4, 1, 0)
+        # More seats than waiters: everyone is promoted and the unused seats stay free
+        assert await ledger.promote({**event, "capacity": 10}) == ["user-4"]
+        counts = await ledger.counts({**event, "capacity": 10})
+        assert (counts["registered"], counts["waitlisted"], counts["available"]) == (5, 0, 5)
+
+    asyncio.run(scenario())
+
+
+def test_reconcile_repairs_drifted_counters(db):
+    event = {"id": "evt1", "capacity": 5, "waitlist": True}
+
+    async def scenario():
+        ledger = await make_ledger(db)
+        for index in range(3):
+            await ledger.register(event, registration(event, f"user-{index}"))
+        await db.event_seats.update_one({"_id": "evt1"}, {"$set": {"registered": 7}})
+        assert await ledger.reconcile(["evt1"]) == ["evt1"]
+        assert (await ledger.counts(event))["registered"] == 3
+        assert await ledger.reconcile(["evt1"]) == []
+
+    asyncio.run(scenario())
+
+
+def test_unlimited_event_registers_everyone(db):
+    event = {"id": "evt1", "capacity": None, "waitlist": False}
+
+    async def scenario():
+        ledger = await make_ledger(db)
+        results = await asyncio.gather(*(ledger.register(event, registration(event, f"user-{index}")) for index in range(20)))
+        assert all(result.status == REGISTERED for result in results)
+        assert (await ledger.counts(event))["available"] is None
+
+    asyncio.run(scenario())
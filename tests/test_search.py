@@ -0,0 +1,108 @@
+import pytest
+
+from search import AlumniSearchIndex, edit_distance, tokenize
+
+PROFILES = [
+    {"id": "1", "full_name": "John Smith", "company": "Acme Corp", "domain": "Technology", "location": "Boston, MA"},
+    {"id": "2", "full_name": "Sarah Jones", "company": "Globex", "domain": "Finance", "location": "London, UK"},
+    {"id": "3", "full_name": "Johnny Appleseed", "company": "Orchard Labs", "domain": "Agriculture", "location": "Boston, MA"},
+    {"id": "4", "full_name": "Priya Raman", "company": "Acme Corp", "domain": "Design", "location": "Pune, IN"},
+    {"id": "5", "full_name": "Jonas Boston", "company": "Initech", "domain": "Technology", "location": "Denver, CO"},
+]
+
+
+@pytest.fixture
+def index():
+    index = AlumniSearchIndex()
+    for profile in PROFILES:
+        index.add(profile)
+    return index
+
+
+def ids(results):
+    return [doc_id for doc_id, _ in results]
+
+
+def test_tokenize_casefolds_and_splits_on_punctuation():
+    assert tokenize("Boston, MA") == ["boston", "ma"]
+    assert tokenize("STRASSE Straße") == ["strasse", "strasse"]
+    assert tokenize(None) == []
+
+
+def test_exact_term_ranks_name_hits_above_location_hits(index):
+    # "boston" is Jonas's surname but only the location of John and Johnny
+    results = ids(index.search("boston"))
+    assert results[0] == "5"
+    assert set(results) == {"1", "3", "5"}
+
+
+def test_last_term_matches_as_a_prefix(index):
+    assert set(ids(index.search("joh"))) == {"1", "3"}
+    # Only the last term is a prefix; "joh" must match a whole token elsewhere in a query
+    assert ids(index.search("joh smith")) == []
+
+
+def test_exact_match_ranks_above_prefix_completion(index):
+    results = ids(index.search("john"))
+    assert results[0] == "1"
+    assert "3" in results
+
+
+def test_every_term_must_match(index):
+    assert ids(index.search("acme raman")) == ["4"]
+    assert ids(index.search("acme boston")) == ["1"]
+    assert ids(index.search("globex boston")) == []
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("smiht", "1"),        # transposition
+    ("jhon smith", "1"),   # transposition in a short term that shares no trigram with "john"
+    ("jnoes", "2"),        # transposition
+    ("joens sarah", "2"),  # transposition, with another term
+    ("sarha jones", "2"),  # transposition
+    ("globx", "2"),        # deletion
+    ("initecch", "5"),     # insertion
+    ("ramen", "4"),        # substitution
+    ("appelseid", "3"),    # a transposition and a substitution in a long term
+])
+def test_typos_find_the_intended_profile(index, query, expected):
+    assert ids(index.search(query))[0] == expected
+
+
+def test_short_terms_are_not_fuzzy_matched(index):
+    assert ids(index.search("jhn")) == []
+
+
+def test_edit_distance_counts_a_transposition_as_one_edit():
+    assert edit_distance("jhon", "john", 1) == 1
+    assert edit_distance("abcd", "badc", 2) == 2
+    assert edit_distance("abcdef", "uvwxyz", 2) == 3
+
+
+def test_remove_drops_the_profile_and_its_vocabulary(index):
+    index.remove("2")
+    assert ids(index.search("sarah")) == []
+    assert ids(index.search("globex")) == []
+    assert "globex" not in index.vocabulary
+    assert not any("globex" in tokens for tokens in index.gram_index.values())
+    # Tokens still used by other profiles survive
+    assert set(ids(index.search("boston"))) == {"1", "3", "5"}
+    assert len(index) == 4
+
+
+def test_add_overwrites_an_existing_profile(index):
+    index.add({**PROFILES[0], "company": "Umbrella"})
+    assert ids(index.search("umbrella")) == ["1"]
+    assert ids(index.search("acme")) == ["4"]
+    assert index.doc_freq["acme"] == 1
+    assert len(index) == 5
+
+
+def test_add_without_overwrite_keeps_the_existing_profile(index):
+    index.add({**PROFILES[0], "company": "Umbrella"}, overwrite=False)
+    assert ids(index.search("umbrella")) == []
+    assert set(ids(index.search("acme"))) == {"1", "4"}
+
+
+def test_limit_caps_results(index):
+    assert len(index.search("boston", limit=2)) == 2
@@ -0,0 +1,11 @@
+import pytest
+
+import serve
+
+
+def test_multiple_workers_require_a_shared_jwt_secret(monkeypatch, capsys):
+    monkeypatch.delenv("JWT_SECRET", raising=False)
+    with pytest.raises(SystemExit) as exit_info:
+        serve.main(["--workers", "2"])
+    assert exit_info.value.code == 2
+    assert "JWT_SECRET must be set" in capsys.readouterr().err